@@ -12,66 +12,292 @@ Support for:
 
 Requirements:
 pip install ultralytics opencv-python numpy pandas scipy filterpy deep-sort-realtime
+(or onnxruntime instead of ultralytics when model_path points to an exported .onnx model)
 """
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
 import os
+import sys
 import json
-import sqlite3
+import queue
+import threading
 from datetime import datetime
 from utils.casa_metrics import CASACalculator
 from utils.who_standards import WHOStandards
+from utils.onnx_detector import OnnxDetector
+from utils.box_ops import DETECTION_DTYPE, detection_boxes, merge_tiles, to_detections
+from utils.track_store import TrackStore
+from utils.online_casa import OnlineCASA
+from utils.track_stitching import stitch_segment_tracks
+from utils.trackers import create_tracker
+from utils.detection_cache import (DetectionCache, DetectionRecorder, cache_path, file_hash,
+                                   model_version)
+from utils.result_cache import ResultCache
+from utils.db_writer import get_writer
+
+# النماذج المتاحة بالاسم (ناتج train.py بعد نسخه إلى مجلد models)
+MODEL_VARIANTS = {
+    'pt': 'models/sperm-analyzer-v1.pt',
+    'onnx': 'models/sperm-analyzer-v1.onnx',
+    'int8': 'models/sperm-analyzer-v1-int8.onnx',
+}
+
+# النموذج الأساسي الذي يحمله ultralytics عندما لا يوجد نموذج .pt المدرب
+FALLBACK_MODEL = 'yolov8n.pt'
+
+# حدود الثقة و IoU الافتراضية في ultralytics (OnnxDetector يحفظ حدوده في خصائصه)
+DEFAULT_CONF_THRESHOLD = 0.25
+DEFAULT_IOU_THRESHOLD = 0.7
+
+# أسماء أنظمة التتبع في نص إصدار النموذج المحفوظ مع النتائج
+TRACKER_LABELS = {'deepsort': 'DeepSORT', 'sort': 'SORT', 'bytetrack': 'ByteTrack'}
+
+# الجداول الفرعية لنتائج التحليل كما في create_semen_analysis_table.sql،
+# ينفذها كاتب قاعدة البيانات مرة واحدة عند فتح اتصاله
+RESULT_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS motility_time_series (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_result_id INTEGER NOT NULL,
+    window_start_seconds REAL NOT NULL,
+    window_seconds REAL NOT NULL,
+    tracks_count INTEGER,
+    vcl_mean_um_s REAL,
+    vsl_mean_um_s REAL,
+    progressive_percent REAL,
+    FOREIGN KEY (test_result_id) REFERENCES semen_analysis(test_result_id)
+);
+
+CREATE TABLE IF NOT EXISTS sperm_track_kinematics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_result_id INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    points_count INTEGER,
+    vcl_um_s REAL,
+    vsl_um_s REAL,
+    vap_um_s REAL,
+    lin_percent REAL,
+    str_percent REAL,
+    wob_percent REAL,
+    alh_um REAL,
+    bcf_hz REAL,
+    alh_avgpath_um REAL,
+    bcf_avgpath_hz REAL,
+    movement_pattern TEXT,
+    who_grade TEXT,
+    FOREIGN KEY (test_result_id) REFERENCES semen_analysis(test_result_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_track_kinematics_result ON sperm_track_kinematics(test_result_id, track_id);
+
+CREATE TABLE IF NOT EXISTS sperm_track_points (
+    test_result_id INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    frame_index INTEGER NOT NULL,
+    timestamp_ms REAL,
+    x_px REAL,
+    y_px REAL,
+    FOREIGN KEY (test_result_id) REFERENCES semen_analysis(test_result_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_track_points_result ON sperm_track_points(test_result_id, track_id);
+"""
+
+def resolve_model_path(model_path):
+    """
+    مسار الأوزان التي ستحمل فعلاً لاسم أو مسار نموذج
+    
+    نموذج .pt غير موجود يستبدل بالنموذج الأساسي (FALLBACK_MODEL)، أما ONNX
+    غير الموجود فيبقى كما هو ويفشل تحميله.
+    """
+    model_path = MODEL_VARIANTS.get(model_path, model_path)
+    if model_path and not model_path.lower().endswith('.onnx') and not os.path.exists(model_path):
+        return FALLBACK_MODEL
+    return model_path
+
+def track_video_segment(options, video_path, start_frame, frame_count):
+    """
+    تتبع مقطع واحد من الفيديو داخل عملية مستقلة (الوضع المقسم)
+    
+    Args:
+        options: معاملات SpermAnalyzer للمحلل الفرعي
+        video_path: مسار الفيديو
+        start_frame: أول إطار في المقطع
+        frame_count: عدد الإطارات المطلوب قراءتها (مع نافذة التداخل)
+        
+    Returns:
+        tuple: (TrackStore بأرقام إطارات عامة، عدد الإطارات المقروءة)
+    """
+    # رسائل المحللات الفرعية على stderr حتى لا تختلط بمخرجات وضع العامل
+    sys.stdout = sys.stderr
+    
+    analyzer = SpermAnalyzer(**options)
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"لا يمكن فتح الفيديو: {video_path}")
+    
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    decoded, _ = analyzer.track_video(cap, video_path, fps, frame_count, first_frame_index=start_frame)
+    
+    return analyzer.track_store, decoded
 
 class SpermAnalyzer:
-    def __init__(self, model_path="models/sperm-analyzer-v1.pt", db_path="../../database.db"):
+    def __init__(self, model_path="models/sperm-analyzer-v1.pt", db_path="../../database.db",
+                 batch_size=16, tile_size=640, tile_overlap=0.2, queue_size=None,
+                 output_scale=1.0, output_stride=1, headless=False,
+                 keyframe_interval=1, max_flow_error=2.0, segments=1, segment_overlap=15,
+                 tracker='deepsort', online_metrics=False, time_window=None,
+                 max_age=30, n_init=3, pixel_to_micron=0.5, min_track_length=10,
+                 detection_cache_dir=None, tracker_options=None, smoothing_window=5,
+                 result_cache_path=None, trajectory_stride=None):
         """
         تهيئة محلل الحيوانات المنوية
         
         Args:
-            model_path: مسار نموذج الذكاء الاصطناعي
+            model_path: مسار النموذج (.pt عبر ultralytics أو .onnx عبر onnxruntime)
+                        أو اسم من MODEL_VARIANTS مثل 'int8'
+                        (None = بدون نموذج، لإعادة التتبع من ذاكرة الكشوفات فقط)
             db_path: مسار قاعدة البيانات
+            batch_size: عدد إطارات الفيديو في كل تمريرة للنموذج (1 = إطار بإطار)
+            tile_size: حجم البلاطة بالبكسل في وضع التحليل المجزأ للصور
+            tile_overlap: نسبة التداخل بين البلاطات المتجاورة
+            queue_size: الحد الأقصى للإطارات المنتظرة بين مراحل خط معالجة الفيديو
+                        (افتراضي: ضعف حجم الدفعة)
+            output_scale: معامل تصغير الفيديو المحلل المحفوظ (1.0 = الدقة الأصلية)
+            output_stride: حفظ إطار واحد من كل output_stride إطار في الفيديو المحلل
+            headless: وضع المقاييس فقط - بدون رسم أو حفظ صور وفيديو محللة
+            keyframe_interval: أقصى فاصل بين الإطارات المفتاحية التي تُكشف بالنموذج
+                               (1 = كشف كل إطار، أكبر من 1 = تدفق بصري بينها)
+            max_flow_error: أقصى خطأ تدفق متراكم بالبكسل قبل فرض إطار مفتاحي
+            segments: عدد المقاطع الزمنية التي تحلل بالتوازي في عمليات مستقلة
+                      (1 = تحليل متسلسل؛ الوضع المقسم يحسب المقاييس فقط بدون فيديو محلل)
+            segment_overlap: عدد الإطارات التي يعيد كل مقطع قراءتها بعد نهايته لربط المسارات
+            tracker: نظام التتبع 'deepsort' (مظهر + حركة) أو 'sort' / 'bytetrack' (حركة فقط)
+            online_metrics: حساب معايير CASA أثناء التتبع وتحرير كل مسار فور انتهائه بدلاً
+                            من تخزين كل النقاط (لا ينطبق على الوضع المقسم الذي يربط المسارات الكاملة)
+            time_window: مدة نافذة السلسلة الزمنية للحركة بالثواني (None = بدون سلسلة زمنية)
+            max_age: عدد الإطارات التي يبقى فيها المسار بدون كشف قبل حذفه
+            n_init: عدد الكشوفات المتتالية لتأكيد المسار
+            pixel_to_micron: نسبة تحويل البكسل إلى ميكرون
+            min_track_length: أقل عدد نقاط للمسار حتى يدخل في متوسطات CASA
+            detection_cache_dir: مجلد حفظ كشوفات كل إطار لإعادة التحليل بـ replay_detections
+                                 (None = بدون حفظ)
+            tracker_options: معاملات إضافية للمتتبع مثل عتبات الربط (انظر create_tracker)
+            smoothing_window: نافذة المتوسط المتحرك للمسار المتوسط (VAP) بعدد النقاط
+            result_cache_path: ملف SQLite لذاكرة النتائج حسب بصمة الملف والنموذج والإعدادات
+                               (None = بدون ذاكرة)
+            trajectory_stride: حفظ نقطة من كل trajectory_stride نقطة من كل مسار في جدول
+                               sperm_track_points (None = بدون مسارات)
         """
         
-        self.model_path = model_path
+        if time_window is not None and not time_window > 0:
+            raise ValueError(f"مدة نافذة السلسلة الزمنية يجب أن تكون موجبة: {time_window}")
+        
+        self.model_path = MODEL_VARIANTS.get(model_path, model_path)
         self.db_path = db_path
+        self.db_writer = None                                  # ينشأ عند أول حفظ
+        self.pending_saves = None                              # قائمة = تأجيل الحفظ لعملية أخرى (save_pending)
+        self.batch_size = max(1, int(batch_size))
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.queue_size = queue_size or 2 * self.batch_size
+        self.output_scale = output_scale
+        self.output_stride = max(1, int(output_stride))
+        self.headless = headless
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.max_flow_error = max_flow_error
+        self.segments = max(1, int(segments))
+        self.segment_overlap = max(1, int(segment_overlap))
+        self.tracker_name = tracker
+        self.online_metrics = online_metrics
+        self.time_window = time_window
+        self.trajectory_stride = trajectory_stride
+        self.max_age = max_age
+        self.n_init = n_init
+        self.tracker_options = dict(tracker_options or {})
+        self.min_track_length = min_track_length
+        self.detection_cache_dir = detection_cache_dir
+        
+        # إعدادات المحللات الفرعية في الوضع المقسم (كل مقطع في عملية بنموذجه ومتتبعه)
+        self.segment_options = {
+            'model_path': self.model_path, 'db_path': db_path, 'batch_size': self.batch_size,
+            'queue_size': queue_size, 'headless': True,
+            'keyframe_interval': self.keyframe_interval, 'max_flow_error': max_flow_error,
+            'tracker': tracker, 'max_age': max_age, 'n_init': n_init,
+            'tracker_options': tracker_options,
+        }
         
         # تحميل النموذج
-        self.load_model()
+        self.model = None
+        if self.model_path is not None:
+            self.load_model()
         
-        # تهيئة نظام التتبع
-        self.tracker = DeepSort(max_age=30, n_init=3)
+        # نظام التتبع يحمل عند أول تحليل فيديو فقط (تحليل الصور لا يحتاجه)
+        self.tracker = None
         
         # تهيئة حاسب CASA metrics
-        self.casa_calculator = CASACalculator()
+        self.casa_calculator = CASACalculator(pixel_to_micron=pixel_to_micron,
+                                              smoothing_window=smoothing_window)
         
         # معايير WHO
         self.who_standards = WHOStandards()
         
-        # بيانات التتبع
-        self.tracks_data = {}
+        # بيانات التتبع (أعمدة NumPy لكل نقاط المسارات)
+        self.track_store = TrackStore()
         self.analysis_results = {}
         
+        # ذاكرة النتائج (بصمة النموذج تحسب عند أول استخدام)
+        self.result_cache = ResultCache(result_cache_path) if result_cache_path else None
+        self.model_hash = None
+        
+        # تسجيل الكشوفات أثناء تحليل الفيديو عند تفعيل detection_cache_dir
+        self.detection_recorder = None
+        
+        # عدد الإطارات التي تتبعت من صناديق منقولة بالتدفق البصري (None = غير معروف، الوضع المقسم)
+        self.propagated_frames = 0
+        
+        # جدول حركيات المسارات المحسوب مرة واحدة لكل تحليل (انظر track_kinematics)
+        self.kinematics = None
+        self.kinematics_source = None
+        
+        # مجمعات CASA أثناء التتبع في وضع online_metrics (None = الحساب من track_store)
+        self.online_casa = None
+        
         print("🧬 تم تهيئة محلل الحيوانات المنوية بنجاح")
     
     def load_model(self):
         """تحميل نموذج الذكاء الاصطناعي"""
         try:
-            if os.path.exists(self.model_path):
+            if self.model_path.lower().endswith('.onnx'):
+                # تشغيل النموذج المصدّر عبر ONNX Runtime بدون PyTorch
+                if not os.path.exists(self.model_path):
+                    raise FileNotFoundError(f"نموذج ONNX غير موجود: {self.model_path}")
+                
+                self.model = OnnxDetector(self.model_path)
+                print(f"✅ تم تحميل نموذج ONNX: {self.model_path}")
+                return
+            
+            from ultralytics import YOLO
+            
+            model_path = resolve_model_path(self.model_path)
+            if model_path == self.model_path:
                 self.model = YOLO(self.model_path)
                 print(f"✅ تم تحميل النموذج: {self.model_path}")
             else:
-                # استخدام النموذج الأساسي إذا لم يكن المدرب متوفر
-                self.model = YOLO('yolov8n.pt')
-                print("⚠️  استخدام النموذج الأساسي - يُنصح بتدريب نموذج مخصص")
+                # استخدام النموذج الأساسي إذا لم يكن المدرب متوفر، وتسجيله كنموذج التحليل
+                # حتى تصف ai_model_version وبصمات الذاكرة الأوزان التي عملت فعلاً
+                self.model = YOLO(model_path)
+                print(f"⚠️  {self.model_path} غير موجود، استخدام النموذج الأساسي - يُنصح بتدريب نموذج مخصص")
+                self.model_path = self.segment_options['model_path'] = model_path
+                self.model_hash = None
                 
         except Exception as e:
             print(f"❌ خطأ في تحميل النموذج: {e}")
             raise
     
-    def analyze_image(self, image_path, patient_id, save_results=True):
+    def analyze_image(self, image_path, patient_id, save_results=True, tiled=False):
         """
         تحليل صورة واحدة للحيوانات المنوية
         
@@ -79,31 +305,38 @@ class SpermAnalyzer:
             image_path: مسار الصورة
             patient_id: معرف المريض
             save_results: حفظ النتائج في قاعدة البيانات
+            tiled: تقسيم الصورة إلى بلاطات متداخلة بدقتها الكاملة (للصور عالية الدقة)
             
         Returns:
             dict: نتائج التحليل
         """
         print(f"🔬 بدء تحليل الصورة: {image_path}")
         
+        cache_entry, cached = self.lookup_result(image_path, patient_id, save_results, {
+            'analysis_type': 'image', 'tiled': tiled, 'tile_size': self.tile_size,
+            'tile_overlap': self.tile_overlap, 'headless': self.headless,
+        })
+        if cached is not None:
+            return cached
+        
         # قراءة الصورة
         image = cv2.imread(image_path)
         if image is None:
             raise ValueError(f"لا يمكن قراءة الصورة: {image_path}")
         
         # كشف الحيوانات المنوية
-        results = self.model(image)[0]
-        
-        # استخراج النتائج
-        detections = []
-        if results.boxes is not None:
-            for box in results.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                confidence = box.conf[0].cpu().numpy()
-                detections.append({
-                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                    'confidence': float(confidence),
-                    'center': [(x1+x2)/2, (y1+y2)/2]
-                })
+        if tiled:
+            dets = self.detect_tiled(image)
+        else:
+            dets = self.extract_detections(self.model(image)[0])
+        
+        # استخراج النتائج (تحويل جماعي للمصفوفات ثم بناء القواميس)
+        bboxes = detection_boxes(dets).astype(np.int64).tolist()
+        centers = np.column_stack([(dets['x1'] + dets['x2']) / 2, (dets['y1'] + dets['y2']) / 2]).tolist()
+        detections = [
+            {'bbox': bbox, 'confidence': confidence, 'center': center}
+            for bbox, confidence, center in zip(bboxes, dets['conf'].tolist(), centers)
+        ]
         
         # حساب النتائج
         analysis_result = {
@@ -113,28 +346,32 @@ class SpermAnalyzer:
             'timestamp': datetime.now().isoformat(),
             'total_count': len(detections),
             'detections': detections,
-            'ai_confidence': np.mean([d['confidence'] for d in detections]) if detections else 0,
+            'ai_confidence': float(dets['conf'].mean()) if len(dets) else 0,
+            'model_version': self.describe_model(tracker=False),
             'concentration_estimation': self.estimate_concentration_from_image(len(detections)),
             'who_compliance': self.who_standards.check_count_compliance(len(detections))
         }
         
-        # حفظ الصورة المحللة
-        analyzed_image = self.draw_detections(image.copy(), detections)
-        analyzed_path = self.save_analyzed_image(analyzed_image, image_path, 'analyzed')
-        analysis_result['analyzed_image_path'] = analyzed_path
-        
-        # حفظ خريطة الحرارة
-        heatmap = self.generate_heatmap(image.shape, detections)
-        heatmap_path = self.save_analyzed_image(heatmap, image_path, 'heatmap')
-        analysis_result['heatmap_path'] = heatmap_path
+        if not self.headless:
+            # حفظ الصورة المحللة
+            analyzed_image = self.draw_detections(image.copy(), detections)
+            analyzed_path = self.save_analyzed_image(analyzed_image, image_path, 'analyzed')
+            analysis_result['analyzed_image_path'] = analyzed_path
+            
+            # حفظ خريطة الحرارة
+            heatmap = self.generate_heatmap(image.shape, detections)
+            heatmap_path = self.save_analyzed_image(heatmap, image_path, 'heatmap')
+            analysis_result['heatmap_path'] = heatmap_path
         
         if save_results:
-            self.save_to_database(analysis_result)
+            analysis_result['test_result_id'] = self.save_to_database(analysis_result)
+        self.store_result(cache_entry, analysis_result)
         
         print(f"✅ تم العثور على {len(detections)} حيوان منوي")
         return analysis_result
     
-    def analyze_video(self, video_path, patient_id, duration_seconds=10, save_results=True):
+    def analyze_video(self, video_path, patient_id, duration_seconds=10, save_results=True,
+                      progress_callback=None):
         """
         تحليل فيديو للحيوانات المنوية مع حساب CASA metrics
         
@@ -143,12 +380,29 @@ class SpermAnalyzer:
             patient_id: معرف المريض
             duration_seconds: مدة التحليل بالثواني
             save_results: حفظ النتائج في قاعدة البيانات
+            progress_callback: دالة اختيارية تستدعى بعد كل دفعة (frame_count, total_frames)
             
         Returns:
             dict: نتائج التحليل مع CASA metrics
         """
         print(f"🎬 بدء تحليل الفيديو: {video_path}")
         
+        cache_entry, cached = self.lookup_result(video_path, patient_id, save_results, {
+            'analysis_type': 'video', 'duration_seconds': duration_seconds,
+            'keyframe_interval': self.keyframe_interval, 'max_flow_error': self.max_flow_error,
+            'segments': self.segments, 'segment_overlap': self.segment_overlap,
+            'tracker': self.tracker_name, 'max_age': self.max_age, 'n_init': self.n_init,
+            'tracker_options': self.tracker_options,
+            'pixel_to_micron': self.casa_calculator.pixel_to_micron,
+            'smoothing_window': self.casa_calculator.smoothing_window,
+            'min_track_length': self.min_track_length, 'online_metrics': self.online_metrics,
+            'time_window': self.time_window, 'headless': self.headless,
+            'output_scale': self.output_scale, 'output_stride': self.output_stride,
+            'detection_cache': bool(self.detection_cache_dir),
+        })
+        if cached is not None:
+            return cached
+        
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError(f"لا يمكن فتح الفيديو: {video_path}")
@@ -156,67 +410,114 @@ class SpermAnalyzer:
         fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(fps * duration_seconds)
         
-        self.tracks_data = {}
-        frame_count = 0
-        processed_frames = []
+        segments = self.plan_segments(cap, total_frames)
+        if len(segments) > 1:
+            cap.release()
+            if not self.headless:
+                print("ℹ️ الوضع المقسم يحسب المقاييس فقط بدون فيديو محلل")
+            frame_count = self.track_video_segments(video_path, segments, progress_callback)
+            analyzed_video_path = None
+        else:
+            frame_count, analyzed_video_path = self.track_video(cap, video_path, fps, total_frames,
+                                                                progress_callback=progress_callback)
         
-        print(f"📹 معالجة {total_frames} إطار بسرعة {fps} إطار/ثانية")
+        analysis_result = self.build_video_result(patient_id, video_path, duration_seconds, fps,
+                                                  frame_count, analyzed_video_path)
         
-        while cap.isOpened() and frame_count < total_frames:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        if self.detection_recorder is not None:
+            analysis_result['detection_cache_path'] = self.save_detection_cache(video_path, fps,
+                                                                                duration_seconds)
+        elif self.detection_cache_dir:
+            print("ℹ️ ذاكرة الكشوفات لا تحفظ في الوضع المقسم")
+        
+        if save_results:
+            analysis_result['test_result_id'] = self.save_to_database(analysis_result,
+                                                                      self.track_detail_rows())
+        self.store_result(cache_entry, analysis_result)
+        
+        print(f"✅ تم تحليل {analysis_result['total_tracks']} مسار حيوان منوي")
+        return analysis_result
+    
+    def lookup_result(self, media_path, patient_id, save_results, settings):
+        """
+        البحث في ذاكرة النتائج عن تحليل سابق لنفس الملف والنموذج والإعدادات
+        
+        عند الإصابة تعاد النتيجة المحفوظة بدون تشغيل النموذج، ولا يضاف صف جديد
+        في قاعدة البيانات إلا إذا لم تحفظ النتيجة سابقاً لنفس المريض.
+        
+        Args:
+            media_path: مسار الصورة أو الفيديو
+            patient_id: معرف المريض
+            save_results: حفظ النتائج في قاعدة البيانات
+            settings: إعدادات التحليل المؤثرة في النتيجة
             
-            # كشف الحيوانات المنوية
-            results = self.model(frame)[0]
-            
-            # تحضير البيانات للتتبع
-            detections = []
-            if results.boxes is not None:
-                for box in results.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    w, h = x2-x1, y2-y1
-                    conf = box.conf[0].cpu().numpy()
-                    
-                    detections.append(([int(x1), int(y1), int(w), int(h)], conf, 'sperm'))
-            
-            # التتبع
-            tracks = self.tracker.update_tracks(detections, frame=frame)
-            timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
-            
-            # حفظ بيانات التتبع
-            for track in tracks:
-                if track.is_confirmed() and track.track_id:
-                    tid = track.track_id
-                    x1, y1, x2, y2 = track.to_ltrb()
-                    center_x, center_y = (x1+x2)/2, (y1+y2)/2
-                    
-                    if tid not in self.tracks_data:
-                        self.tracks_data[tid] = []
-                    
-                    self.tracks_data[tid].append({
-                        'timestamp': timestamp_ms,
-                        'position': (center_x, center_y),
-                        'bbox': [x1, y1, x2, y2],
-                        'frame': frame_count
-                    })
-            
-            # رسم النتائج على الإطار
-            annotated_frame = self.draw_tracks(frame.copy(), tracks)
-            processed_frames.append(annotated_frame)
-            
-            frame_count += 1
-            
-            if frame_count % 30 == 0:
-                print(f"⏳ تم معالجة {frame_count}/{total_frames} إطار...")
-        
-        cap.release()
+        Returns:
+            tuple: (مدخل الذاكرة لـ store_result أو None، النتيجة المحفوظة أو None)
+        """
+        if self.result_cache is None:
+            return None, None
         
+        try:
+            if self.model_hash is None:
+                self.model_hash = model_version(self.model_path)
+            media_hash = file_hash(media_path)
+            cache_key, settings_json = ResultCache.make_key(media_hash, self.model_hash, settings)
+            cache_entry = (cache_key, media_hash, settings_json)
+            
+            result = self.result_cache.get(cache_key)
+        except Exception as e:
+            print(f"⚠️ تعذر استخدام ذاكرة النتائج: {e}")
+            return None, None
+        
+        if result is None:
+            return cache_entry, None
+        
+        print(f"♻️ نتيجة محفوظة مسبقاً: {media_path}")
+        if save_results and (result.get('test_result_id') is None
+                             or result.get('patient_id') != patient_id):
+            result['patient_id'] = patient_id
+            result['test_result_id'] = self.save_to_database(
+                result, copy_tracks_from=result.get('test_result_id'))
+            self.store_result(cache_entry, result)
+        
+        result['patient_id'] = patient_id
+        result['cached'] = True
+        return None, result
+    
+    def store_result(self, cache_entry, analysis_result, model_hash=None):
+        """
+        حفظ نتيجة تحليل في ذاكرة النتائج (cache_entry من lookup_result)
+        
+        النتيجة المؤجل حفظها في قاعدة البيانات تخزن بعد معرفة test_result_id في save_pending.
+        """
+        if cache_entry is None:
+            return
+        
+        if self.pending_saves and self.pending_saves[-1]['results'] is analysis_result:
+            self.pending_saves[-1].update(cache_entry=cache_entry, model_hash=self.model_hash)
+            return
+        
+        cache_key, media_hash, settings_json = cache_entry
+        try:
+            self.result_cache.put(cache_key, media_hash, model_hash or self.model_hash,
+                                  settings_json, analysis_result)
+        except Exception as e:
+            print(f"⚠️ تعذر حفظ النتيجة في ذاكرة النتائج: {e}")
+    
+    def build_video_result(self, patient_id, video_path, duration_seconds, fps, frame_count,
+                           analyzed_video_path=None):
+        """
+        حساب CASA وتصنيف الحركة من المسارات الحالية وتجميع نتائج تحليل الفيديو
+        
+        Returns:
+            dict: نتائج التحليل مع CASA metrics
+        """
         # حساب CASA metrics
         casa_metrics = self.calculate_casa_metrics()
         
         # تحليل الحركة
         motility_analysis = self.analyze_motility()
+        kinematics = self.track_kinematics()
         
         # إنشاء نتائج شاملة
         analysis_result = {
@@ -227,62 +528,693 @@ class SpermAnalyzer:
             'duration_seconds': duration_seconds,
             'fps': fps,
             'total_frames': frame_count,
-            'total_tracks': len(self.tracks_data),
-            'valid_tracks': len([t for t in self.tracks_data.values() if len(t) >= 10]),
+            'total_tracks': len(kinematics['track_id']),
+            'valid_tracks': int((kinematics['length'] >= self.min_track_length).sum()),
             'casa_metrics': casa_metrics,
             'motility_analysis': motility_analysis,
             'who_compliance': self.who_standards.check_full_compliance(casa_metrics),
-            'ai_confidence': casa_metrics.get('detection_confidence', 0)
+            'ai_confidence': casa_metrics.get('detection_confidence', 0),
+            'model_version': self.describe_model() if self.model_path else None
+        }
+        
+        if analyzed_video_path:
+            analysis_result['analyzed_video_path'] = analyzed_video_path
+        if self.propagated_frames is not None:
+            analysis_result['propagated_frames'] = self.propagated_frames
+        
+        if self.time_window:
+            time_series = self.calculate_time_series()
+            if time_series:
+                analysis_result['motility_time_series'] = time_series
+        
+        return analysis_result
+    
+    def detection_settings(self, duration_seconds):
+        """
+        إعدادات الكشف التي تحدد محتوى ذاكرة الكشوفات (جزء من اسم الملف وبياناته الوصفية)
+        
+        تحليل الفيديو لا يستخدم البلاطات فلا تدخل في الإعدادات.
+        
+        Args:
+            duration_seconds: مدة التحليل بالثواني
+        """
+        return {
+            'duration_seconds': duration_seconds,
+            'keyframe_interval': self.keyframe_interval,
+            'max_flow_error': self.max_flow_error if self.keyframe_interval > 1 else None,
+            'conf_threshold': getattr(self.model, 'conf_threshold', DEFAULT_CONF_THRESHOLD),
+            'iou_threshold': getattr(self.model, 'iou_threshold', DEFAULT_IOU_THRESHOLD),
         }
+    
+    def save_detection_cache(self, video_path, fps, duration_seconds):
+        """
+        حفظ كشوفات الفيديو المسجلة باسم مشتق من بصمتي الفيديو والنموذج وإعدادات الكشف
+        
+        Returns:
+            str: مسار ملف الكشوفات أو None عند الفشل
+        """
+        try:
+            media_hash = file_hash(video_path)
+            model_hash = model_version(self.model_path)
+            settings = self.detection_settings(duration_seconds)
+            path = cache_path(self.detection_cache_dir, media_hash, model_hash, settings)
+            
+            self.detection_recorder.save(path, {
+                'media_path': os.path.abspath(video_path),
+                'media_hash': media_hash,
+                'model_path': self.model_path,
+                'model_hash': model_hash,
+                'fps': fps,
+                'duration_seconds': duration_seconds,
+                'keyframe_interval': self.keyframe_interval,
+                'detection_settings': settings,
+            })
+            print(f"💾 تم حفظ الكشوفات: {path}")
+            return path
+            
+        except Exception as e:
+            print(f"❌ خطأ في حفظ ذاكرة الكشوفات: {e}")
+            return None
+        finally:
+            self.detection_recorder = None
+    
+    def replay_detections(self, detection_cache, patient_id, save_results=False,
+                          progress_callback=None, duration_seconds=None, keyframe_interval=None):
+        """
+        إعادة التتبع وحساب CASA من كشوفات محفوظة بدون تشغيل النموذج
+        
+        تستخدم إعدادات التتبع الحالية (المتتبع، max_age، n_init، pixel_to_micron، ...)،
+        أما المدة وفاصل الإطارات المفتاحية فمن ملف الكشوفات لأن الكشف لا يعاد.
+        أنظمة التتبع بالحركة تعمل من الكشوفات وحدها، أما DeepSort فيحتاج إطارات
+        الفيديو الأصلي لاستخراج المظهر فتُقرأ بدون كشف.
+        
+        Args:
+            detection_cache: مسار ملف الكشوفات أو DetectionCache
+            patient_id: معرف المريض
+            save_results: حفظ النتائج في قاعدة البيانات
+            progress_callback: دالة اختيارية تستدعى كل batch_size إطار (frame_count, total_frames)
+            duration_seconds: المدة المتوقعة للكشوفات المحفوظة (None = بدون مقارنة)
+            keyframe_interval: فاصل الإطارات المفتاحية المتوقع (None = بدون مقارنة)
+            
+        Returns:
+            dict: نتائج التحليل مع CASA metrics
+        """
+        cache = detection_cache
+        if not isinstance(cache, DetectionCache):
+            cache = DetectionCache(detection_cache)
+        metadata = cache.metadata
+        
+        # رفض الكشوفات عندما لا تطابق إعدادات طلبها المستدعي صراحة
+        mismatches = cache.mismatches({'duration_seconds': duration_seconds,
+                                       'keyframe_interval': keyframe_interval})
+        if mismatches:
+            details = ', '.join(f"{name}: {cached} != {expected}" for name, cached, expected in mismatches)
+            raise ValueError(f"إعدادات ملف الكشوفات لا تطابق الإعدادات المطلوبة ({details})")
+        
+        print(f"🔁 إعادة التتبع من الكشوفات: {cache.path} ({len(cache)} إطار)")
+        
+        cap = None
+        if self.tracker_name == 'deepsort':
+            cap = cv2.VideoCapture(metadata['media_path'])
+            if not cap.isOpened():
+                raise ValueError(f"DeepSort يحتاج إطارات الفيديو الأصلي: {metadata['media_path']}")
+            if len(cache):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(cache.frame_index[0]))
+        
+        self.reset_tracking()
+        frame_count = 0
+        
+        try:
+            for (frame_index, timestamp_ms, dets), propagated in zip(cache.frames(),
+                                                                      cache.propagated.tolist()):
+                frame = None
+                if cap is not None:
+                    ret, frame = cap.read()
+                    if not ret:
+                        raise ValueError(f"انتهى الفيديو قبل الإطار {frame_index}")
+                
+                self.track_detections(frame_index, timestamp_ms, dets, frame, propagated)
+                
+                frame_count += 1
+                if progress_callback is not None and (frame_count % self.batch_size == 0
+                                                      or frame_count == len(cache)):
+                    progress_callback(frame_count, len(cache))
+        finally:
+            if cap is not None:
+                cap.release()
+        
+        if self.online_casa is not None:
+            self.online_casa.finalize_all()
         
-        # حفظ الفيديو المحلل
-        analyzed_video_path = self.save_analyzed_video(processed_frames, video_path, fps)
-        analysis_result['analyzed_video_path'] = analyzed_video_path
+        analysis_result = self.build_video_result(patient_id, metadata['media_path'],
+                                                  metadata['duration_seconds'], metadata['fps'],
+                                                  frame_count)
+        analysis_result['replayed_from'] = cache.path
+        analysis_result['model_version'] = self.describe_model(metadata.get('model_path'),
+                                                               metadata.get('model_hash'))
         
         if save_results:
-            self.save_to_database(analysis_result)
+            analysis_result['test_result_id'] = self.save_to_database(analysis_result,
+                                                                      self.track_detail_rows())
         
-        print(f"✅ تم تحليل {len(self.tracks_data)} مسار حيوان منوي")
+        print(f"✅ تم تحليل {analysis_result['total_tracks']} مسار حيوان منوي")
         return analysis_result
     
+    def track_video(self, cap, video_path, fps, total_frames, first_frame_index=0,
+                    progress_callback=None):
+        """
+        كشف وتتبع إطارات الفيديو عبر خط المعالجة وتعبئة track_store
+        
+        Args:
+            cap: كائن cv2.VideoCapture عند أول إطار مطلوب
+            video_path: مسار الفيديو (لتسمية الفيديو المحلل)
+            fps: عدد الإطارات في الثانية
+            total_frames: عدد الإطارات المطلوب تحليلها
+            first_frame_index: رقم أول إطار في الفيديو الكامل (للمقاطع)
+            progress_callback: دالة اختيارية تستدعى بعد كل دفعة (frame_count, total_frames)
+            
+        Returns:
+            tuple: (عدد الإطارات المعالجة، مسار الفيديو المحلل أو None)
+        """
+        self.reset_tracking()
+        self.detection_recorder = DetectionRecorder() if self.detection_cache_dir else None
+        frame_count = 0
+        self.reset_flow()
+        
+        # خط المعالجة: فك الترميز ← الكشف والتتبع ← الرسم، بطوابير محدودة الحجم
+        frame_queue = queue.Queue(maxsize=self.queue_size)
+        stop_event = threading.Event()
+        errors = []
+        
+        decoder = threading.Thread(target=self.decode_frames,
+                                   args=(cap, total_frames, frame_queue, stop_event, errors),
+                                   daemon=True)
+        decoder.start()
+        
+        # في وضع المقاييس فقط لا توجد مرحلة رسم ولا ملف فيديو محلل
+        render_queue = video_writer = writer = analyzed_video_path = None
+        if not self.headless:
+            # فتح ملف الفيديو المحلل مسبقاً وكتابة الإطارات فور رسمها
+            frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            video_writer, analyzed_video_path = self.create_video_writer(video_path, fps, frame_size)
+            
+            render_queue = queue.Queue(maxsize=self.queue_size)
+            writer = threading.Thread(target=self.render_frames,
+                                      args=(render_queue, video_writer, errors),
+                                      daemon=True)
+            writer.start()
+        
+        # دفعة الإطارات المنتظرة للكشف
+        batch_frames = []
+        batch_timestamps = []
+        
+        print(f"📹 معالجة {total_frames} إطار بسرعة {fps} إطار/ثانية (دفعة {self.batch_size})")
+        
+        try:
+            while True:
+                item = frame_queue.get()
+                if item is None:
+                    break
+                
+                frame, timestamp_ms = item
+                batch_frames.append(frame)
+                batch_timestamps.append(timestamp_ms)
+                frame_count += 1
+                
+                if len(batch_frames) >= self.batch_size:
+                    self.process_frame_batch(batch_frames, batch_timestamps,
+                                             first_frame_index + frame_count - len(batch_frames),
+                                             render_queue)
+                    batch_frames, batch_timestamps = [], []
+                    print(f"⏳ تم معالجة {frame_count}/{total_frames} إطار...")
+                    if progress_callback is not None:
+                        progress_callback(frame_count, total_frames)
+                
+                if errors:
+                    break
+            
+            # معالجة ما تبقى من إطارات في الدفعة الأخيرة
+            if batch_frames and not errors:
+                self.process_frame_batch(batch_frames, batch_timestamps,
+                                         first_frame_index + frame_count - len(batch_frames),
+                                         render_queue)
+                if progress_callback is not None:
+                    progress_callback(frame_count, total_frames)
+        finally:
+            stop_event.set()
+            decoder.join()
+            if writer is not None:
+                render_queue.put(None)
+                writer.join()
+                video_writer.release()
+            cap.release()
+        
+        if errors:
+            raise errors[0]
+        
+        # المعايير جاهزة فور انتهاء آخر إطار
+        if self.online_casa is not None:
+            self.online_casa.finalize_all()
+        
+        return frame_count, analyzed_video_path
+        
+    def reset_tracking(self):
+        """مسح حالة التتبع من أي فيديو سابق (مهم عند إعادة استخدام المحلل في وضع العامل)"""
+        self.track_store = TrackStore()
+        self.propagated_frames = 0
+        self.online_casa = None
+        if self.online_metrics:
+            self.online_casa = OnlineCASA(self.casa_calculator.pixel_to_micron, max_age=self.max_age,
+                                          smoothing_window=self.casa_calculator.smoothing_window)
+        if self.tracker is None:
+            self.tracker = self.create_tracker()
+        else:
+            self.tracker.delete_all_tracks()
+    
+    def plan_segments(self, cap, total_frames):
+        """
+        تقسيم الإطارات المطلوبة إلى مقاطع متتالية للتحليل المتوازي
+        
+        لا يُقسم الفيديو إذا كان كل مقطع أقصر من ضعف نافذة التداخل.
+        
+        Returns:
+            list: قائمة (أول إطار، عدد إطارات المقطع بدون التداخل)
+        """
+        available = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if available > 0:
+            total_frames = min(total_frames, available)
+        
+        count = min(self.segments, total_frames // (2 * self.segment_overlap))
+        if count <= 1:
+            return [(0, total_frames)]
+        
+        length = -(-total_frames // count)
+        return [(start, min(length, total_frames - start))
+                for start in range(0, total_frames, length)]
+    
+    def track_video_segments(self, video_path, segments, progress_callback=None):
+        """
+        تحليل مقاطع الفيديو بالتوازي ثم ربط المسارات عند حدود المقاطع
+        
+        كل مقطع يحلل في عملية مستقلة بمفكك ترميز ونموذج ومتتبع خاص به،
+        ويعيد قراءة segment_overlap إطار بعد نهايته لربط المسارات.
+        
+        Args:
+            video_path: مسار الفيديو
+            segments: قائمة (أول إطار، عدد الإطارات) من plan_segments
+            progress_callback: دالة اختيارية تستدعى بعد اكتمال كل مقطع
+            
+        Returns:
+            int: عدد الإطارات المحللة
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        
+        total_frames = sum(length for _, length in segments)
+        print(f"📹 تحليل {total_frames} إطار في {len(segments)} مقاطع متوازية")
+        
+        segment_tracks = [None] * len(segments)
+        frame_count = 0
+        
+        with ProcessPoolExecutor(max_workers=len(segments)) as executor:
+            futures = {}
+            for index, (start, length) in enumerate(segments):
+                read_count = length + (self.segment_overlap if index < len(segments) - 1 else 0)
+                future = executor.submit(track_video_segment, self.segment_options,
+                                         video_path, start, read_count)
+                futures[future] = index
+            
+            for future in as_completed(futures):
+                index = futures[future]
+                segment_tracks[index], decoded = future.result()
+                frame_count += min(decoded, segments[index][1])
+                
+                print(f"⏳ اكتمل المقطع {index + 1}/{len(segments)}")
+                if progress_callback is not None:
+                    progress_callback(frame_count, total_frames)
+        
+        boundaries = [start for start, _ in segments[1:]]
+        self.online_casa = None
+        self.propagated_frames = None
+        self.track_store = stitch_segment_tracks(segment_tracks, boundaries, self.segment_overlap)
+        
+        return frame_count
+    
+    def create_tracker(self):
+        """تهيئة نظام التتبع المختار (DeepSort يستورد عند الحاجة فقط)"""
+        return create_tracker(self.tracker_name, max_age=self.max_age, n_init=self.n_init,
+                              **self.tracker_options)
+    
+    def extract_detections(self, results):
+        """
+        استخراج صناديق الكشف من نتائج النموذج بنقل واحد من الجهاز
+        
+        Args:
+            results: نتائج إطار واحد (ultralytics أو ONNX)
+            
+        Returns:
+            np.ndarray: مصفوفة كشوفات منظمة بصيغة DETECTION_DTYPE
+        """
+        if results.boxes is None:
+            return np.zeros(0, dtype=DETECTION_DTYPE)
+        
+        # مصفوفة (N, 6) كاملة: x1, y1, x2, y2, conf, cls
+        data = results.boxes.data
+        if not isinstance(data, np.ndarray):
+            data = data.cpu().numpy()
+        
+        return to_detections(data)
+    
+    def tracker_detections(self, dets):
+        """
+        تحويل مصفوفة الكشوفات إلى مدخلات المتتبع ([left, top, w, h], conf, class)
+        
+        Args:
+            dets: مصفوفة كشوفات بصيغة DETECTION_DTYPE
+        """
+        ltwh = np.column_stack([dets['x1'], dets['y1'],
+                                dets['x2'] - dets['x1'], dets['y2'] - dets['y1']]).astype(np.int64)
+        
+        return [(box, conf, 'sperm') for box, conf in zip(ltwh.tolist(), dets['conf'].tolist())]
+    
+    def detect_tiled(self, image):
+        """
+        كشف الحيوانات المنوية على بلاطات متداخلة بالدقة الأصلية
+        
+        تُمرر كل البلاطات للنموذج كدفعة واحدة ثم تُدمج الصناديق المكررة
+        في مناطق التداخل.
+        
+        Args:
+            image: صورة BGR
+            
+        Returns:
+            np.ndarray: مصفوفة كشوفات بصيغة DETECTION_DTYPE
+        """
+        height, width = image.shape[:2]
+        tile = self.tile_size
+        step = max(1, int(tile * (1 - self.tile_overlap)))
+        
+        # مواقع البلاطات مع محاذاة آخر بلاطة لحافة الصورة
+        xs = list(range(0, max(width - tile, 0) + 1, step))
+        ys = list(range(0, max(height - tile, 0) + 1, step))
+        if xs[-1] + tile < width:
+            xs.append(width - tile)
+        if ys[-1] + tile < height:
+            ys.append(height - tile)
+        
+        origins = [(x, y) for y in ys for x in xs]
+        tiles = [image[y:y + tile, x:x + tile] for x, y in origins]
+        
+        print(f"🧩 تحليل مجزأ: {len(tiles)} بلاطة بحجم {tile}px")
+        
+        # كشف كل البلاطات في تمريرة واحدة
+        all_dets = []
+        tile_ids = []
+        for index, ((x, y), results) in enumerate(zip(origins, self.model(tiles))):
+            dets = self.extract_detections(results)
+            dets['x1'] += x
+            dets['x2'] += x
+            dets['y1'] += y
+            dets['y2'] += y
+            all_dets.append(dets)
+            tile_ids.append(np.full(len(dets), index))
+        
+        dets = np.concatenate(all_dets)
+        if len(dets) == 0:
+            return dets
+        
+        # دمج الكشوفات المكررة بين البلاطات فقط (IoS يتعامل مع الصناديق المقطوعة عند الحواف)
+        # مع حد IoU الخاص بالنموذج داخل البلاطة الواحدة
+        keep = merge_tiles(detection_boxes(dets), dets['conf'], np.concatenate(tile_ids),
+                           iou_threshold=getattr(self.model, 'iou_threshold', DEFAULT_IOU_THRESHOLD))
+        
+        return dets[keep]
+    
+    def reset_flow(self):
+        """إعادة تهيئة حالة الإطارات المفتاحية والتدفق البصري لفيديو جديد"""
+        self.flow_interval = self.keyframe_interval
+        self.flow_error = 0.0
+        self.flow_gray = None
+        self.flow_boxes = {}
+        self.next_keyframe = 0
+    
+    def decode_frames(self, cap, total_frames, frame_queue, stop_event, errors):
+        """
+        مرحلة فك الترميز: قراءة الإطارات في خيط مستقل وتعبئة طابور الإطارات
+        
+        Args:
+            cap: كائن cv2.VideoCapture
+            total_frames: عدد الإطارات المطلوب قراءتها
+            frame_queue: طابور (frame, timestamp_ms) محدود الحجم
+            stop_event: إشارة الإيقاف من مرحلة الكشف
+            errors: قائمة مشتركة لتسجيل الأخطاء
+        """
+        try:
+            count = 0
+            while not stop_event.is_set() and count < total_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                
+                if not self.queue_put(frame_queue, (frame, cap.get(cv2.CAP_PROP_POS_MSEC)), stop_event):
+                    break
+                count += 1
+                
+        except Exception as e:
+            errors.append(e)
+        finally:
+            self.queue_put(frame_queue, None, stop_event)
+    
+    def render_frames(self, render_queue, video_writer, errors):
+        """
+        مرحلة الكتابة: رسم المسارات على الإطارات وترميزها في خيط مستقل
+        
+        Args:
+            render_queue: طابور (frame, overlays) محدود الحجم
+            video_writer: كائن cv2.VideoWriter المفتوح للفيديو المحلل
+            errors: قائمة مشتركة لتسجيل الأخطاء
+        """
+        while True:
+            item = render_queue.get()
+            if item is None:
+                break
+            
+            # بعد أي خطأ نستمر في تفريغ الطابور حتى لا تتوقف مرحلة الكشف
+            if errors:
+                continue
+            
+            try:
+                frame, overlays = item
+                annotated_frame = self.draw_tracks(frame, overlays)
+                
+                # تصغير الفيديو المحلل إذا طُلب ذلك
+                if self.output_scale != 1.0:
+                    annotated_frame = cv2.resize(annotated_frame, self.scaled_size(frame.shape),
+                                                 interpolation=cv2.INTER_AREA)
+                
+                video_writer.write(annotated_frame)
+            except Exception as e:
+                errors.append(e)
+    
+    def queue_put(self, target_queue, item, stop_event):
+        """إضافة عنصر لطابور محدود مع احترام إشارة الإيقاف"""
+        while not stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def process_frame_batch(self, frames, timestamps, first_frame_index, render_queue):
+        """
+        كشف دفعة من الإطارات بتمريرة واحدة ثم تمريرها للتتبع بترتيب الإطارات
+        
+        في وضع الإطارات المفتاحية تُكشف الإطارات المفتاحية فقط، وتُنقل صناديق
+        المسارات في الإطارات بينها بالتدفق البصري فيُسجل كل إطار بتوقيته الفعلي.
+        
+        Args:
+            frames: قائمة الإطارات (BGR)
+            timestamps: توقيت كل إطار بالميلي ثانية
+            first_frame_index: رقم أول إطار في الدفعة
+            render_queue: طابور مرحلة الرسم لإرسال (frame, overlays) إليه، أو None بدون رسم
+        """
+        # كشف الإطارات المفتاحية في الدفعة بتمريرة واحدة (قد لا تحتوي الدفعة إطاراً مفتاحياً
+        # إذا كانت أصغر من الفاصل بينها، و ultralytics لا يقبل قائمة فارغة)
+        key_offsets = self.plan_keyframes(first_frame_index, len(frames))
+        batch_results = {}
+        if key_offsets:
+            batch_results = dict(zip(key_offsets, self.model([frames[i] for i in key_offsets])))
+        
+        for offset, frame in enumerate(frames):
+            frame_index = first_frame_index + offset
+            timestamp_ms = timestamps[offset]
+            
+            dets = None
+            if offset not in batch_results:
+                # نقل المسارات بالتدفق البصري، أو كشف فوري إذا تجاوز الخطأ المتراكم الحد
+                dets = self.propagate_tracks(frame)
+                if dets is None:
+                    batch_results[offset] = self.model([frame])[0]
+            
+            propagated = dets is not None
+            if dets is None:
+                dets = self.extract_detections(batch_results[offset])
+            
+            if self.detection_recorder is not None:
+                self.detection_recorder.add(frame_index, timestamp_ms, dets, propagated)
+            
+            # التتبع وحفظ بيانات التتبع
+            tracks, boxes = self.track_detections(frame_index, timestamp_ms, dets, frame, propagated)
+            
+            if self.keyframe_interval > 1:
+                self.update_flow(frame, tracks, frame_index, keyframe=offset in batch_results)
+            
+            # إرسال الإطار مع لقطة من المسارات لمرحلة الرسم (مع تخطي الإطارات المستبعدة)
+            if render_queue is not None and frame_index % self.output_stride == 0:
+                render_queue.put((frame, self.track_overlays(boxes)))
+    
+    def track_detections(self, frame_index, timestamp_ms, dets, frame=None, propagated=False):
+        """
+        تمرير كشوفات إطار واحد للمتتبع وحفظ مواضع المسارات المؤكدة
+        
+        نفس الخطوة في التحليل وفي إعادة التتبع من الكشوفات المحفوظة.
+        
+        Args:
+            frame_index: رقم الإطار
+            timestamp_ms: توقيت الإطار بالميلي ثانية
+            dets: مصفوفة كشوفات بصيغة DETECTION_DTYPE
+            frame: الإطار (BGR) لاستخراج المظهر في DeepSort، أو None
+            propagated: الصناديق منقولة بالتدفق البصري وليست من النموذج
+            
+        Returns:
+            tuple: (مسارات المتتبع، قائمة (track_id, ltrb) للمسارات المؤكدة)
+        """
+        tracks = self.tracker.update_tracks(self.tracker_detections(dets), frame=frame)
+        boxes = [(track.track_id, track.to_ltrb()) for track in tracks
+                 if track.is_confirmed() and track.track_id]
+        
+        if propagated and self.propagated_frames is not None:
+            self.propagated_frames += 1
+        self.record_tracks(frame_index, timestamp_ms, boxes)
+        return tracks, boxes
+    
+    def record_tracks(self, frame_index, timestamp_ms, boxes):
+        """
+        حفظ مواضع المسارات المؤكدة في إطار (أو تحديث المجمعات فقط في وضع online_metrics)
+        
+        Args:
+            frame_index: رقم الإطار
+            timestamp_ms: توقيت الإطار بالميلي ثانية
+            boxes: قائمة (track_id, ltrb)
+        """
+        track_ids, ltrbs = [tid for tid, _ in boxes], [ltrb for _, ltrb in boxes]
+        if self.online_casa is not None:
+            self.online_casa.update(frame_index, timestamp_ms, track_ids, ltrbs)
+        else:
+            self.track_store.append_frame(frame_index, timestamp_ms, track_ids, ltrbs)
+    
+    def plan_keyframes(self, first_frame_index, count):
+        """
+        اختيار الإطارات التي تحتاج كشفاً في الدفعة
+        
+        Returns:
+            list: فهارس الإطارات المفتاحية داخل الدفعة
+        """
+        if self.keyframe_interval <= 1:
+            return list(range(count))
+        
+        start = max(self.next_keyframe - first_frame_index, 0)
+        return list(range(start, count, self.flow_interval))
+    
+    def update_flow(self, frame, tracks, frame_index, keyframe):
+        """
+        تحديث حالة التدفق البصري بعد التتبع وتكييف الفاصل بين الإطارات المفتاحية
+        
+        Args:
+            frame: الإطار الحالي
+            tracks: مسارات المتتبع بعد التحديث
+            frame_index: رقم الإطار
+            keyframe: هل كُشف الإطار بالنموذج
+        """
+        # ننقل المسارات التي طابقت كشفاً في هذا الإطار فقط
+        # مع ثقة آخر كشف للمسار (الصناديق المنقولة ترث ثقة الكشف الذي نقلت منه)
+        self.flow_boxes = {track.track_id: (track.to_ltrb(), track.det_conf) for track in tracks
+                           if track.time_since_update == 0}
+        
+        if not keyframe:
+            return
+        
+        # خطأ منخفض: نباعد الإطارات المفتاحية، خطأ مرتفع: نقاربها
+        if self.flow_error <= self.max_flow_error / 2:
+            self.flow_interval = min(self.flow_interval + 1, self.keyframe_interval)
+        else:
+            self.flow_interval = max(1, self.flow_interval // 2)
+        
+        self.flow_error = 0.0
+        self.flow_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.next_keyframe = frame_index + self.flow_interval
+    
+    def propagate_tracks(self, frame):
+        """
+        نقل صناديق المسارات إلى الإطار الحالي بتدفق Lucas-Kanade على مراكزها
+        
+        الصناديق المنقولة تُمرر للمتتبع ككشوفات حتى تبقى حالته متزامنة مع كل إطار.
+        
+        Args:
+            frame: الإطار الحالي (BGR)
+            
+        Returns:
+            np.ndarray: كشوفات بصيغة DETECTION_DTYPE أو None إذا لزم كشف بالنموذج
+        """
+        if self.flow_gray is None or self.flow_error > self.max_flow_error:
+            return None
+        
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        dets = np.zeros(0, dtype=DETECTION_DTYPE)
+        
+        if self.flow_boxes:
+            boxes = np.array([ltrb for ltrb, _ in self.flow_boxes.values()], dtype=np.float32)
+            conf = np.array([1.0 if c is None else c for _, c in self.flow_boxes.values()],
+                            dtype=np.float32)
+            centers = np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2,
+                                       (boxes[:, 1] + boxes[:, 3]) / 2]).reshape(-1, 1, 2)
+            
+            # تدفق أمامي ثم عكسي لقياس خطأ كل نقطة
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.flow_gray, gray, centers, None,
+                                                        winSize=(15, 15), maxLevel=2)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.flow_gray, moved, None,
+                                                            winSize=(15, 15), maxLevel=2)
+            
+            fb_error = np.linalg.norm((centers - back).reshape(-1, 2), axis=1)
+            valid = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error <= self.max_flow_error)
+            
+            self.flow_error += float(fb_error[valid].mean()) if valid.any() else np.inf
+            if self.flow_error > self.max_flow_error:
+                return None
+            
+            shift = (moved - centers).reshape(-1, 2)
+            boxes = boxes[valid] + np.column_stack([shift[valid], shift[valid]])
+            dets = to_detections(np.column_stack([boxes, conf[valid]]))
+        
+        self.flow_gray = gray
+        return dets
+    
     def calculate_casa_metrics(self):
         """حساب معايير CASA من بيانات التتبع"""
-        if not self.tracks_data:
+        kinematics = self.track_kinematics()
+        if not len(kinematics['track_id']):
             return {}
         
         print("📊 حساب معايير CASA...")
         
-        all_vcl, all_vsl, all_vap = [], [], []
-        all_lin, all_str, all_wob = [], [], []
-        all_alh, all_bcf = [], []
-        
-        for track_id, positions in self.tracks_data.items():
-            if len(positions) < 10:  # تحتاج 10 نقاط على الأقل
-                continue
-            
-            # استخراج المواضع والأوقات
-            times = [p['timestamp'] for p in positions]
-            coords = [p['position'] for p in positions]
-            
-            # حساب السرعات
-            vcl, vsl, vap = self.casa_calculator.calculate_velocities(coords, times)
-            lin, str_val, wob = self.casa_calculator.calculate_linearity_params(vcl, vsl, vap)
-            alh = self.casa_calculator.calculate_amplitude_lateral_head(coords)
-            bcf = self.casa_calculator.calculate_beat_frequency(coords, times)
-            
-            if vcl > 0:  # قيم صالحة فقط
-                all_vcl.append(vcl)
-                all_vsl.append(vsl)
-                all_vap.append(vap)
-                all_lin.append(lin)
-                all_str.append(str_val)
-                all_wob.append(wob)
-                all_alh.append(alh)
-                all_bcf.append(bcf)
+        # مسارات من min_track_length نقطة على الأقل وبقيم صالحة فقط
+        valid = (kinematics['length'] >= self.min_track_length) & (kinematics['vcl'] > 0)
+        all_vcl, all_vsl, all_vap = kinematics['vcl'][valid], kinematics['vsl'][valid], kinematics['vap'][valid]
+        all_lin, all_str, all_wob = kinematics['lin'][valid], kinematics['str'][valid], kinematics['wob'][valid]
         
         # حساب المتوسطات
         casa_metrics = {}
-        if all_vcl:
+        if len(all_vcl):
             casa_metrics = {
                 'vcl_mean': np.mean(all_vcl),
                 'vsl_mean': np.mean(all_vsl),
@@ -290,47 +1222,114 @@ class SpermAnalyzer:
                 'lin_mean': np.mean(all_lin),
                 'str_mean': np.mean(all_str),
                 'wob_mean': np.mean(all_wob),
-                'alh_mean': np.mean(all_alh),
-                'bcf_mean': np.mean(all_bcf),
+            }
+            
+            # ALH / BCF حول خط البداية والنهاية، أو حول المسار المتوسط في وضع online_metrics
+            # (تعريف مختلف فيحفظ بمفاتيح مختلفة)
+            for name in ('alh', 'bcf', 'alh_avgpath', 'bcf_avgpath'):
+                if name in kinematics:
+                    casa_metrics[f'{name}_mean'] = np.mean(kinematics[name][valid])
+            
+            casa_metrics.update({
                 'vcl_std': np.std(all_vcl),
                 'vsl_std': np.std(all_vsl),
                 'detection_confidence': 0.9  # ثقة عالية في القياسات
-            }
+            })
         
         return casa_metrics
     
+    def calculate_time_series(self):
+        """
+        السلسلة الزمنية للحركة كل time_window ثانية من بيانات التتبع
+        
+        تحتاج نقاط المسارات المخزنة، فلا تتوفر في وضع online_metrics.
+        
+        Returns:
+            dict: مدة النافذة وقوائم لكل نافذة (start_s, tracks, vcl_mean, vsl_mean,
+                  progressive_percent)، أو {} بدون بيانات
+        """
+        if not self.track_store.num_points:
+            if self.online_casa is not None:
+                print("ℹ️ السلسلة الزمنية للحركة غير متوفرة في وضع المقاييس أثناء التتبع")
+            return {}
+        
+        times, coords, offsets = self.track_store.columns()
+        series = self.casa_calculator.calculate_time_series(coords, times, offsets, self.time_window)
+        
+        time_series = {'window_seconds': self.time_window}
+        time_series.update({name: values.tolist() for name, values in series.items()})
+        return time_series
+    
+    def track_kinematics(self):
+        """
+        جدول حركيات المسارات: يحسب مرة واحدة لكل تحليل ويشترك فيه
+        calculate_casa_metrics و analyze_motility
+        
+        في وضع online_metrics يقرأ الجدول من المجمعات، وإلا يحسب من track_store.
+        
+        Returns:
+            dict: مصفوفات لكل مسار: track_id, length,
+                  vcl, vsl, vap, lin, str, wob, alh, bcf, pattern, grade
+                  (alh_avgpath و bcf_avgpath بدلاً من alh و bcf في وضع online_metrics)
+        """
+        source = self.online_casa if self.online_casa is not None else self.track_store
+        if self.kinematics is not None and self.kinematics_source[0] is source \
+                and self.kinematics_source[1] == source.num_points:
+            return self.kinematics
+        
+        if self.online_casa is not None:
+            table = self.online_casa.table()
+        else:
+            times, coords, offsets = source.columns()
+            table = self.casa_calculator.calculate_batch(coords, times, offsets)
+            table['track_id'] = source.track_ids()
+            table['length'] = np.diff(offsets)
+        
+        self.classify_kinematics(table)
+        self.kinematics = table
+        self.kinematics_source = (source, source.num_points)
+        return table
+    
+    def classify_kinematics(self, table):
+        """إضافة نمط الحركة وتصنيف WHO لكل مسار في جدول الحركيات"""
+        table['pattern'] = self.casa_calculator.movement_patterns(
+            table['vcl'], table['vsl'], table['lin'], table['str'], table.get('alh'))
+        
+        # المسارات الأقصر من 5 نقاط لا تكفي لتقدير الحركة فتعد غير متحركة
+        table['grade'] = np.where(table['length'] >= 5,
+                                  self.casa_calculator.who_grades(table['vsl'], table['lin'], table['vcl']),
+                                  'D')
+        return table
+    
+    def live_motility(self):
+        """
+        تصنيف الحركة المؤقت أثناء التسجيل من المسارات المنتهية والحية
+        
+        Returns:
+            dict: عدد المسارات لكل تصنيف WHO، أو {} بدون online_metrics
+        """
+        if self.online_casa is None:
+            return {}
+        
+        grades = self.classify_kinematics(self.online_casa.table(include_active=True))['grade']
+        return {grade: int((grades == grade).sum()) for grade in ('A', 'B', 'C', 'D')}
+    
     def analyze_motility(self):
         """تحليل أنواع الحركة حسب معايير WHO"""
-        if not self.tracks_data:
+        kinematics = self.track_kinematics()
+        if not len(kinematics['track_id']):
             return {}
         
-        rapid_progressive = 0  # Grade A
-        slow_progressive = 0   # Grade B
-        non_progressive = 0    # Grade C
-        immotile = 0          # Grade D
+        # نفس تصنيف CASACalculator.get_who_grade من جدول الحركيات المشترك:
+        # A يشترط VSL ≥ 25 و LIN ≥ 50، و B يشترط VSL ≥ 5 و LIN ≥ 25 (القاعدة القديمة
+        # هنا كانت VSL وحدها، فالمسار السريع المتعرج كان A وأصبح B أو C)
+        grades = kinematics['grade']
+        rapid_progressive = int((grades == 'A').sum())
+        slow_progressive = int((grades == 'B').sum())
+        non_progressive = int((grades == 'C').sum())
+        immotile = int((grades == 'D').sum())
         
-        for track_id, positions in self.tracks_data.items():
-            if len(positions) < 5:
-                immotile += 1
-                continue
-            
-            # حساب السرعة المتوسطة
-            coords = [p['position'] for p in positions]
-            times = [p['timestamp'] for p in positions]
-            
-            vcl, vsl, _ = self.casa_calculator.calculate_velocities(coords, times)
-            
-            # تصنيف الحركة حسب WHO
-            if vsl >= 25:  # سرعة خطية ≥ 25 μm/s
-                rapid_progressive += 1
-            elif vsl >= 5:  # سرعة خطية 5-24 μm/s
-                slow_progressive += 1
-            elif vcl >= 5:  # حركة في المكان
-                non_progressive += 1
-            else:
-                immotile += 1
-        
-        total = len(self.tracks_data)
+        total = len(grades)
         
         return {
             'rapid_progressive_count': rapid_progressive,
@@ -361,27 +1360,37 @@ class SpermAnalyzer:
         
         return image
     
-    def draw_tracks(self, frame, tracks):
+    def track_overlays(self, boxes):
+        """
+        لقطة من المسارات المؤكدة للرسم: (track_id, ltrb, آخر 10 نقاط)
+        
+        تُؤخذ اللقطة في مرحلة التتبع حتى لا تقرأ مرحلة الرسم بيانات تتغير أثناء الرسم.
+        
+        Args:
+            boxes: قائمة (track_id, ltrb) للمسارات في الإطار الحالي
+        """
+        store = self.online_casa if self.online_casa is not None else self.track_store
+        return [(tid, ltrb, store.tail(tid, 10)) for tid, ltrb in boxes]
+    
+    def draw_tracks(self, frame, overlays):
         """رسم مسارات التتبع على الإطار"""
-        for track in tracks:
-            if track.is_confirmed() and track.track_id:
-                x1, y1, x2, y2 = map(int, track.to_ltrb())
-                
-                # رسم مربع التتبع
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                
-                # كتابة معرف التتبع
-                cv2.putText(frame, f'ID: {track.track_id}', 
-                           (x1, y1-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        for track_id, ltrb, points in overlays:
+            x1, y1, x2, y2 = map(int, ltrb)
+            
+            # رسم مربع التتبع
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            
+            # كتابة معرف التتبع
+            cv2.putText(frame, f'ID: {track_id}', 
+                       (x1, y1-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+            
+            # رسم المسار
+            if len(points) > 1:
+                points = [(int(p[0]), int(p[1])) for p in points]
                 
-                # رسم المسار
-                if track.track_id in self.tracks_data and len(self.tracks_data[track.track_id]) > 1:
-                    points = [p['position'] for p in self.tracks_data[track.track_id][-10:]]
-                    points = [(int(p[0]), int(p[1])) for p in points]
-                    
-                    for i in range(1, len(points)):
-                        cv2.line(frame, points[i-1], points[i], (255, 0, 0), 2)
+                for i in range(1, len(points)):
+                    cv2.line(frame, points[i-1], points[i], (255, 0, 0), 2)
         
         return frame
     
@@ -416,8 +1425,23 @@ class SpermAnalyzer:
         cv2.imwrite(output_path, image)
         return output_path
     
-    def save_analyzed_video(self, frames, original_path, fps):
-        """حفظ الفيديو المحلل"""
+    def scaled_size(self, shape):
+        """أبعاد الفيديو المحلل (width, height) بعد تطبيق output_scale"""
+        height, width = shape[:2]
+        return (max(1, int(width * self.output_scale)), max(1, int(height * self.output_scale)))
+    
+    def create_video_writer(self, original_path, fps, frame_size):
+        """
+        فتح ملف الفيديو المحلل للكتابة المتدفقة
+        
+        Args:
+            original_path: مسار الفيديو الأصلي
+            fps: معدل إطارات الفيديو الأصلي
+            frame_size: (width, height) للإطارات الأصلية
+            
+        Returns:
+            tuple: (cv2.VideoWriter, مسار الملف)
+        """
         filename = os.path.basename(original_path)
         name, ext = os.path.splitext(filename)
         new_filename = f"{name}_analyzed{ext}"
@@ -425,17 +1449,11 @@ class SpermAnalyzer:
         output_path = os.path.join("outputs", new_filename)
         os.makedirs("outputs", exist_ok=True)
         
-        if frames:
-            height, width, _ = frames[0].shape
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-            
-            for frame in frames:
-                out.write(frame)
-            
-            out.release()
+        width, height = self.scaled_size((frame_size[1], frame_size[0]))
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_path, fourcc, fps / self.output_stride, (width, height))
         
-        return output_path
+        return out, output_path
     
     def estimate_concentration_from_image(self, count):
         """تقدير التركيز من عدد الحيوانات المنوية في الصورة"""
@@ -443,15 +1461,107 @@ class SpermAnalyzer:
         estimated_concentration = count * 2.5  # مليون/مل
         return estimated_concentration
     
-    def save_to_database(self, results):
-        """حفظ النتائج في قاعدة البيانات"""
+    def save_to_database(self, results, track_details=None, copy_tracks_from=None):
+        """
+        حفظ النتائج في قاعدة البيانات
+        
+        Args:
+            results: نتائج التحليل
+            track_details: صفوف جداول المسارات من track_detail_rows (None = بدونها)
+            copy_tracks_from: test_result_id سابق لنفس التحليل تنسخ صفوف مساراته
+                              (إعادة حفظ نتيجة من ذاكرة النتائج)
+        
+        Returns:
+            int: test_result_id للصف المضاف، أو None عند تأجيل الحفظ (pending_saves)
+        
+        Raises:
+            RuntimeError: إذا فشل الحفظ (مثلاً بقاء قاعدة البيانات مقفلة بعد كل المحاولات)
+        """
+        if self.pending_saves is not None:
+            # وضع الدفعات: العملية الرئيسية تكتب نتائج كل العمليات بكاتب واحد
+            self.pending_saves.append({'results': results, 'track_details': track_details,
+                                       'copy_tracks_from': copy_tracks_from})
+            return None
+        
+        test_result_ids, errors = self.save_many_to_database([results], [track_details],
+                                                             [copy_tracks_from])
+        if errors[0] is not None:
+            raise RuntimeError(f"فشل حفظ النتائج في قاعدة البيانات: {errors[0]}") from errors[0]
+        return test_result_ids[0]
+    
+    def save_many_to_database(self, results_list, track_details_list=None, copy_tracks_list=None):
+        """
+        حفظ عدة نتائج في معاملة واحدة عبر كاتب قاعدة البيانات المشترك
+        
+        فشل نتيجة واحدة يبقى محصوراً فيها (SAVEPOINT لكل نتيجة).
+        
+        Args:
+            results_list: قائمة نتائج التحليل
+            track_details_list: صفوف جداول المسارات لكل نتيجة (اختياري)
+            copy_tracks_list: test_result_id سابق لكل نتيجة تنسخ صفوف مساراته (اختياري)
+        
+        Returns:
+            tuple: (test_result_id لكل نتيجة أو None، الخطأ لكل نتيجة أو None) بنفس الترتيب
+        """
+        count = len(results_list)
+        track_details_list = track_details_list or [None] * count
+        copy_tracks_list = copy_tracks_list or [None] * count
+        
+        test_result_ids = [None] * count
+        errors = [None] * count
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # تحضير البيانات للإدراج
-            data = self.prepare_database_data(results)
-            
+            if self.db_writer is None:
+                self.db_writer = get_writer(self.db_path, schema=RESULT_TABLES_SQL)
+            futures = self.db_writer.submit_many([
+                self.insert_job(results, track_details, copy_tracks_from)
+                for results, track_details, copy_tracks_from in zip(
+                    results_list, track_details_list, copy_tracks_list)])
+        except Exception as e:
+            return test_result_ids, [e] * count
+        
+        for index, future in enumerate(futures):
+            try:
+                test_result_ids[index] = future.result()
+            except Exception as e:
+                errors[index] = e
+        
+        saved = count - sum(1 for error in errors if error is not None)
+        if saved:
+            print(f"✅ تم حفظ النتائج في قاعدة البيانات ({saved})")
+        return test_result_ids, errors
+    
+    def save_pending(self, pending_saves):
+        """
+        كتابة الحفظ المؤجل من محللات أخرى (pending_saves) في معاملة واحدة
+        
+        يضبط test_result_id في كل نتيجة محفوظة ويخزنها في ذاكرة النتائج.
+        
+        Returns:
+            list: الخطأ لكل عنصر أو None بنفس الترتيب
+        """
+        test_result_ids, errors = self.save_many_to_database(
+            [item['results'] for item in pending_saves],
+            [item['track_details'] for item in pending_saves],
+            [item['copy_tracks_from'] for item in pending_saves])
+        
+        for item, test_result_id, error in zip(pending_saves, test_result_ids, errors):
+            if error is None:
+                item['results']['test_result_id'] = test_result_id
+                self.store_result(item.get('cache_entry'), item['results'], item.get('model_hash'))
+        return errors
+    
+    def insert_job(self, results, track_details=None, copy_tracks_from=None):
+        """
+        مهمة كتابة نتيجة واحدة مع جداولها الفرعية (تنفذ في خيط الكاتب داخل معاملته)
+        
+        Returns:
+            callable: دالة تستقبل cursor وتعيد test_result_id
+        """
+        # تحضير البيانات للإدراج في خيط المستدعي
+        data = self.prepare_database_data(results)
+        time_series = results.get('motility_time_series')
+        
+        def insert(cursor):
             # إدراج في جدول semen_analysis
             cursor.execute("""
                 INSERT INTO semen_analysis (
@@ -464,13 +1574,146 @@ class SpermAnalyzer:
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, data)
             
-            conn.commit()
-            conn.close()
-            
-            print("✅ تم حفظ النتائج في قاعدة البيانات")
-            
-        except Exception as e:
-            print(f"❌ خطأ في حفظ قاعدة البيانات: {e}")
+            test_result_id = cursor.lastrowid
+            if time_series:
+                self.save_time_series(cursor, test_result_id, time_series)
+            if track_details:
+                self.save_track_details(cursor, test_result_id, *track_details)
+            elif copy_tracks_from is not None:
+                self.copy_track_details(cursor, copy_tracks_from, test_result_id)
+            return test_result_id
+        
+        return insert
+    
+    def save_time_series(self, cursor, test_result_id, time_series):
+        """
+        حفظ السلسلة الزمنية للحركة في جدول motility_time_series مرتبطة بنتيجة التحليل
+        
+        Args:
+            cursor: مؤشر قاعدة البيانات داخل نفس معاملة الإدراج
+            test_result_id: معرف صف semen_analysis
+            time_series: كتلة motility_time_series من نتائج التحليل
+        """
+        window_seconds = time_series['window_seconds']
+        cursor.executemany("""
+            INSERT INTO motility_time_series (
+                test_result_id, window_start_seconds, window_seconds, tracks_count,
+                vcl_mean_um_s, vsl_mean_um_s, progressive_percent
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(test_result_id, start, window_seconds, tracks, vcl, vsl, progressive)
+              for start, tracks, vcl, vsl, progressive in zip(
+                  time_series['start_s'], time_series['tracks'], time_series['vcl_mean'],
+                  time_series['vsl_mean'], time_series['progressive_percent'])])
+    
+    def track_detail_rows(self):
+        """
+        صفوف الجداول الفرعية للمسارات من التحليل الحالي
+        
+        النقاط تحتاج track_store، فلا تتوفر في وضع online_metrics.
+        
+        Returns:
+            tuple: (صفوف sperm_track_kinematics، صفوف sperm_track_points أو قائمة فارغة)
+        """
+        kinematics = self.track_kinematics()
+        
+        # لكل تعريف لـ ALH / BCF أعمدته، والتعريف غير المحسوب يحفظ NULL
+        count = len(kinematics['track_id'])
+        optional = [kinematics[name].tolist() if name in kinematics else [None] * count
+                    for name in ('alh', 'bcf', 'alh_avgpath', 'bcf_avgpath')]
+        kinematic_rows = [
+            (str(track_id), int(length), float(vcl), float(vsl), float(vap), float(lin),
+             float(str_val), float(wob), alh, bcf, alh_avgpath, bcf_avgpath, str(pattern), str(grade))
+            for (track_id, length, vcl, vsl, vap, lin, str_val, wob, pattern, grade,
+                 alh, bcf, alh_avgpath, bcf_avgpath) in zip(
+                kinematics['track_id'], kinematics['length'], kinematics['vcl'], kinematics['vsl'],
+                kinematics['vap'], kinematics['lin'], kinematics['str'], kinematics['wob'],
+                kinematics['pattern'], kinematics['grade'], *optional)
+        ]
+        
+        point_rows = []
+        if self.trajectory_stride:
+            if not self.track_store.num_points:
+                print("ℹ️ نقاط المسارات غير متوفرة في وضع المقاييس أثناء التتبع")
+            stride = max(1, int(self.trajectory_stride))
+            for track_id, view in self.track_store.items():
+                track_id = str(track_id)
+                point_rows.extend(
+                    (track_id, int(frame), float(t), float(x), float(y))
+                    for frame, t, x, y in zip(view.frame[::stride], view.t[::stride],
+                                              view.x[::stride], view.y[::stride]))
+        
+        return kinematic_rows, point_rows
+    
+    def save_track_details(self, cursor, test_result_id, kinematic_rows, point_rows):
+        """
+        حفظ معايير كل مسار ونقاطه المختصرة مرتبطة بنتيجة التحليل
+        
+        Args:
+            cursor: مؤشر قاعدة البيانات داخل نفس معاملة الإدراج
+            test_result_id: معرف صف semen_analysis
+            kinematic_rows: صفوف track_detail_rows لجدول sperm_track_kinematics
+            point_rows: صفوف track_detail_rows لجدول sperm_track_points
+        """
+        cursor.executemany("""
+            INSERT INTO sperm_track_kinematics (
+                test_result_id, track_id, points_count, vcl_um_s, vsl_um_s, vap_um_s,
+                lin_percent, str_percent, wob_percent, alh_um, bcf_hz,
+                alh_avgpath_um, bcf_avgpath_hz, movement_pattern, who_grade
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(test_result_id,) + row for row in kinematic_rows])
+        
+        if not point_rows:
+            return
+        
+        cursor.executemany("""
+            INSERT INTO sperm_track_points (
+                test_result_id, track_id, frame_index, timestamp_ms, x_px, y_px
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        """, [(test_result_id,) + row for row in point_rows])
+    
+    def copy_track_details(self, cursor, source_id, test_result_id):
+        """نسخ صفوف المسارات المحفوظة لنتيجة سابقة إلى صف نتيجة جديد"""
+        for table, columns in (
+                ('sperm_track_kinematics',
+                 'track_id, points_count, vcl_um_s, vsl_um_s, vap_um_s, lin_percent, str_percent, '
+                 'wob_percent, alh_um, bcf_hz, alh_avgpath_um, bcf_avgpath_hz, '
+                 'movement_pattern, who_grade'),
+                ('sperm_track_points', 'track_id, frame_index, timestamp_ms, x_px, y_px')):
+            cursor.execute(f"""
+                INSERT INTO {table} (test_result_id, {columns})
+                SELECT ?, {columns} FROM {table} WHERE test_result_id = ?
+            """, (test_result_id, source_id))
+    
+    def describe_model(self, model_path=None, model_hash=None, tracker=True):
+        """
+        نص إصدار النموذج المحفوظ مع النتيجة (ai_model_version)
+        
+        يميز واجهة التشغيل والنموذج وبصمته ونظام التتبع، مثل
+        'ONNX-INT8:sperm-analyzer-v1-int8@3fa2c1d0/SORT'.
+        
+        Args:
+            model_path: مسار النموذج (افتراضي: نموذج المحلل)
+            model_hash: بصمة النموذج إن كانت معروفة (مثل بيانات ذاكرة الكشوفات)
+            tracker: إضافة نظام التتبع (تحليل الفيديو)
+        """
+        if model_path is None:
+            model_path = self.model_path
+            if self.model_hash is None:
+                self.model_hash = model_version(model_path)
+            model_hash = self.model_hash
+        elif model_hash is None:
+            model_hash = model_version(model_path)
+        
+        name, extension = os.path.splitext(os.path.basename(str(model_path)))
+        if extension.lower() == '.onnx':
+            backend = 'ONNX-INT8' if 'int8' in name.lower() else 'ONNX'
+        else:
+            backend = 'YOLOv8-PT'
+        
+        label = f"{backend}:{name}@{model_hash[:8]}"
+        if tracker:
+            label += '/' + TRACKER_LABELS.get(self.tracker_name, self.tracker_name)
+        return label
     
     def prepare_database_data(self, results):
         """تحضير البيانات للحفظ في قاعدة البيانات"""
@@ -481,7 +1724,7 @@ class SpermAnalyzer:
             results['patient_id'],
             datetime.now(),
             True,  # ai_analysis_performed
-            'YOLOv8-DeepSORT-v1.0',
+            results.get('model_version') or 'YOLOv8-DeepSORT-v1.0',
             results.get('ai_confidence', 0),
             casa_metrics.get('vcl_mean', 0),
             casa_metrics.get('vsl_mean', 0),
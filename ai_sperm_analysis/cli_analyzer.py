@@ -7,13 +7,49 @@ Sky CASA - Command Line Interface for C# Integration
 Usage:
 python cli_analyzer.py --type image --media "path/to/image.jpg" --patient 1
 python cli_analyzer.py --type video --media "path/to/video.mp4" --patient 1 --duration 15
+
+Worker mode (model loaded once, JSON lines over stdin/stdout):
+python cli_analyzer.py --worker --model onnx
+  stdin:  {"id": "a1", "type": "video", "media": "path/to/video.mp4", "patient": 1, "duration": 15}
+          {"command": "shutdown"}
+  stdout: {"event": "ready", ...} / {"event": "progress", ...} / {"event": "result", ...} / {"event": "error", ...}
+
+Batch mode (directory, glob or manifest; NDJSON results in completion order):
+python cli_analyzer.py --batch "archive/2024-05" --patient 1 --jobs 4 --model onnx
+python cli_analyzer.py --batch "archive/**/*.mp4" --patient 1
+python cli_analyzer.py --batch manifest.txt   (one "path" or "path,patient_id" per line)
+
+Detection cache and replay (re-track and recompute CASA without running the model):
+python cli_analyzer.py --type video --media "path/to/video.mp4" --patient 1 --detection-cache cache
+python cli_analyzer.py --replay cache/<media>_<model>_<settings>.npz --tracker sort --max-age 20 --output json
+  The cache file is named from hashes of the video, the model and the detection settings
+  (duration, keyframe interval, flow error, confidence/IoU thresholds), so each of them is
+  part of the cache identity; the analysis prints the path ("💾 ...") and returns it as
+  detectionCachePath. Replay reads the duration and keyframe interval from the file.
 """
 
 import argparse
 import sys
 import os
 import json
-from analyze_media import SpermAnalyzer
+import glob
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# المحلل المحمل في كل عملية من مجمع وضع الدفعات (واحد لكل عملية)
+_batch_analyzer = None
+_batch_args = None
+
+def positive_float(value):
+    """نوع argparse لعدد عشري موجب"""
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ليس رقماً: {value}")
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"يجب أن تكون القيمة موجبة: {value}")
+    return number
 
 def main():
     """
@@ -21,30 +57,99 @@ def main():
     """
     parser = argparse.ArgumentParser(description='Sky CASA - AI Sperm Analysis CLI')
     
-    parser.add_argument('--type', choices=['image', 'video'], required=True,
+    parser.add_argument('--type', choices=['image', 'video'],
                        help='نوع التحليل: image أو video')
-    parser.add_argument('--media', required=True,
+    parser.add_argument('--media',
                        help='مسار الملف (صورة أو فيديو)')
-    parser.add_argument('--patient', type=int, required=True,
+    parser.add_argument('--patient', type=int,
                        help='معرف المريض')
-    parser.add_argument('--duration', type=int, default=15,
-                       help='مدة تحليل الفيديو بالثواني (افتراضي: 15)')
+    parser.add_argument('--duration', type=int,
+                       help='مدة تحليل الفيديو بالثواني (افتراضي: 15، ومع --replay مدة ملف الكشوفات)')
     parser.add_argument('--output', default='console',
                        help='نوع الإخراج: console أو json')
+    parser.add_argument('--model', default='models/sperm-analyzer-v1.pt',
+                       help='مسار النموذج (.pt أو .onnx) أو اسمه: pt أو onnx أو int8')
+    parser.add_argument('--tiled', action='store_true',
+                       help='تحليل الصور عالية الدقة على بلاطات متداخلة')
+    parser.add_argument('--batch-size', type=int, default=16,
+                       help='عدد إطارات الفيديو في كل تمريرة للنموذج (افتراضي: 16)')
+    parser.add_argument('--output-scale', type=float, default=1.0,
+                       help='معامل تصغير الفيديو المحلل (افتراضي: 1.0)')
+    parser.add_argument('--output-stride', type=int, default=1,
+                       help='حفظ إطار من كل N إطار في الفيديو المحلل (افتراضي: 1)')
+    parser.add_argument('--keyframe-interval', type=int,
+                       help='أقصى فاصل بين الإطارات المكشوفة بالنموذج مع تدفق بصري بينها '
+                            '(افتراضي: 1، ومع --replay فاصل ملف الكشوفات)')
+    parser.add_argument('--metrics-only', action='store_true',
+                       help='حساب المقاييس فقط بدون رسم أو حفظ صور وفيديو محللة')
+    parser.add_argument('--segments', type=int, default=1,
+                       help='تقسيم الفيديو إلى N مقاطع تحلل بالتوازي مع ربط المسارات (افتراضي: 1)')
+    parser.add_argument('--tracker', choices=['deepsort', 'sort', 'bytetrack'], default='deepsort',
+                       help='نظام التتبع: deepsort أو sort أو bytetrack (حركة فقط، أسرع على المعالج)')
+    parser.add_argument('--online-metrics', action='store_true',
+                       help='حساب معايير CASA أثناء التتبع بذاكرة ثابتة وإرسال تصنيف الحركة المؤقت مع التقدم')
+    parser.add_argument('--time-window', type=positive_float,
+                       help='إضافة سلسلة زمنية للحركة (VCL و VSL ونسبة التقدم) لكل نافذة بهذه المدة بالثواني')
+    parser.add_argument('--trajectory-stride', type=int,
+                       help='حفظ نقاط المسارات في قاعدة البيانات: نقطة من كل N نقطة من كل مسار')
+    parser.add_argument('--max-age', type=int, default=30,
+                       help='عدد الإطارات التي يبقى فيها المسار بدون كشف قبل حذفه (افتراضي: 30)')
+    parser.add_argument('--n-init', type=int, default=3,
+                       help='عدد الكشوفات المتتالية لتأكيد المسار (افتراضي: 3)')
+    parser.add_argument('--pixel-to-micron', type=float, default=0.5,
+                       help='نسبة تحويل البكسل إلى ميكرون (افتراضي: 0.5)')
+    parser.add_argument('--min-track-length', type=int, default=10,
+                       help='أقل عدد نقاط للمسار في متوسطات CASA (افتراضي: 10)')
+    parser.add_argument('--detection-cache',
+                       help='مجلد حفظ كشوفات كل إطار لإعادة التحليل لاحقاً بـ --replay')
+    parser.add_argument('--result-cache', default=os.path.join('outputs', 'result_cache.db'),
+                       help='ملف ذاكرة النتائج: إعادة إرسال نفس الملف بنفس النموذج والإعدادات لا تعيد التحليل')
+    parser.add_argument('--no-result-cache', action='store_true',
+                       help='تعطيل ذاكرة النتائج')
+    parser.add_argument('--replay',
+                       help='إعادة التتبع وحساب CASA من ملف كشوفات محفوظ بدون تشغيل النموذج')
+    parser.add_argument('--worker', action='store_true',
+                       help='وضع العامل الدائم: تحميل النموذج مرة واحدة واستقبال الطلبات كسطور JSON من stdin')
+    parser.add_argument('--batch',
+                       help='وضع الدفعات: مجلد أو نمط glob أو ملف قائمة (.txt/.csv) بمسارات الملفات')
+    parser.add_argument('--jobs', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                       help='عدد عمليات التحليل المتوازية في وضع الدفعات')
     
     args = parser.parse_args()
     
+    # --replay يأخذ المدة والفاصل من ملف الكشوفات، ويقارنهما فقط إذا حددا صراحة
+    args.replay_expected = {'duration_seconds': args.duration,
+                            'keyframe_interval': args.keyframe_interval}
+    if args.duration is None:
+        args.duration = 15
+    if args.keyframe_interval is None:
+        args.keyframe_interval = 1
+    
+    if args.worker:
+        return run_worker(args)
+    
+    if args.batch:
+        return run_batch(args)
+    
+    if args.replay:
+        return run_replay(args)
+    
+    missing = [name for name in ('type', 'media', 'patient') if getattr(args, name) is None]
+    if missing:
+        parser.error('المعاملات التالية مطلوبة: ' + ', '.join('--' + name for name in missing))
+    
     try:
         # التحقق من وجود الملف
         if not os.path.exists(args.media):
             raise FileNotFoundError(f"الملف غير موجود: {args.media}")
         
         # تهيئة المحلل
-        analyzer = SpermAnalyzer()
+        analyzer = create_analyzer(args)
         
         # تنفيذ التحليل
         if args.type == 'image':
-            results = analyzer.analyze_image(args.media, args.patient, save_results=True)
+            results = analyzer.analyze_image(args.media, args.patient, save_results=True,
+                                             tiled=args.tiled)
         elif args.type == 'video':
             results = analyzer.analyze_video(args.media, args.patient, args.duration, save_results=True)
         
@@ -74,6 +179,361 @@ def main():
         
         return 1  # خطأ
 
+def create_analyzer(args):
+    """
+    تهيئة المحلل من معاملات سطر الأوامر
+    
+    Args:
+        args: معاملات argparse
+        
+    Returns:
+        SpermAnalyzer: محلل جاهز مع النموذج المحمل
+    """
+    # استيراد مؤجل: analyze_media يحمل OpenCV وإطار النموذج، فلا نتحمل كلفته
+    # في --help أو أخطاء المعاملات أو الملفات غير الموجودة
+    from analyze_media import SpermAnalyzer
+    
+    # إعادة التتبع من الكشوفات لا تحتاج تحميل النموذج ولا ذاكرة النتائج
+    model_path = None if args.replay else args.model
+    result_cache_path = None if args.replay or args.no_result_cache else args.result_cache
+    
+    return SpermAnalyzer(model_path=model_path, batch_size=args.batch_size,
+                         output_scale=args.output_scale,
+                         output_stride=args.output_stride,
+                         headless=args.metrics_only,
+                         keyframe_interval=args.keyframe_interval,
+                         segments=args.segments,
+                         tracker=args.tracker,
+                         online_metrics=args.online_metrics,
+                         time_window=args.time_window,
+                         trajectory_stride=args.trajectory_stride,
+                         max_age=args.max_age,
+                         n_init=args.n_init,
+                         pixel_to_micron=args.pixel_to_micron,
+                         min_track_length=args.min_track_length,
+                         detection_cache_dir=args.detection_cache,
+                         result_cache_path=result_cache_path)
+
+def run_request(analyzer, request, args, progress_callback=None):
+    """
+    تنفيذ طلب تحليل واحد بمحلل محمل مسبقاً
+    
+    Args:
+        analyzer: SpermAnalyzer
+        request: dict بالمفاتيح type و media و patient واختيارياً duration و tiled و save
+        args: معاملات argparse (القيم الافتراضية)
+        progress_callback: دالة تقدم اختيارية لتحليل الفيديو
+        
+    Returns:
+        dict: نتائج التحليل من Python
+    """
+    media_type = request.get('type')
+    media_path = request.get('media')
+    patient_id = request.get('patient')
+    
+    if media_type not in ('image', 'video'):
+        raise ValueError(f"نوع تحليل غير مدعوم: {media_type}")
+    if not media_path or not os.path.exists(media_path):
+        raise FileNotFoundError(f"الملف غير موجود: {media_path}")
+    
+    if media_type == 'image':
+        return analyzer.analyze_image(media_path, patient_id,
+                                      save_results=request.get('save', True),
+                                      tiled=request.get('tiled', args.tiled))
+    
+    return analyzer.analyze_video(media_path, patient_id,
+                                  request.get('duration', args.duration),
+                                  save_results=request.get('save', True),
+                                  progress_callback=progress_callback)
+
+def run_replay(args):
+    """
+    إعادة التتبع وحساب CASA من ملف كشوفات محفوظ بإعدادات التتبع الحالية
+    
+    لا تحفظ النتائج في قاعدة البيانات لأن التحليل الأصلي محفوظ مسبقاً. المدة
+    وفاصل الإطارات المفتاحية من ملف الكشوفات، و--duration و--keyframe-interval
+    المحددان صراحة يقارنان به فقط.
+    
+    Args:
+        args: معاملات argparse
+        
+    Returns:
+        int: رمز الخروج
+    """
+    try:
+        if not os.path.exists(args.replay):
+            raise FileNotFoundError(f"ملف الكشوفات غير موجود: {args.replay}")
+        
+        analyzer = create_analyzer(args)
+        results = analyzer.replay_detections(args.replay, args.patient, save_results=False,
+                                             **args.replay_expected)
+        output_results = format_results_for_csharp(results)
+        
+        if args.output == 'json':
+            print(json.dumps(output_results, ensure_ascii=False, indent=2))
+        else:
+            print_console_results(output_results)
+        
+        return 0
+        
+    except Exception as e:
+        if args.output == 'json':
+            print(json.dumps({'success': False, 'error': str(e), 'timestamp': ''}, ensure_ascii=False))
+        else:
+            print(f"خطأ: {e}", file=sys.stderr)
+        
+        return 1
+
+def run_worker(args):
+    """
+    وضع العامل الدائم للتكامل مع C#
+    
+    يحمل النموذج مرة واحدة ثم يقرأ طلبات التحليل كسطور JSON من stdin
+    ويكتب التقدم والنتائج كسطور JSON على stdout. رسائل المحلل النصية
+    تحول إلى stderr حتى يبقى stdout مخصصاً للبروتوكول فقط.
+    
+    Args:
+        args: معاملات argparse (إعدادات النموذج والمحلل)
+        
+    Returns:
+        int: رمز الخروج
+    """
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    
+    def emit(message):
+        protocol_out.write(json.dumps(message, ensure_ascii=False) + '\n')
+        protocol_out.flush()
+    
+    try:
+        analyzer = create_analyzer(args)
+    except Exception as e:
+        emit({'event': 'error', 'id': None, 'error': f"فشل تحميل النموذج: {e}"})
+        return 1
+    
+    emit({'event': 'ready', 'model': analyzer.model_path})
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            
+            if request.get('command') == 'shutdown':
+                break
+            
+            def report_progress(frame_count, total_frames):
+                message = {'event': 'progress', 'id': request_id,
+                           'frames': frame_count, 'totalFrames': total_frames}
+                if args.online_metrics:
+                    message['motility'] = analyzer.live_motility()
+                emit(message)
+            
+            results = run_request(analyzer, request, args, progress_callback=report_progress)
+            
+            emit({'event': 'result', 'id': request_id, 'result': format_results_for_csharp(results)})
+            
+        except Exception as e:
+            # خطأ في طلب واحد لا يوقف العامل
+            emit({'event': 'error', 'id': request_id, 'error': str(e)})
+    
+    return 0
+
+def collect_batch_requests(source, args):
+    """
+    تجميع طلبات التحليل من مجلد أو نمط glob أو ملف قائمة
+    
+    ملف القائمة يحتوي سطراً لكل ملف: "path" أو "path,patient_id".
+    نوع التحليل يؤخذ من --type أو من امتداد الملف.
+    
+    Args:
+        source: المجلد أو النمط أو ملف القائمة
+        args: معاملات argparse
+        
+    Returns:
+        list: قائمة طلبات بنفس صيغة وضع العامل
+    """
+    entries = []
+    
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if os.path.isfile(path):
+                entries.append((path, None))
+    elif glob.has_magic(source):
+        entries = [(path, None) for path in sorted(glob.glob(source, recursive=True))
+                   if os.path.isfile(path)]
+    elif os.path.isfile(source):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r', encoding='utf-8') as manifest:
+            for line in manifest:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                
+                path, _, patient = line.partition(',')
+                path = path.strip()
+                if not os.path.isabs(path):
+                    path = os.path.join(base_dir, path)
+                entries.append((path, int(patient) if patient.strip() else None))
+    else:
+        raise FileNotFoundError(f"مصدر الدفعة غير موجود: {source}")
+    
+    requests = []
+    for path, patient in entries:
+        ext = os.path.splitext(path)[1].lower()
+        media_type = args.type
+        if media_type is None:
+            if ext in IMAGE_EXTENSIONS:
+                media_type = 'image'
+            elif ext in VIDEO_EXTENSIONS:
+                media_type = 'video'
+            else:
+                continue  # تجاهل الملفات غير المدعومة في المجلد
+        
+        requests.append({
+            'id': path,
+            'type': media_type,
+            'media': path,
+            'patient': patient if patient is not None else args.patient,
+        })
+    
+    return requests
+
+def init_batch_worker(args):
+    """
+    تهيئة عملية في مجمع وضع الدفعات: محلل واحد يعاد استخدامه لكل الملفات
+    
+    رسائل المحلل النصية تحول إلى stderr حتى يبقى stdout للنتائج فقط، والحفظ
+    في قاعدة البيانات يؤجل للعملية الرئيسية (انظر run_batch).
+    """
+    global _batch_analyzer, _batch_args
+    
+    sys.stdout = sys.stderr
+    _batch_args = args
+    _batch_analyzer = create_analyzer(args)
+
+def run_batch_request(request):
+    """
+    تحليل ملف واحد داخل عملية المجمع
+    
+    Returns:
+        dict: رسالة خطأ، أو رسالة نتيجة مع النتائج الخام وطلبات الحفظ المؤجلة
+              (تكتبها العملية الرئيسية ثم تنسق النتيجة)
+    """
+    _batch_analyzer.pending_saves = []
+    try:
+        if request.get('patient') is None:
+            raise ValueError("معرف المريض غير محدد (--patient أو عمود في ملف القائمة)")
+        
+        results = run_request(_batch_analyzer, request, _batch_args)
+        return {'event': 'result', 'id': request['id'], 'results': results,
+                'pending_saves': _batch_analyzer.pending_saves}
+    except Exception as e:
+        return {'event': 'error', 'id': request['id'], 'error': str(e)}
+
+def save_batch_messages(saver, messages):
+    """
+    كتابة الحفظ المؤجل لرسائل عدة عمليات في معاملة واحدة وتحويلها لرسائل البث
+    
+    نتيجة فشل حفظها تبث كرسالة خطأ.
+    
+    Args:
+        saver: SpermAnalyzer العملية الرئيسية (كاتب قاعدة البيانات وذاكرة النتائج)
+        messages: رسائل run_batch_request المكتملة معاً
+        
+    Returns:
+        list: رسائل NDJSON بنفس الترتيب
+    """
+    pending = [(index, item) for index, message in enumerate(messages)
+               for item in message.get('pending_saves', ())]
+    errors = saver.save_pending([item for _, item in pending]) if pending else []
+    
+    failed = {}
+    for (index, _), error in zip(pending, errors):
+        if error is not None:
+            failed.setdefault(index, f"فشل حفظ النتائج في قاعدة البيانات: {error}")
+    
+    output = []
+    for index, message in enumerate(messages):
+        if index in failed:
+            output.append({'event': 'error', 'id': message['id'], 'error': failed[index]})
+        elif message['event'] == 'result':
+            output.append({'event': 'result', 'id': message['id'],
+                           'result': format_results_for_csharp(message['results'])})
+        else:
+            output.append(message)
+    return output
+
+def run_batch(args):
+    """
+    وضع الدفعات: توزيع الملفات على مجمع عمليات وبث النتائج كسطور JSON
+    
+    كل عملية تحمل النموذج مرة واحدة عند بدئها، والنتائج تكتب على stdout
+    بترتيب اكتمالها وليس بترتيب الإدخال. الحفظ في قاعدة البيانات يتم في
+    العملية الرئيسية بكاتب واحد: النتائج المكتملة معاً تكتب في معاملة واحدة
+    قبل بثها. رسائل المحلل النصية تحول إلى stderr.
+    
+    Args:
+        args: معاملات argparse
+        
+    Returns:
+        int: رمز الخروج (1 إذا فشل أي ملف)
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    
+    def emit(message):
+        protocol_out.write(json.dumps(message, ensure_ascii=False) + '\n')
+        protocol_out.flush()
+    
+    try:
+        requests = collect_batch_requests(args.batch, args)
+    except Exception as e:
+        emit({'event': 'error', 'id': None, 'error': str(e)})
+        return 1
+    
+    failed = 0
+    jobs = max(1, min(args.jobs, len(requests)))
+    
+    if requests:
+        from analyze_media import SpermAnalyzer
+        
+        # كاتب قاعدة البيانات وذاكرة النتائج لكل العمليات (بدون نموذج)
+        saver = SpermAnalyzer(model_path=None, headless=True,
+                              result_cache_path=None if args.no_result_cache else args.result_cache)
+        
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker,
+                                 initargs=(args,)) as executor:
+            futures = {executor.submit(run_batch_request, request): request for request in requests}
+            remaining = set(futures)
+            
+            while remaining:
+                done, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+                
+                messages = []
+                for future in done:
+                    try:
+                        messages.append(future.result())
+                    except Exception as e:
+                        # فشل العملية نفسها (مثلاً تعذر تحميل النموذج)
+                        messages.append({'event': 'error', 'id': futures[future]['id'],
+                                         'error': str(e)})
+                
+                for message in save_batch_messages(saver, messages):
+                    if message['event'] == 'error':
+                        failed += 1
+                    emit(message)
+    
+    emit({'event': 'done', 'total': len(requests), 'failed': failed})
+    return 1 if failed else 0
+
 def format_results_for_csharp(results):
     """
     تنسيق النتائج للتكامل مع C#
@@ -91,6 +551,7 @@ def format_results_for_csharp(results):
         'timestamp': results.get('timestamp'),
         'totalCount': results.get('total_count', 0),
         'aiConfidence': results.get('ai_confidence', 0.0),
+        'modelVersion': results.get('model_version'),
         'concentrationEstimation': results.get('concentration_estimation', 0.0),
         'whoCompliance': results.get('who_compliance', False),
         'originalImagePath': results.get('image_path', ''),
@@ -98,6 +559,8 @@ def format_results_for_csharp(results):
         'analyzedImagePath': results.get('analyzed_image_path', ''),
         'analyzedVideoPath': results.get('analyzed_video_path', ''),
         'heatmapPath': results.get('heatmap_path', ''),
+        'testResultId': results.get('test_result_id'),
+        'cached': results.get('cached', False),
     }
     
     # إضافة بيانات الفيديو إذا كانت متوفرة
@@ -106,7 +569,8 @@ def format_results_for_csharp(results):
             'durationSeconds': results.get('duration_seconds', 0),
             'totalFrames': results.get('total_frames', 0),
             'totalTracks': results.get('total_tracks', 0),
-            'validTracks': results.get('valid_tracks', 0)
+            'validTracks': results.get('valid_tracks', 0),
+            'detectionCachePath': results.get('detection_cache_path', '')
         })
         
         # معايير CASA
@@ -119,8 +583,10 @@ def format_results_for_csharp(results):
                 'linMean': casa_metrics.get('lin_mean', 0.0),
                 'strMean': casa_metrics.get('str_mean', 0.0),
                 'wobMean': casa_metrics.get('wob_mean', 0.0),
-                'alhMean': casa_metrics.get('alh_mean', 0.0),
-                'bcfMean': casa_metrics.get('bcf_mean', 0.0)
+                'alhMean': casa_metrics.get('alh_mean'),
+                'bcfMean': casa_metrics.get('bcf_mean'),
+                'alhAvgPathMean': casa_metrics.get('alh_avgpath_mean'),
+                'bcfAvgPathMean': casa_metrics.get('bcf_avgpath_mean')
             }
         
         # تحليل الحركة
@@ -134,6 +600,18 @@ def format_results_for_csharp(results):
                 'totalProgressivePercent': motility.get('total_progressive_percent', 0.0),
                 'totalMotilePercent': motility.get('total_motile_percent', 0.0)
             }
+        
+        # السلسلة الزمنية للحركة
+        time_series = results.get('motility_time_series', {})
+        if time_series:
+            formatted['motilityTimeSeries'] = {
+                'windowSeconds': time_series['window_seconds'],
+                'startSeconds': time_series['start_s'],
+                'tracks': time_series['tracks'],
+                'vclMean': time_series['vcl_mean'],
+                'vslMean': time_series['vsl_mean'],
+                'progressivePercent': time_series['progressive_percent']
+            }
     
     return formatted
 
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Tracking / CASA Parameter Sweep
+معايرة إعدادات التتبع وحساب CASA لكل مجهر من كشوفات محفوظة
+
+The model runs once per video and its detections are cached (see
+utils/detection_cache.py); an existing cache for the same video, model,
+duration and keyframe interval is reused, and regenerated when its stored
+settings differ from the sweep's. Every combination of the tracker and CASA grids is then
+replayed from the cache across a process pool, and one CSV row is written
+per (video, setting) with track counts, mean velocities and motility
+percentages.
+
+Usage:
+python sweep_tracking.py samples/*.mp4 --model onnx --tracker sort bytetrack \\
+    --max-age 10 20 30 --n-init 1 3 --iou-threshold 0.2 0.3 \\
+    --smoothing-window 3 5 7 --min-track-length 5 10 --output sweep.csv
+"""
+
+import argparse
+import csv
+import glob
+import itertools
+import os
+import sys
+import time
+
+# عتبات الربط التي يقبلها كل نظام تتبع (انظر utils/trackers.py)
+TRACKER_GATES = {
+    'deepsort': ('max_iou_distance', 'max_cosine_distance'),
+    'sort': ('iou_threshold', 'centroid_gate'),
+    'bytetrack': ('iou_threshold', 'high_threshold', 'centroid_gate'),
+}
+
+# أعمدة النتائج في جدول المقارنة
+RESULT_COLUMNS = (
+    'total_tracks', 'valid_tracks', 'vcl_mean', 'vsl_mean',
+    'rapid_progressive_percent', 'slow_progressive_percent', 'non_progressive_percent',
+    'immotile_percent', 'total_progressive_percent', 'total_motile_percent',
+)
+
+# كشوفات محملة في كل عملية من المجمع (تعاد لكل إعدادات نفس الفيديو)
+_loaded_caches = {}
+
+def main():
+    """
+    واجهة سطر الأوامر لمسح إعدادات التتبع وCASA
+    """
+    parser = argparse.ArgumentParser(description='Sky CASA - Tracking / CASA parameter sweep')
+
+    parser.add_argument('videos', nargs='+',
+                       help='ملفات الفيديو أو أنماط glob')
+    parser.add_argument('--model', default='models/sperm-analyzer-v1.pt',
+                       help='مسار النموذج (.pt أو .onnx) أو اسمه: pt أو onnx أو int8')
+    parser.add_argument('--duration', type=int, default=15,
+                       help='مدة تحليل كل فيديو بالثواني (افتراضي: 15)')
+    parser.add_argument('--batch-size', type=int, default=16,
+                       help='عدد إطارات الفيديو في كل تمريرة للنموذج (افتراضي: 16)')
+    parser.add_argument('--keyframe-interval', type=int, default=1,
+                       help='أقصى عدد إطارات بين الإطارات المفتاحية للكشف (افتراضي: 1 = كل إطار)')
+    parser.add_argument('--cache-dir', default=os.path.join('outputs', 'detections'),
+                       help='مجلد ذاكرة الكشوفات (افتراضي: outputs/detections)')
+    parser.add_argument('--output', default=os.path.join('outputs', 'tracking_sweep.csv'),
+                       help='ملف CSV لجدول المقارنة')
+    parser.add_argument('--jobs', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                       help='عدد عمليات إعادة التتبع المتوازية')
+
+    # شبكة إعدادات التتبع
+    parser.add_argument('--tracker', nargs='+', choices=sorted(TRACKER_GATES), default=['deepsort'],
+                       help='أنظمة التتبع المقارنة')
+    parser.add_argument('--max-age', nargs='+', type=int, default=[30])
+    parser.add_argument('--n-init', nargs='+', type=int, default=[3])
+    parser.add_argument('--iou-threshold', nargs='+', type=float,
+                       help='أدنى IoU للربط (sort / bytetrack)')
+    parser.add_argument('--high-threshold', nargs='+', type=float,
+                       help='حد الثقة للمرحلة الأولى (bytetrack)')
+    parser.add_argument('--centroid-gate', nargs='+', type=float,
+                       help='بوابة المسافة بين المراكز نسبةً لحجم الصندوق (sort / bytetrack)')
+    parser.add_argument('--max-iou-distance', nargs='+', type=float,
+                       help='أقصى مسافة IoU للربط (deepsort)')
+    parser.add_argument('--max-cosine-distance', nargs='+', type=float,
+                       help='أقصى مسافة مظهر للربط (deepsort)')
+
+    # شبكة إعدادات CASA
+    parser.add_argument('--smoothing-window', nargs='+', type=int, default=[5])
+    parser.add_argument('--min-track-length', nargs='+', type=int, default=[10])
+    parser.add_argument('--pixel-to-micron', nargs='+', type=float, default=[0.5])
+
+    args = parser.parse_args()
+
+    videos = expand_videos(args.videos)
+    if not videos:
+        print("خطأ: لا توجد ملفات فيديو", file=sys.stderr)
+        return 1
+
+    caches = prepare_caches(videos, args)
+    if not caches:
+        return 1
+
+    settings = build_grid(args)
+    print(f"🔁 {len(settings)} إعداد × {len(caches)} فيديو بـ {args.jobs} عملية")
+
+    detection = {'duration_seconds': args.duration, 'keyframe_interval': args.keyframe_interval}
+    rows = run_sweep(caches, settings, detection, args.jobs)
+    write_table(rows, settings, args.output)
+
+    print(f"✅ تم حفظ جدول المقارنة: {args.output}")
+    return 0 if all(not row.get('error') for row in rows) else 1
+
+def expand_videos(patterns):
+    """توسيع أنماط glob إلى قائمة ملفات فيديو موجودة بدون تكرار"""
+    videos = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in matches:
+            if os.path.isfile(path) and path not in videos:
+                videos.append(path)
+            elif not os.path.isfile(path):
+                print(f"⚠️ الملف غير موجود: {path}", file=sys.stderr)
+    return videos
+
+def prepare_caches(videos, args):
+    """
+    تشغيل النموذج مرة واحدة لكل فيديو ليس له ذاكرة كشوفات بنفس النموذج وإعدادات الكشف
+
+    ذاكرة موجودة تحفظ مدة أو فاصل إطارات مفتاحية مختلفاً عن المسح يعاد إنشاؤها.
+
+    Returns:
+        dict: مسار الفيديو -> مسار ملف الكشوفات
+    """
+    from analyze_media import SpermAnalyzer, resolve_model_path
+    from utils.detection_cache import DetectionCache, cache_path, file_hash, model_version
+
+    # نفس الأوزان التي سيحملها المحلل (النموذج الأساسي عند غياب ملف .pt)
+    model_path = resolve_model_path(args.model)
+    model_hash = model_version(model_path)
+
+    # إعدادات الكشف دون تحميل النموذج (حدود الثقة و IoU الافتراضية)
+    settings = SpermAnalyzer(model_path=None, headless=True,
+                             keyframe_interval=args.keyframe_interval).detection_settings(args.duration)
+
+    caches = {}
+    analyzer = None
+    for video in videos:
+        path = cache_path(args.cache_dir, file_hash(video), model_hash, settings)
+        if os.path.exists(path):
+            try:
+                mismatches = DetectionCache(path).mismatches(
+                    {'duration_seconds': args.duration, 'keyframe_interval': args.keyframe_interval})
+            except Exception as e:
+                mismatches = [('file', str(e), None)]
+
+            if not mismatches:
+                print(f"♻️ استخدام الكشوفات المحفوظة: {video}")
+                caches[video] = path
+                continue
+            details = ', '.join(f"{name}: {cached} != {expected}" for name, cached, expected in mismatches)
+            print(f"⚠️ إعادة إنشاء الكشوفات المحفوظة ({details}): {video}")
+
+        try:
+            if analyzer is None:
+                analyzer = SpermAnalyzer(model_path=model_path, batch_size=args.batch_size,
+                                         keyframe_interval=args.keyframe_interval,
+                                         headless=True, detection_cache_dir=args.cache_dir)
+            result = analyzer.analyze_video(video, None, args.duration, save_results=False)
+            if result.get('detection_cache_path'):
+                caches[video] = result['detection_cache_path']
+        except Exception as e:
+            print(f"❌ فشل كشف {video}: {e}", file=sys.stderr)
+
+    return caches
+
+def build_grid(args):
+    """
+    كل تركيبات الإعدادات، مع عتبات الربط الخاصة بكل نظام تتبع فقط
+
+    Returns:
+        list: قواميس إعدادات بالمفاتيح tracker و max_age و n_init و tracker_options
+              و smoothing_window و min_track_length و pixel_to_micron
+    """
+    settings = []
+    for tracker in args.tracker:
+        gates = [(name, values) for name in TRACKER_GATES[tracker]
+                 for values in [getattr(args, name)] if values]
+        gate_names = [name for name, _ in gates]
+
+        for max_age, n_init, smoothing_window, min_track_length, pixel_to_micron, *gate_values in \
+                itertools.product(args.max_age, args.n_init, args.smoothing_window,
+                                  args.min_track_length, args.pixel_to_micron,
+                                  *[values for _, values in gates]):
+            settings.append({
+                'tracker': tracker,
+                'max_age': max_age,
+                'n_init': n_init,
+                'tracker_options': dict(zip(gate_names, gate_values)),
+                'smoothing_window': smoothing_window,
+                'min_track_length': min_track_length,
+                'pixel_to_micron': pixel_to_micron,
+            })
+    return settings
+
+def init_sweep_worker():
+    """تحويل رسائل المحلل في عمليات المجمع إلى stderr"""
+    sys.stdout = sys.stderr
+
+def run_setting(detection_cache_path, setting, detection):
+    """
+    إعادة تتبع فيديو واحد بإعدادات واحدة داخل عملية من المجمع
+
+    Args:
+        detection: مدة التحليل وفاصل الإطارات المفتاحية للكشوفات المحفوظة
+
+    Returns:
+        dict: أعمدة RESULT_COLUMNS مع seconds
+    """
+    from analyze_media import SpermAnalyzer
+    from utils.detection_cache import DetectionCache
+
+    cache = _loaded_caches.get(detection_cache_path)
+    if cache is None:
+        cache = _loaded_caches[detection_cache_path] = DetectionCache(detection_cache_path)
+
+    started = time.perf_counter()
+    analyzer = SpermAnalyzer(model_path=None, headless=True, **setting)
+    result = analyzer.replay_detections(cache, None, save_results=False, **detection)
+
+    row = {'total_tracks': result['total_tracks'], 'valid_tracks': result['valid_tracks'],
+           'vcl_mean': result['casa_metrics'].get('vcl_mean', 0),
+           'vsl_mean': result['casa_metrics'].get('vsl_mean', 0)}
+    motility = result['motility_analysis']
+    row.update({name: motility.get(name, 0) for name in RESULT_COLUMNS if name not in row})
+    row['seconds'] = time.perf_counter() - started
+    return row
+
+def run_sweep(caches, settings, detection, jobs):
+    """
+    تشغيل كل (فيديو، إعدادات) في مجمع عمليات
+
+    Returns:
+        list: صف لكل تركيبة بترتيب الفيديوهات ثم الإعدادات
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    tasks = [(video, index) for video in caches for index in range(len(settings))]
+    rows = {}
+
+    with ProcessPoolExecutor(max_workers=max(1, jobs), initializer=init_sweep_worker) as executor:
+        futures = {executor.submit(run_setting, caches[video], settings[index], detection): (video, index)
+                   for video, index in tasks}
+
+        for done, future in enumerate(as_completed(futures), 1):
+            video, index = futures[future]
+            try:
+                rows[(video, index)] = future.result()
+            except Exception as e:
+                rows[(video, index)] = {'error': str(e)}
+                print(f"❌ {os.path.basename(video)} إعداد {index + 1}: {e}", file=sys.stderr)
+
+            print(f"⏳ {done}/{len(tasks)}")
+
+    return [dict(rows[task], video=task[0], setting=task[1]) for task in tasks]
+
+def write_table(rows, settings, output_path):
+    """
+    كتابة جدول المقارنة بعمود لكل إعداد (وعتبات الربط المستخدمة فعلاً) ولكل نتيجة
+    """
+    gate_names = sorted({name for setting in settings for name in setting['tracker_options']})
+    fieldnames = (['video', 'tracker', 'max_age', 'n_init'] + gate_names
+                  + ['smoothing_window', 'min_track_length', 'pixel_to_micron']
+                  + list(RESULT_COLUMNS) + ['seconds', 'error'])
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
+        writer.writeheader()
+
+        for row in rows:
+            setting = settings[row['setting']]
+            record = {name: value for name, value in setting.items() if name != 'tracker_options'}
+            record.update(setting['tracker_options'])
+            record['video'] = row['video']
+            record.update({name: row[name] for name in RESULT_COLUMNS + ('seconds', 'error')
+                           if name in row})
+            writer.writerow(record)
+
+if __name__ == "__main__":
+    sys.exit(main())
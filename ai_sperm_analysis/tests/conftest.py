@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+إعداد pytest: الوحدات تستورد بعضها كـ utils.x و analyze_media من مجلد ai_sperm_analysis
+
+Run from ai_sperm_analysis: python -m pytest -q tests
+"""
+
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
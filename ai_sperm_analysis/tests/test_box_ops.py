@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""اختبارات دمج كشوفات البلاطات"""
+
+import numpy as np
+
+from utils.box_ops import merge_tiles
+
+
+def test_merge_tiles_keeps_touching_sperm_in_same_tile():
+    # صندوقان متلاصقان من نفس البلاطة: IoS كبير لكن IoU أقل من حد النموذج
+    boxes = np.array([[0, 0, 10, 10], [2, 2, 8, 8]], dtype=np.float32)
+    keep = merge_tiles(boxes, np.array([0.9, 0.8]), [0, 0])
+    assert sorted(keep.tolist()) == [0, 1]
+
+
+def test_merge_tiles_merges_cut_box_across_tiles():
+    # نفس الحيوان المنوي مقطوعاً عند حافة البلاطة المجاورة
+    boxes = np.array([[100, 0, 120, 10], [100, 0, 108, 10]], dtype=np.float32)
+    keep = merge_tiles(boxes, np.array([0.9, 0.8]), [0, 1])
+    assert keep.tolist() == [0]
+
+
+def test_merge_tiles_applies_model_iou_within_tile():
+    boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 9]], dtype=np.float32)
+    keep = merge_tiles(boxes, np.array([0.8, 0.9]), [3, 3], iou_threshold=0.7)
+    assert keep.tolist() == [1]
+
+
+def test_merge_tiles_empty():
+    keep = merge_tiles(np.zeros((0, 4), dtype=np.float32), np.zeros(0), [])
+    assert keep.tolist() == []
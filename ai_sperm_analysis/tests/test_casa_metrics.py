@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+تكافؤ دوال CASACalculator المتجهة مع تطبيق الحلقات الأصلي
+
+The reference functions below are the original per-point loop
+implementations kept verbatim in behaviour (pixel -> micron conversion,
+moving-average window of up to 5 points shrinking at the track ends,
+start-end chord for ALH/BCF).
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from utils.casa_metrics import CASACalculator
+
+PIXEL_TO_MICRON = 0.5
+
+
+# --- التطبيق المرجعي بالحلقات --------------------------------------------
+
+def ref_microns(positions):
+    return [(x * PIXEL_TO_MICRON, y * PIXEL_TO_MICRON) for x, y in positions]
+
+
+def ref_smooth_path(positions):
+    if len(positions) < 3:
+        return positions
+
+    window_size = min(5, len(positions))
+    smoothed = []
+    for i in range(len(positions)):
+        start_idx = max(0, i - window_size // 2)
+        end_idx = min(len(positions), i + window_size // 2 + 1)
+        x_vals = [pos[0] for pos in positions[start_idx:end_idx]]
+        y_vals = [pos[1] for pos in positions[start_idx:end_idx]]
+        smoothed.append((np.mean(x_vals), np.mean(y_vals)))
+    return smoothed
+
+
+def ref_point_to_line_distance(point, line_start, line_end):
+    x0, y0 = point
+    x1, y1 = line_start
+    x2, y2 = line_end
+    if x1 == x2 and y1 == y2:
+        return math.hypot(x0 - x1, y0 - y1)
+
+    numerator = abs((y2-y1)*x0 - (x2-x1)*y0 + x2*y1 - y2*x1)
+    denominator = math.sqrt((y2-y1)**2 + (x2-x1)**2)
+    return numerator / denominator
+
+
+def ref_path_length(points):
+    return sum(math.hypot(points[i][0] - points[i-1][0], points[i][1] - points[i-1][1])
+               for i in range(1, len(points)))
+
+
+def ref_velocities(positions, timestamps):
+    if len(positions) < 2:
+        return 0, 0, 0
+
+    positions_um = ref_microns(positions)
+    times_s = [t / 1000.0 for t in timestamps]
+    total_time = times_s[-1] - times_s[0]
+    if total_time <= 0:
+        return 0, 0, 0
+
+    vcl = ref_path_length(positions_um) / total_time
+    vsl = math.hypot(positions_um[-1][0] - positions_um[0][0],
+                     positions_um[-1][1] - positions_um[0][1]) / total_time
+    smoothed = ref_smooth_path(positions_um)
+    vap = ref_path_length(smoothed) / total_time if len(smoothed) > 1 else vsl
+    return vcl, vsl, vap
+
+
+def ref_alh(positions):
+    if len(positions) < 3:
+        return 0
+
+    positions_um = ref_microns(positions)
+    start, end = positions_um[0], positions_um[-1]
+    distances = [ref_point_to_line_distance(pos, start, end) for pos in positions_um[1:-1]]
+    return np.mean(distances) if distances else 0
+
+
+def ref_bcf(positions, timestamps):
+    if len(positions) < 10:
+        return 0
+
+    from scipy.signal import find_peaks
+
+    positions_um = ref_microns(positions)
+    start, end = positions_um[0], positions_um[-1]
+    deviations = np.array([ref_point_to_line_distance(pos, start, end) for pos in positions_um])
+    peaks, _ = find_peaks(deviations, height=np.std(deviations) * 0.5)
+
+    total_time = (timestamps[-1] - timestamps[0]) / 1000.0
+    return len(peaks) / total_time if total_time > 0 and len(peaks) > 1 else 0
+
+
+def ref_metrics(positions, timestamps):
+    vcl, vsl, vap = ref_velocities(positions, timestamps)
+    lin = vsl / vcl * 100 if vcl > 0 else 0
+    str_val = vsl / vap * 100 if vap > 0 else 0
+    wob = vap / vcl * 100 if vcl > 0 else 0
+    return {'vcl': vcl, 'vsl': vsl, 'vap': vap, 'lin': lin, 'str': str_val, 'wob': wob,
+            'alh': ref_alh(positions), 'bcf': ref_bcf(positions, timestamps)}
+
+
+# --- المسارات المختبرة ------------------------------------------------------
+
+def make_tracks():
+    """مسارات عشوائية ومتدهورة: (positions list, timestamps list)"""
+    rng = np.random.default_rng(7)
+    tracks = []
+
+    for n in list(range(0, 13)) + [25, 40, 60]:
+        positions = np.cumsum(rng.normal(0, 3, (n, 2)), axis=0) + rng.uniform(0, 2000, 2)
+        timestamps = np.arange(n) * 33.366 + rng.uniform(0, 1e5)
+        tracks.append((positions, timestamps))
+
+    # نقاط مكررة، مسار مغلق، بكسلات صحيحة، خطوط مستقيمة، مدة صفرية
+    times = np.arange(15) * 40.0
+    tracks.append((np.tile([[120.0, 80.0]], (15, 1)), times))
+    tracks.append((np.tile([[120.0, 80.0]], (2, 1)), times[:2]))
+    loop = np.cumsum(rng.normal(0, 3, (15, 2)), axis=0)
+    loop[-1] = loop[0]
+    tracks.append((loop, times))
+    tracks.append((np.round(np.cumsum(rng.normal(0, 4, (30, 2)), axis=0) + 500), np.arange(30) * 33.0))
+    tracks.append((np.column_stack([np.linspace(0, 90, 15), np.linspace(10, 40, 15)]), times))
+    tracks.append((np.column_stack([np.full(15, 7.0), np.linspace(0, 50, 15)]), times))
+    tracks.append((np.column_stack([np.linspace(0, 50, 12), np.full(12, 3.0)]), np.full(12, 500.0)))
+
+    return [([tuple(p) for p in positions], list(timestamps)) for positions, timestamps in tracks]
+
+
+TRACKS = make_tracks()
+
+
+@pytest.fixture
+def casa():
+    return CASACalculator(pixel_to_micron=PIXEL_TO_MICRON, fps=30)
+
+
+@pytest.mark.parametrize('positions, timestamps', TRACKS)
+def test_single_track_functions_match_reference(casa, positions, timestamps):
+    array = np.array(positions, dtype=np.float64).reshape(-1, 2)
+
+    for source in (positions, array):
+        assert np.allclose(casa.calculate_velocities(source, timestamps),
+                           ref_velocities(positions, timestamps))
+        assert np.allclose(casa.calculate_amplitude_lateral_head(source), ref_alh(positions))
+        assert np.allclose(casa.calculate_beat_frequency(source, timestamps),
+                           ref_bcf(positions, timestamps))
+
+    if len(positions) >= 3:
+        assert np.allclose(casa.smooth_path(array), ref_smooth_path(positions))
+    if len(positions):
+        assert np.isclose(casa.path_length(casa.to_microns(array)),
+                          ref_path_length(ref_microns(positions)))
+    if len(positions) >= 2:
+        points = casa.to_microns(array)
+        expected = [ref_point_to_line_distance(p, ref_microns(positions)[0], ref_microns(positions)[-1])
+                    for p in ref_microns(positions)]
+        assert np.allclose(casa.point_line_distances(points, points[0], points[-1]), expected)
+
+
+def test_batch_matches_reference_per_track(casa):
+    positions = np.concatenate([np.array(p, dtype=np.float64).reshape(-1, 2) for p, _ in TRACKS])
+    timestamps = np.concatenate([np.array(t, dtype=np.float64) for _, t in TRACKS])
+    offsets = np.concatenate([[0], np.cumsum([len(p) for p, _ in TRACKS])])
+
+    table = casa.calculate_batch(positions, timestamps, offsets)
+
+    for k, (track_positions, track_timestamps) in enumerate(TRACKS):
+        expected = ref_metrics(track_positions, track_timestamps)
+        for name, value in expected.items():
+            assert np.isclose(table[name][k], value), (k, name, table[name][k], value)
+
+
+def test_high_vsl_low_lin_track_is_not_rapid_progressive():
+    # تصنيف WHO يشترط LIN مع VSL: مسار متعرج سريع لم يعد A كما في القاعدة القديمة (VSL ≥ 25 فقط)
+    from analyze_media import SpermAnalyzer
+
+    analyzer = SpermAnalyzer(model_path=None, headless=True, pixel_to_micron=PIXEL_TO_MICRON)
+    for frame in range(20):
+        t = frame * 1000 / 30
+        zigzag = 40 if frame % 2 else -40
+        analyzer.track_store.append_frame(frame, t, [1, 2], np.array([
+            [10 * frame, 200 + zigzag, 10 * frame + 8, 208 + zigzag],   # متعرج
+            [10 * frame, 400, 10 * frame + 8, 408],                     # مستقيم
+        ], dtype=np.float32))
+
+    kinematics = analyzer.track_kinematics()
+    rows = {int(track_id): row for row, track_id in enumerate(kinematics['track_id'])}
+    assert kinematics['vsl'][rows[1]] >= 25 and kinematics['lin'][rows[1]] < 25
+    assert kinematics['grade'][rows[1]] == 'C'
+    assert kinematics['grade'][rows[2]] == 'A'
+
+    motility = analyzer.analyze_motility()
+    assert motility['rapid_progressive_count'] == 1
+    assert motility['non_progressive_count'] == 1
+
+
+@pytest.mark.parametrize('window', [0, -1.5])
+def test_time_window_must_be_positive(casa, window):
+    import argparse
+
+    from analyze_media import SpermAnalyzer
+    from cli_analyzer import positive_float
+
+    with pytest.raises(ValueError):
+        casa.calculate_time_series(np.zeros((3, 2)), np.arange(3.0), np.array([0, 3]), window)
+    with pytest.raises(ValueError):
+        SpermAnalyzer(model_path=None, headless=True, time_window=window)
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_float(str(window))
+    assert positive_float('2.5') == 2.5
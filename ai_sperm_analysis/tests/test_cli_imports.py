@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""ميزانية الاستيراد: cli_analyzer لا يحمل مكتبات النموذج حتى يبدأ التحليل"""
+
+import json
+import os
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('torch', 'ultralytics', 'cv2', 'onnxruntime')
+
+
+def test_cli_import_does_not_load_model_libraries():
+    code = ("import json, sys, cli_analyzer; "
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIR, check=True,
+                            capture_output=True, text=True).stdout
+
+    assert json.loads(output.strip().splitlines()[-1]) == []
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""اختبارات حفظ النتائج عبر كاتب قاعدة البيانات"""
+
+import os
+import sqlite3
+
+import pytest
+
+from analyze_media import RESULT_TABLES_SQL, SpermAnalyzer
+from utils.db_writer import close_all
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           'create_semen_analysis_table.sql')
+RESULT_TABLES = ('motility_time_series', 'sperm_track_kinematics', 'sperm_track_points')
+
+
+def table_columns(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: conn.execute(f"PRAGMA table_info({table})").fetchall() for table in RESULT_TABLES}
+    finally:
+        conn.close()
+
+
+def test_result_tables_match_schema_file(tmp_path):
+    from_file, from_writer = str(tmp_path / 'file.db'), str(tmp_path / 'writer.db')
+    with sqlite3.connect(from_file) as conn, open(SCHEMA_FILE, encoding='utf-8') as f:
+        conn.executescript(f.read())
+    with sqlite3.connect(from_writer) as conn:
+        conn.executescript(RESULT_TABLES_SQL)
+
+    assert table_columns(from_file) == table_columns(from_writer)
+
+
+def test_save_creates_tables_and_copies_track_details(tmp_path):
+    db_path = str(tmp_path / 'database.db')
+    with sqlite3.connect(db_path) as conn, open(SCHEMA_FILE, encoding='utf-8') as f:
+        # جدول semen_analysis وحده، كما ينشئه تطبيق C#
+        conn.executescript(f.read().split('-- إنشاء فهارس')[0])
+
+    analyzer = SpermAnalyzer(model_path=None, headless=True, db_path=db_path)
+    kinematics = [('1', 12, 40.0, 20.0, 30.0, 50.0, 66.0, 75.0, 2.0, 8.0, None, None,
+                   'slow_progressive', 'B')]
+    points = [('1', 0, 0.0, 10.0, 10.0), ('1', 5, 166.7, 12.0, 11.0)]
+
+    first = analyzer.save_to_database({'patient_id': 1}, (kinematics, points))
+    second = analyzer.save_to_database({'patient_id': 1}, copy_tracks_from=first)
+    close_all()
+
+    assert first is not None and second is not None
+    conn = sqlite3.connect(db_path)
+    try:
+        for table, expected in (('sperm_track_kinematics', 1), ('sperm_track_points', 2)):
+            for test_result_id in (first, second):
+                count = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE test_result_id = ?",
+                                     (test_result_id,)).fetchone()[0]
+                assert count == expected
+    finally:
+        conn.close()
+
+
+def test_pending_saves_are_written_together_by_another_analyzer(tmp_path):
+    db_path = str(tmp_path / 'database.db')
+    with sqlite3.connect(db_path) as conn, open(SCHEMA_FILE, encoding='utf-8') as f:
+        conn.executescript(f.read().split('-- إنشاء فهارس')[0])
+
+    # محلل عملية المجمع يؤجل الحفظ، ومحلل العملية الرئيسية يكتبه
+    worker = SpermAnalyzer(model_path=None, headless=True, db_path=db_path)
+    worker.pending_saves = []
+    results = [{'patient_id': patient_id} for patient_id in (1, 2, 3)]
+    for result in results:
+        assert worker.save_to_database(result) is None
+    assert worker.db_writer is None
+
+    saver = SpermAnalyzer(model_path=None, headless=True, db_path=db_path)
+    errors = saver.save_pending(worker.pending_saves)
+    close_all()
+
+    assert errors == [None, None, None]
+    assert len({result['test_result_id'] for result in results}) == 3
+
+
+def test_failed_save_raises(tmp_path):
+    # قاعدة بيانات بدون جدول semen_analysis
+    analyzer = SpermAnalyzer(model_path=None, headless=True, db_path=str(tmp_path / 'empty.db'))
+    with pytest.raises(RuntimeError):
+        analyzer.save_to_database({'patient_id': 1})
+    close_all()
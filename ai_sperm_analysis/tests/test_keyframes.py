@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""اختبارات وضع الإطارات المفتاحية في تحليل الفيديو"""
+
+import cv2
+import numpy as np
+import pytest
+
+from analyze_media import SpermAnalyzer
+from utils.detection_cache import DetectionCache, cache_path
+from utils.onnx_detector import OnnxResults
+
+
+class BlobModel:
+    """نموذج بديل يكشف البقع البيضاء ويرفض الدفعة الفارغة مثل ultralytics"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, frames):
+        if not frames:
+            raise ValueError("need at least one array to stack")
+        self.calls.append(len(frames))
+
+        results = []
+        for frame in frames:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            _, _, stats, _ = cv2.connectedComponentsWithStats((gray > 128).astype(np.uint8))
+            rows = [[x - 2, y - 2, x + w + 2, y + h + 2, 0.9, 0] for x, y, w, h, _ in stats[1:]]
+            results.append(OnnxResults(np.array(rows, np.float32).reshape(-1, 6), frame.shape))
+        return results
+
+
+def write_clip(path, frames=30, fps=30):
+    """فيديو صناعي لثلاث بقع تتحرك بخطوط مستقيمة"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (160, 120))
+    for i in range(frames):
+        frame = np.zeros((120, 160, 3), np.uint8)
+        for k in range(3):
+            cv2.circle(frame, (20 + 2 * i, 20 + 35 * k + (i % 3)), 4, (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+@pytest.mark.parametrize('batch_size, keyframe_interval', [(1, 3), (2, 5), (4, 3)])
+def test_batch_smaller_than_keyframe_interval(tmp_path, batch_size, keyframe_interval):
+    clip = tmp_path / 'clip.mp4'
+    write_clip(clip)
+
+    analyzer = SpermAnalyzer(model_path=None, headless=True, tracker='sort', n_init=1,
+                             batch_size=batch_size, keyframe_interval=keyframe_interval)
+    analyzer.model = BlobModel()
+
+    result = analyzer.analyze_video(str(clip), None, duration_seconds=1, save_results=False)
+
+    assert result['total_frames'] == 30
+    assert result['total_tracks'] >= 3
+    # بعض الإطارات نقلت بالتدفق البصري بدلاً من كشفها
+    assert sum(analyzer.model.calls) < 30
+
+
+def test_detection_cache_records_settings_and_propagated_frames(tmp_path):
+    clip = tmp_path / 'clip.mp4'
+    write_clip(clip)
+
+    analyzer = SpermAnalyzer(model_path=None, headless=True, tracker='sort', n_init=1,
+                             batch_size=2, keyframe_interval=3, detection_cache_dir=str(tmp_path))
+    analyzer.model = BlobModel()
+    analyzer.analyze_video(str(clip), None, duration_seconds=1, save_results=False)
+
+    cache = DetectionCache(str(next(tmp_path.glob('*.npz'))))
+    assert cache.settings == analyzer.detection_settings(1)
+    assert cache.propagated.any() and not cache.propagated.all()
+    # الصناديق المنقولة ترث ثقة الكشف بدلاً من 1.0
+    for _, _, dets in cache.frames():
+        assert np.allclose(dets['conf'], 0.9)
+
+    # إعادة التتبع تأخذ المدة والفاصل من الملف، وتقارن فقط ما يطلب صراحة
+    live = analyzer.analyze_video(str(clip), None, duration_seconds=1, save_results=False)
+    replay = SpermAnalyzer(model_path=None, headless=True, tracker='sort', n_init=1)
+    replayed = replay.replay_detections(cache, None)
+    assert replayed['total_frames'] == 30
+    assert replayed['propagated_frames'] == live['propagated_frames'] == int(cache.propagated.sum())
+    assert replayed['casa_metrics'] == live['casa_metrics']
+    assert replay.replay_detections(cache, None, duration_seconds=1, keyframe_interval=3)
+
+    with pytest.raises(ValueError):
+        replay.replay_detections(cache, None, duration_seconds=15)
+    with pytest.raises(ValueError):
+        replay.replay_detections(cache, None, keyframe_interval=1)
+
+
+def test_cache_path_depends_on_detection_settings():
+    settings = {'duration_seconds': 15, 'keyframe_interval': 1}
+    assert cache_path('c', 'a' * 64, 'b' * 64, settings) == cache_path('c', 'a' * 64, 'b' * 64, dict(settings))
+    assert cache_path('c', 'a' * 64, 'b' * 64, settings) != \
+        cache_path('c', 'a' * 64, 'b' * 64, dict(settings, keyframe_interval=4))
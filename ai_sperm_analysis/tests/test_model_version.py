@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""اختبارات نص إصدار النموذج المحفوظ مع النتائج"""
+
+import sys
+import types
+
+import pytest
+
+from analyze_media import FALLBACK_MODEL, MODEL_VARIANTS, SpermAnalyzer, resolve_model_path
+from utils.detection_cache import model_version
+
+
+@pytest.mark.parametrize('variant, tracker, expected', [
+    ('pt', 'deepsort', 'YOLOv8-PT:sperm-analyzer-v1@0123abcd/DeepSORT'),
+    ('onnx', 'sort', 'ONNX:sperm-analyzer-v1@0123abcd/SORT'),
+    ('int8', 'bytetrack', 'ONNX-INT8:sperm-analyzer-v1-int8@0123abcd/ByteTrack'),
+])
+def test_describe_model_distinguishes_backend_and_tracker(variant, tracker, expected):
+    analyzer = SpermAnalyzer(model_path=None, headless=True, tracker=tracker)
+    assert analyzer.describe_model(MODEL_VARIANTS[variant], '0123abcd' * 8) == expected
+
+
+def test_describe_model_without_tracker_for_images():
+    analyzer = SpermAnalyzer(model_path=None, headless=True)
+    label = analyzer.describe_model('models/custom.onnx', 'ff' * 32, tracker=False)
+    assert label == 'ONNX:custom@ffffffff'
+
+
+def test_database_row_uses_result_model_version():
+    analyzer = SpermAnalyzer(model_path=None, headless=True)
+    row = analyzer.prepare_database_data({'patient_id': 1, 'model_version': 'ONNX:x@1/SORT'})
+    assert row[3] == 'ONNX:x@1/SORT'
+
+
+def test_missing_pt_model_records_fallback_weights(tmp_path, monkeypatch):
+    # ultralytics بديل: يكفي أن يسجل مسار الأوزان المحملة
+    ultralytics = types.ModuleType('ultralytics')
+    ultralytics.YOLO = lambda path: types.SimpleNamespace(path=path)
+    monkeypatch.setitem(sys.modules, 'ultralytics', ultralytics)
+    monkeypatch.chdir(tmp_path)
+
+    analyzer = SpermAnalyzer(model_path='models/missing.pt', headless=True, tracker='sort')
+
+    assert analyzer.model.path == FALLBACK_MODEL
+    assert analyzer.model_path == FALLBACK_MODEL
+    assert analyzer.segment_options['model_path'] == FALLBACK_MODEL
+    assert analyzer.describe_model() == f"YOLOv8-PT:yolov8n@{model_version(FALLBACK_MODEL)[:8]}/SORT"
+    assert resolve_model_path('models/missing.pt') == FALLBACK_MODEL
+    assert resolve_model_path('models/missing.onnx') == 'models/missing.onnx'
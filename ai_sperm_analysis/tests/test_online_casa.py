@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""اختبارات مجمعات CASA أثناء التتبع مقابل الحساب الدفعي"""
+
+import numpy as np
+import pytest
+
+from analyze_media import SpermAnalyzer
+from utils.casa_metrics import CASACalculator
+from utils.online_casa import OnlineCASA
+from utils.track_store import TrackStore
+
+
+def simulate(smoothing_window=5, frames=300, seed=1):
+    """مسارات عشوائية تظهر وتختفي، تغذى للمخزن وللمجمعات معاً"""
+    rng = np.random.default_rng(seed)
+    store = TrackStore()
+    online = OnlineCASA(0.5, max_age=3, smoothing_window=smoothing_window)
+    alive = {}
+
+    for frame in range(frames):
+        for i in range(rng.integers(0, 3)):
+            alive[f"{frame}_{i}"] = rng.uniform(0, 500, 2)
+
+        track_ids, boxes = [], []
+        for track_id, point in list(alive.items()):
+            if rng.random() < 0.03:
+                del alive[track_id]
+                continue
+            point += rng.normal(1, 3, 2)
+            track_ids.append(track_id)
+            boxes.append([point[0] - 3, point[1] - 3, point[0] + 3, point[1] + 3])
+
+        store.append_frame(frame, frame * 33.3, track_ids, boxes)
+        online.update(frame, frame * 33.3, track_ids, boxes)
+
+    online.finalize_all()
+    return store, online
+
+
+@pytest.mark.parametrize('smoothing_window', [1, 3, 5, 9])
+def test_online_velocities_match_batch(smoothing_window):
+    store, online = simulate(smoothing_window)
+    times, coords, offsets = store.columns()
+    batch = CASACalculator(smoothing_window=smoothing_window).calculate_batch(coords, times, offsets)
+
+    table = online.table()
+    order = {track_id: i for i, track_id in enumerate(table['track_id'])}
+    index = [order[track_id] for track_id in store.track_ids()]
+
+    assert (table['length'][index] == np.diff(offsets)).all()
+    for name in ('vcl', 'vsl', 'vap', 'lin', 'str', 'wob'):
+        assert np.allclose(table[name][index], batch[name])
+
+
+def test_online_alh_bcf_use_their_own_keys():
+    _, online = simulate()
+    table = online.table()
+
+    assert 'alh' not in table and 'bcf' not in table
+    assert len(table['alh_avgpath']) == len(table['bcf_avgpath']) == len(table['track_id'])
+
+
+def test_online_patterns_ignore_average_path_alh():
+    analyzer = SpermAnalyzer(model_path=None, headless=True)
+    table = {'track_id': ['1'], 'length': np.array([30]), 'vcl': np.array([40.0]),
+             'vsl': np.array([2.0]), 'lin': np.array([5.0]), 'str': np.array([10.0]),
+             'alh_avgpath': np.array([6.0]), 'bcf_avgpath': np.array([10.0])}
+
+    analyzer.classify_kinematics(table)
+    assert table['pattern'].tolist() == ['non_progressive']
+
+    table['alh'] = np.array([6.0])
+    analyzer.classify_kinematics(table)
+    assert table['pattern'].tolist() == ['hyperactivated']
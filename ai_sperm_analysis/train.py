@@ -64,31 +64,43 @@ def train_sperm_model():
     
     return True
 
-def test_model():
+def test_model(model_path="./outputs/sperm-analyzer-v1/weights/best.pt"):
     """
     اختبار النموذج المدرب
+    
+    Args:
+        model_path: مسار النموذج (.pt أو .onnx)
+        
+    Returns:
+        dict: مقاييس الدقة أو None عند الفشل
     """
     try:
-        # تحميل النموذج المدرب
-        model_path = "./outputs/sperm-analyzer-v1/weights/best.pt"
-        
         if os.path.exists(model_path):
-            model = YOLO(model_path)
+            model = YOLO(model_path, task='detect')
             
             # اختبار على بيانات التحقق
-            results = model.val(data='dataset/data.yaml')
+            results = model.val(data='dataset/data.yaml', imgsz=640)
             
-            print("\n📊 نتائج الاختبار:")
+            print(f"\n📊 نتائج الاختبار: {model_path}")
             print(f"mAP50: {results.box.map50:.3f}")
             print(f"mAP50-95: {results.box.map:.3f}")
             print(f"Precision: {results.box.mp:.3f}")
             print(f"Recall: {results.box.mr:.3f}")
             
+            return {
+                'map50': float(results.box.map50),
+                'map50_95': float(results.box.map),
+                'precision': float(results.box.mp),
+                'recall': float(results.box.mr)
+            }
+            
         else:
             print("❌ لم يتم العثور على النموذج المدرب")
             
     except Exception as e:
         print(f"❌ خطأ في الاختبار: {e}")
+    
+    return None
 
 def export_model():
     """
@@ -100,8 +112,8 @@ def export_model():
         if os.path.exists(model_path):
             model = YOLO(model_path)
             
-            # تصدير إلى ONNX للاستخدام في التطبيقات
-            model.export(format="onnx")
+            # تصدير إلى ONNX للاستخدام في التطبيقات (دفعة ديناميكية لتحليل الفيديو على دفعات)
+            model.export(format="onnx", dynamic=True)
             print("✅ تم تصدير النموذج إلى ONNX")
             
             # تصدير إلى TorchScript للاستخدام المحمول
@@ -118,6 +130,197 @@ def export_model():
     except Exception as e:
         print(f"❌ خطأ في التصدير: {e}")
 
+def load_val_images(data_yaml='dataset/data.yaml', limit=None):
+    """
+    تحميل مسارات صور التحقق من ملف إعداد البيانات
+    
+    Args:
+        data_yaml: مسار ملف data.yaml
+        limit: الحد الأقصى لعدد الصور
+        
+    Returns:
+        list: مسارات الصور
+    """
+    import yaml
+    
+    with open(data_yaml, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    
+    # المسار في data.yaml نسبي لجذر المشروع، وإلا نستخدم مجلد الملف نفسه
+    root = data.get('path', '')
+    if not os.path.isdir(root):
+        root = os.path.dirname(os.path.abspath(data_yaml))
+    
+    val_dir = os.path.join(root, data['val'])
+    images = sorted(
+        os.path.join(val_dir, name) for name in os.listdir(val_dir)
+        if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))
+    )
+    
+    return images[:limit] if limit else images
+
+def quantize_model(fp32_path="./outputs/sperm-analyzer-v1/weights/best.onnx",
+                   int8_path="./outputs/sperm-analyzer-v1/weights/best-int8.onnx",
+                   calibration_images=200):
+    """
+    تكميم النموذج إلى INT8 بالمعايرة الثابتة على صور التحقق
+    
+    Args:
+        fp32_path: مسار نموذج ONNX الأصلي (ناتج export_model)
+        int8_path: مسار نموذج INT8 الناتج
+        calibration_images: عدد صور المعايرة
+        
+    Returns:
+        str: مسار النموذج المكمم أو None عند الفشل
+    """
+    try:
+        import cv2
+        from onnxruntime.quantization import (CalibrationDataReader, QuantFormat,
+                                              QuantType, quantize_static)
+        from utils.onnx_detector import OnnxDetector
+        
+        if not os.path.exists(fp32_path):
+            print("❌ لم يتم العثور على نموذج ONNX - شغّل export_model أولاً")
+            return None
+        
+        images = load_val_images(limit=calibration_images)
+        if not images:
+            print("❌ لا توجد صور تحقق للمعايرة")
+            return None
+        
+        # نفس المعالجة المسبقة المستخدمة أثناء التحليل
+        detector = OnnxDetector(fp32_path)
+        
+        class ValCalibrationReader(CalibrationDataReader):
+            def __init__(self):
+                self.paths = iter(images)
+            
+            def get_next(self):
+                for path in self.paths:
+                    image = cv2.imread(path)
+                    if image is not None:
+                        blob, _ = detector.preprocess([image])
+                        return {detector.input_name: blob.copy()}
+                return None
+        
+        print(f"⚙️  معايرة التكميم على {len(images)} صورة تحقق...")
+        quantize_static(
+            fp32_path, int8_path, ValCalibrationReader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8
+        )
+        
+        print(f"✅ تم تكميم النموذج إلى INT8: {int8_path}")
+        return int8_path
+        
+    except Exception as e:
+        print(f"❌ خطأ في التكميم: {e}")
+        return None
+
+def publish_models(weights_dir="./outputs/sperm-analyzer-v1/weights"):
+    """
+    نسخ النماذج المدربة إلى مسارات MODEL_VARIANTS التي يحملها المحلل
+    (--model pt / onnx / int8)
+    
+    Args:
+        weights_dir: مجلد أوزان التدريب (best.pt و best.onnx و best-int8.onnx)
+        
+    Returns:
+        list: مسارات النماذج المنسوخة
+    """
+    import shutil
+    from analyze_media import MODEL_VARIANTS
+    
+    sources = {'pt': 'best.pt', 'onnx': 'best.onnx', 'int8': 'best-int8.onnx'}
+    published = []
+    
+    for variant, name in sources.items():
+        source = os.path.join(weights_dir, name)
+        if not os.path.exists(source):
+            print(f"⚠️ لم يتم العثور على {source} - لن يتوفر --model {variant}")
+            continue
+        
+        target = MODEL_VARIANTS[variant]
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        shutil.copy2(source, target)
+        published.append(target)
+        print(f"📦 --model {variant}: {target}")
+    
+    return published
+
+def benchmark_onnx_model(model_path, images, warmup=5):
+    """
+    قياس زمن الاستدلال على المعالج بالميلي ثانية لكل إطار
+    
+    Args:
+        model_path: مسار نموذج ONNX
+        images: مسارات صور القياس
+        warmup: عدد التمريرات التمهيدية
+        
+    Returns:
+        float: متوسط الزمن (ms/frame)
+    """
+    import time
+    import cv2
+    from utils.onnx_detector import OnnxDetector
+    
+    detector = OnnxDetector(model_path)
+    frames = [f for f in (cv2.imread(p) for p in images) if f is not None]
+    if not frames:
+        return 0.0
+    
+    for frame in frames[:warmup]:
+        detector(frame)
+    
+    start = time.perf_counter()
+    for frame in frames:
+        detector(frame)
+    
+    return (time.perf_counter() - start) * 1000 / len(frames)
+
+def quantization_report(fp32_path="./outputs/sperm-analyzer-v1/weights/best.onnx",
+                        int8_path="./outputs/sperm-analyzer-v1/weights/best-int8.onnx",
+                        benchmark_images=50,
+                        report_path="./outputs/quantization_report.json"):
+    """
+    مقارنة نموذجي FP32 و INT8 من حيث الدقة (mAP50) والسرعة على المعالج
+    
+    Returns:
+        dict: التقرير المقارن
+    """
+    import json
+    
+    images = load_val_images(limit=benchmark_images)
+    report = {}
+    
+    for name, path in (('fp32', fp32_path), ('int8', int8_path)):
+        if not os.path.exists(path):
+            print(f"❌ النموذج غير موجود: {path}")
+            continue
+        
+        metrics = test_model(path) or {}
+        report[name] = {
+            'model_path': path,
+            'size_mb': os.path.getsize(path) / (1024 * 1024),
+            'map50': metrics.get('map50'),
+            'cpu_ms_per_frame': benchmark_onnx_model(path, images)
+        }
+    
+    print("\n📋 مقارنة FP32 / INT8:")
+    print(f"{'Model':<6} {'mAP50':>8} {'ms/frame':>10} {'MB':>8}")
+    for name, row in report.items():
+        map50 = f"{row['map50']:.3f}" if row['map50'] is not None else 'n/a'
+        print(f"{name:<6} {map50:>8} {row['cpu_ms_per_frame']:>10.1f} {row['size_mb']:>8.1f}")
+    
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📁 التقرير: {report_path}")
+    
+    return report
+
 if __name__ == "__main__":
     print("🚀 Sky CASA - AI Sperm Analysis Model Training")
     print("=" * 50)
@@ -132,6 +335,13 @@ if __name__ == "__main__":
         print("\n🎯 تصدير النموذج...")
         export_model()
         
+        print("\n⚙️  تكميم النموذج إلى INT8...")
+        if quantize_model():
+            quantization_report()
+        
+        print("\n📦 نسخ النماذج إلى مجلد models...")
+        publish_models()
+        
         print("\n🎉 تم إنهاء العملية بنجاح!")
         print("🔗 يمكنك الآن استخدام النموذج في التطبيق الرئيسي")
     else:
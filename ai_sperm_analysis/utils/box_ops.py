@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Bounding Box Operations
+عمليات الصناديق المحيطة (IoU و NMS) باستخدام NumPy
+
+All boxes are (N, 4) arrays in [x1, y1, x2, y2] pixel coordinates.
+Per-frame detections are kept in a compact structured array (DETECTION_DTYPE).
+"""
+
+import numpy as np
+from numpy.lib import recfunctions
+
+# صيغة مصفوفة الكشوفات المدمجة: صندوق + معامل ثقة لكل كشف
+DETECTION_DTYPE = np.dtype([
+    ('x1', np.float32), ('y1', np.float32),
+    ('x2', np.float32), ('y2', np.float32),
+    ('conf', np.float32),
+])
+
+
+def to_detections(data):
+    """
+    تحويل مصفوفة (N, >=5) بصيغة x1, y1, x2, y2, conf إلى مصفوفة كشوفات مدمجة
+
+    Args:
+        data: مصفوفة NumPy (N, 5) أو (N, 6) مع عمود الفئة
+
+    Returns:
+        np.ndarray: مصفوفة منظمة بصيغة DETECTION_DTYPE
+    """
+    data = np.asarray(data, dtype=np.float32)
+    if data.size == 0:
+        return np.zeros(0, dtype=DETECTION_DTYPE)
+
+    return recfunctions.unstructured_to_structured(np.ascontiguousarray(data[:, :5]), dtype=DETECTION_DTYPE)
+
+
+def detection_boxes(detections):
+    """صناديق الكشوفات كمصفوفة (N, 4)"""
+    return recfunctions.structured_to_unstructured(detections[['x1', 'y1', 'x2', 'y2']])
+
+
+def box_area(boxes):
+    """
+    حساب مساحة الصناديق
+
+    Args:
+        boxes: مصفوفة (N, 4) بصيغة x1, y1, x2, y2
+
+    Returns:
+        np.ndarray: مساحة كل صندوق (N,)
+    """
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def box_intersection(box, boxes):
+    """مساحة التقاطع بين صندوق واحد ومجموعة صناديق (N,)"""
+    xx1 = np.maximum(box[0], boxes[:, 0])
+    yy1 = np.maximum(box[1], boxes[:, 1])
+    xx2 = np.minimum(box[2], boxes[:, 2])
+    yy2 = np.minimum(box[3], boxes[:, 3])
+
+    return np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+
+
+def box_iou(box, boxes):
+    """
+    حساب IoU بين صندوق واحد ومجموعة صناديق
+
+    Args:
+        box: صندوق واحد (4,)
+        boxes: مصفوفة (N, 4)
+
+    Returns:
+        np.ndarray: قيم IoU (N,)
+    """
+    inter = box_intersection(box, boxes)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    union = area + box_area(boxes) - inter
+
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def box_ios(box, boxes):
+    """
+    حساب التقاطع نسبة إلى مساحة الصندوق الأصغر (IoS)
+
+    مناسب لدمج الكشوفات بين البلاطات المتجاورة حيث يكون أحد الصندوقين
+    مقطوعاً عند حافة البلاطة فتبقى قيمة IoU منخفضة.
+
+    Args:
+        box: صندوق واحد (4,)
+        boxes: مصفوفة (N, 4)
+
+    Returns:
+        np.ndarray: قيم IoS (N,)
+    """
+    inter = box_intersection(box, boxes)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    smaller = np.minimum(area, box_area(boxes))
+
+    return np.where(smaller > 0, inter / np.maximum(smaller, 1e-9), 0.0)
+
+
+def pairwise_iou(boxes_a, boxes_b):
+    """
+    مصفوفة IoU بين مجموعتين من الصناديق
+
+    Args:
+        boxes_a: مصفوفة (N, 4)
+        boxes_b: مصفوفة (M, 4)
+
+    Returns:
+        np.ndarray: قيم IoU (N, M)
+    """
+    xx1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    yy1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    xx2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    yy2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    union = box_area(boxes_a)[:, None] + box_area(boxes_b)[None, :] - inter
+
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def nms(boxes, scores, iou_threshold=0.7, max_det=300, metric='iou'):
+    """
+    إزالة الصناديق المتداخلة (Non-Maximum Suppression)
+
+    Args:
+        boxes: مصفوفة (N, 4)
+        scores: معاملات الثقة (N,)
+        iou_threshold: حد التداخل للإزالة
+        max_det: الحد الأقصى لعدد الكشوفات المحتفظ بها
+        metric: مقياس التداخل 'iou' أو 'ios'
+
+    Returns:
+        np.ndarray: فهارس الصناديق المحتفظ بها مرتبة حسب الثقة
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    overlap = box_ios if metric == 'ios' else box_iou
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+
+    while order.size > 0 and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+
+        if order.size == 1:
+            break
+
+        # إزالة كل الصناديق التي تتداخل مع الصندوق الحالي دفعة واحدة
+        overlaps = overlap(boxes[i], boxes[order[1:]])
+        order = order[1:][overlaps <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def merge_tiles(boxes, scores, tile_ids, iou_threshold=0.7, ios_threshold=0.5):
+    """
+    دمج كشوفات البلاطات المتداخلة بعد إزاحتها لإحداثيات الصورة
+
+    الصناديق من نفس البلاطة مرت بـ NMS النموذج، فلا يزال منها إلا ما يتجاوز
+    iou_threshold، حتى لا تحذف الحيوانات المنوية المتلاصقة في الحقول الكثيفة.
+    الصناديق من بلاطتين مختلفتين تدمج أيضاً عندما يتجاوز IoS حد ios_threshold
+    لأن أحدها قد يكون مقطوعاً عند حافة بلاطته.
+
+    Args:
+        boxes: مصفوفة (N, 4)
+        scores: معاملات الثقة (N,)
+        tile_ids: رقم البلاطة لكل صندوق (N,)
+        iou_threshold: حد IoU لكل الأزواج (حد NMS النموذج)
+        ios_threshold: حد IoS للأزواج من بلاطات مختلفة
+
+    Returns:
+        np.ndarray: فهارس الصناديق المحتفظ بها مرتبة حسب الثقة
+    """
+    tile_ids = np.asarray(tile_ids)
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        suppress = box_iou(boxes[i], boxes[rest]) > iou_threshold
+        other_tile = tile_ids[rest] != tile_ids[i]
+        suppress |= other_tile & (box_ios(boxes[i], boxes[rest]) > ios_threshold)
+        order = rest[~suppress]
+
+    return np.array(keep, dtype=np.int64)
@@ -16,28 +16,54 @@ CASA Parameters:
 """
 
 import numpy as np
-from scipy.spatial.distance import euclidean
-from scipy.signal import find_peaks
 import math
 
 class CASACalculator:
-    def __init__(self, pixel_to_micron=0.5, fps=30):
+    def __init__(self, pixel_to_micron=0.5, fps=30, smoothing_window=5):
         """
         تهيئة حاسب CASA
         
         Args:
             pixel_to_micron: نسبة تحويل البكسل إلى ميكرون
             fps: عدد الإطارات في الثانية
+            smoothing_window: عدد نقاط نافذة المتوسط المتحرك للمسار المتوسط (VAP)،
+                              النافذة متمركزة فالقيمة الزوجية تعامل كالفردية التالية
         """
         self.pixel_to_micron = pixel_to_micron
         self.fps = fps
+        self.smoothing_window = max(1, int(smoothing_window))
+    
+    def to_microns(self, positions):
+        """
+        تحويل المواضع من البكسل إلى الميكرون
+        
+        Args:
+            positions: list of (x, y) positions أو مصفوفة (N, 2)
+            
+        Returns:
+            np.ndarray: مصفوفة (N, 2) بالميكرون
+        """
+        return np.asarray(positions, dtype=np.float64).reshape(-1, 2) * self.pixel_to_micron
+    
+    def path_length(self, points):
+        """
+        طول المسار: مجموع المسافات بين النقاط المتتالية
+        
+        Args:
+            points: مصفوفة (N, 2)
+            
+        Returns:
+            float: الطول الكلي
+        """
+        steps = np.diff(points, axis=0)
+        return np.hypot(steps[:, 0], steps[:, 1]).sum()
     
     def calculate_velocities(self, positions, timestamps):
         """
         حساب السرعات المختلفة
         
         Args:
-            positions: list of (x, y) positions
+            positions: list of (x, y) positions أو مصفوفة (N, 2)
             timestamps: list of timestamps in milliseconds
             
         Returns:
@@ -47,36 +73,22 @@ class CASACalculator:
             return 0, 0, 0
         
         # تحويل المواضع إلى ميكرونات
-        positions_um = [(x * self.pixel_to_micron, y * self.pixel_to_micron) 
-                       for x, y in positions]
+        positions_um = self.to_microns(positions)
         
-        # تحويل الأوقات إلى ثوان
-        times_s = [(t / 1000.0) for t in timestamps]
-        
-        # حساب VCL - السرعة المنحنية (مجموع المسافات بين النقاط المتتالية)
-        vcl_distances = []
-        for i in range(1, len(positions_um)):
-            dist = euclidean(positions_um[i-1], positions_um[i])
-            vcl_distances.append(dist)
-        
-        total_time = times_s[-1] - times_s[0]
+        # المدة الكلية بالثواني
+        total_time = timestamps[-1] / 1000.0 - timestamps[0] / 1000.0
         if total_time <= 0:
             return 0, 0, 0
         
-        vcl = sum(vcl_distances) / total_time
+        # حساب VCL - السرعة المنحنية (مجموع المسافات بين النقاط المتتالية)
+        vcl = self.path_length(positions_um) / total_time
         
         # حساب VSL - السرعة المستقيمة (المسافة المباشرة من البداية للنهاية)
-        straight_distance = euclidean(positions_um[0], positions_um[-1])
-        vsl = straight_distance / total_time
+        straight = positions_um[-1] - positions_um[0]
+        vsl = np.hypot(straight[0], straight[1]) / total_time
         
         # حساب VAP - متوسط سرعة المسار (المسار المنعم)
-        smoothed_path = self.smooth_path(positions_um)
-        vap_distances = []
-        for i in range(1, len(smoothed_path)):
-            dist = euclidean(smoothed_path[i-1], smoothed_path[i])
-            vap_distances.append(dist)
-        
-        vap = sum(vap_distances) / total_time if vap_distances else vsl
+        vap = self.path_length(self.smooth_path(positions_um)) / total_time
         
         return vcl, vsl, vap
     
@@ -106,7 +118,7 @@ class CASACalculator:
         حساب سعة الانحراف الجانبي للرأس (ALH)
         
         Args:
-            positions: list of (x, y) positions
+            positions: list of (x, y) positions أو مصفوفة (N, 2)
             
         Returns:
             float: ALH in micrometers
@@ -114,21 +126,14 @@ class CASACalculator:
         if len(positions) < 3:
             return 0
         
-        positions_um = [(x * self.pixel_to_micron, y * self.pixel_to_micron) 
-                       for x, y in positions]
-        
-        # حساب الخط المستقيم من البداية للنهاية
-        start, end = positions_um[0], positions_um[-1]
-        
-        # حساب المسافات العمودية من كل نقطة إلى الخط المستقيم
-        perpendicular_distances = []
+        positions_um = self.to_microns(positions)
         
-        for pos in positions_um[1:-1]:  # تجاهل نقطتي البداية والنهاية
-            distance = self.point_to_line_distance(pos, start, end)
-            perpendicular_distances.append(distance)
+        # المسافات العمودية عن الخط المستقيم من البداية للنهاية
+        # (مع تجاهل نقطتي البداية والنهاية)
+        distances = self.point_line_distances(positions_um[1:-1], positions_um[0], positions_um[-1])
         
         # ALH هو متوسط المسافات العمودية
-        alh = np.mean(perpendicular_distances) if perpendicular_distances else 0
+        alh = distances.mean()
         
         return alh
     
@@ -137,7 +142,7 @@ class CASACalculator:
         حساب تردد عبور النبضة (BCF)
         
         Args:
-            positions: list of (x, y) positions
+            positions: list of (x, y) positions أو مصفوفة (N, 2)
             timestamps: list of timestamps
             
         Returns:
@@ -146,20 +151,13 @@ class CASACalculator:
         if len(positions) < 10:
             return 0
         
-        positions_um = [(x * self.pixel_to_micron, y * self.pixel_to_micron) 
-                       for x, y in positions]
+        positions_um = self.to_microns(positions)
         
-        # حساب الخط الرئيسي للحركة
-        start, end = positions_um[0], positions_um[-1]
-        
-        # حساب الانحرافات العمودية عن الخط الرئيسي
-        deviations = []
-        for pos in positions_um:
-            deviation = self.point_to_line_distance(pos, start, end)
-            deviations.append(deviation)
+        # الانحرافات العمودية عن الخط الرئيسي للحركة (من البداية للنهاية)
+        deviations = self.point_line_distances(positions_um, positions_um[0], positions_um[-1])
         
         # البحث عن القمم في الانحرافات (تقاطعات مع الخط الرئيسي)
-        deviations = np.array(deviations)
+        from scipy.signal import find_peaks
         peaks, _ = find_peaks(deviations, height=np.std(deviations) * 0.5)
         
         # حساب التردد
@@ -175,64 +173,307 @@ class CASACalculator:
         """
         تنعيم المسار باستخدام moving average
         
+        نافذة حتى smoothing_window نقطة متمركزة حول كل نقطة، وتقصر عند طرفي المسار.
+        تحسب كل المتوسطات من مجموع تراكمي واحد.
+        
         Args:
-            positions: list of (x, y) positions
+            positions: list of (x, y) positions أو مصفوفة (N, 2)
             
         Returns:
-            list: smoothed positions
+            np.ndarray: smoothed positions (N, 2)
         """
-        if len(positions) < 3:
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        count = len(positions)
+        if count < 3:
             return positions
         
-        window_size = min(5, len(positions))
-        smoothed = []
+        half = min(self.smoothing_window, count) // 2
+        index = np.arange(count)
+        starts = np.maximum(index - half, 0)
+        ends = np.minimum(index + half + 1, count)
         
-        for i in range(len(positions)):
-            start_idx = max(0, i - window_size // 2)
-            end_idx = min(len(positions), i + window_size // 2 + 1)
-            
-            x_vals = [pos[0] for pos in positions[start_idx:end_idx]]
-            y_vals = [pos[1] for pos in positions[start_idx:end_idx]]
-            
-            smooth_x = np.mean(x_vals)
-            smooth_y = np.mean(y_vals)
-            
-            smoothed.append((smooth_x, smooth_y))
+        cumulative = np.zeros((count + 1, 2))
+        np.cumsum(positions, axis=0, out=cumulative[1:])
         
-        return smoothed
+        return (cumulative[ends] - cumulative[starts]) / (ends - starts)[:, None]
     
-    def point_to_line_distance(self, point, line_start, line_end):
+    def point_line_distances(self, points, line_start, line_end):
         """
-        حساب المسافة العمودية من نقطة إلى خط مستقيم
+        المسافات العمودية من مجموعة نقاط إلى خط مستقيم
         
         Args:
-            point: (x, y) النقطة
+            points: مصفوفة (N, 2)
             line_start: (x, y) بداية الخط
             line_end: (x, y) نهاية الخط
             
         Returns:
-            float: المسافة العمودية
+            np.ndarray: المسافات (N,)
         """
-        x0, y0 = point
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x0, y0 = points[:, 0], points[:, 1]
         x1, y1 = line_start
         x2, y2 = line_end
         
-        # إذا كانت نقطتا الخط متطابقتين
+        # إذا كانت نقطتا الخط متطابقتين فالمسافة إلى النقطة نفسها
         if x1 == x2 and y1 == y2:
-            return euclidean(point, line_start)
+            return np.hypot(x0 - x1, y0 - y1)
         
         # حساب المسافة العمودية باستخدام الصيغة الرياضية
-        numerator = abs((y2-y1)*x0 - (x2-x1)*y0 + x2*y1 - y2*x1)
+        numerator = np.abs((y2-y1)*x0 - (x2-x1)*y0 + x2*y1 - y2*x1)
         denominator = math.sqrt((y2-y1)**2 + (x2-x1)**2)
         
         return numerator / denominator
     
+    def point_to_line_distance(self, point, line_start, line_end):
+        """
+        حساب المسافة العمودية من نقطة إلى خط مستقيم
+        
+        Args:
+            point: (x, y) النقطة
+            line_start: (x, y) بداية الخط
+            line_end: (x, y) نهاية الخط
+            
+        Returns:
+            float: المسافة العمودية
+        """
+        return float(self.point_line_distances([point], line_start, line_end)[0])
+    
+    def calculate_batch(self, positions, timestamps, offsets):
+        """
+        حساب معايير CASA لكل المسارات دفعة واحدة
+        
+        المسارات متتالية في مصفوفة واحدة، ومسار k يشغل الصفوف
+        offsets[k]:offsets[k+1]. النتائج تطابق الدوال الفردية لكل مسار
+        (بما فيها القيم الصفرية للمسارات القصيرة أو عديمة المدة).
+        
+        Args:
+            positions: مصفوفة (N, 2) بالبكسل لكل نقاط المسارات
+            timestamps: مصفوفة (N,) بالميلي ثانية
+            offsets: حدود المسارات (K + 1,)
+            
+        Returns:
+            dict: مصفوفات (K,) بالمفاتيح vcl, vsl, vap, lin, str, wob, alh, bcf
+        """
+        positions_um = self.to_microns(positions)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        
+        num_tracks = len(offsets) - 1
+        lengths = np.diff(offsets)
+        track_of = np.repeat(np.arange(num_tracks), lengths)
+        first = offsets[:-1]
+        last = np.maximum(offsets[1:] - 1, first)
+        
+        # المدة الكلية لكل مسار بالثواني
+        total_time = np.zeros(num_tracks)
+        nonempty = lengths > 0
+        total_time[nonempty] = (timestamps[last[nonempty]] / 1000.0
+                                - timestamps[first[nonempty]] / 1000.0)
+        timed = (lengths >= 2) & (total_time > 0)
+        safe_time = np.where(timed, total_time, 1.0)
+        
+        # VCL: مجموع الخطوات داخل كل مسار (بدون الخطوة بين مسارين متتاليين)
+        vcl = np.where(timed, self.batch_path_length(positions_um, track_of, num_tracks) / safe_time, 0.0)
+        
+        # VSL: المسافة المباشرة من البداية للنهاية
+        straight = np.zeros((num_tracks, 2))
+        straight[nonempty] = positions_um[last[nonempty]] - positions_um[first[nonempty]]
+        vsl = np.where(timed, np.hypot(straight[:, 0], straight[:, 1]) / safe_time, 0.0)
+        
+        # VAP: طول المسار المنعم
+        smoothed = self.batch_smooth_path(positions_um, offsets, track_of)
+        vap = np.where(timed, self.batch_path_length(smoothed, track_of, num_tracks) / safe_time, 0.0)
+        
+        # LIN / STR / WOB
+        lin = np.where(vcl > 0, vsl / np.where(vcl > 0, vcl, 1.0) * 100, 0.0)
+        str_val = np.where(vap > 0, vsl / np.where(vap > 0, vap, 1.0) * 100, 0.0)
+        wob = np.where(vcl > 0, vap / np.where(vcl > 0, vcl, 1.0) * 100, 0.0)
+        
+        # الانحرافات العمودية لكل نقطة عن خط بداية ونهاية مسارها
+        deviations = np.zeros(len(positions_um))
+        if len(positions_um):
+            deviations = self.batch_line_distances(positions_um, positions_um[first[track_of]],
+                                                   positions_um[last[track_of]])
+        
+        # ALH: متوسط الانحرافات للنقاط الداخلية (مسارات من 3 نقاط فأكثر)
+        local = np.arange(len(positions_um)) - first[track_of]
+        interior = (local > 0) & (local < lengths[track_of] - 1)
+        interior_sum = np.bincount(track_of[interior], weights=deviations[interior], minlength=num_tracks)
+        alh = np.where(lengths >= 3, interior_sum / np.maximum(lengths - 2, 1), 0.0)
+        
+        # BCF: عدد قمم الانحراف فوق نصف الانحراف المعياري لكل مسار (10 نقاط فأكثر)
+        counts = np.maximum(lengths, 1)
+        mean_dev = np.bincount(track_of, weights=deviations, minlength=num_tracks) / counts
+        var_dev = np.bincount(track_of, weights=(deviations - mean_dev[track_of]) ** 2,
+                              minlength=num_tracks) / counts
+        peaks = self.batch_peak_counts(deviations, offsets, track_of, 0.5 * np.sqrt(var_dev))
+        bcf = np.where((lengths >= 10) & (total_time > 0) & (peaks > 1),
+                       peaks / np.where(total_time > 0, total_time, 1.0), 0.0)
+        
+        return {
+            'vcl': vcl, 'vsl': vsl, 'vap': vap,
+            'lin': lin, 'str': str_val, 'wob': wob,
+            'alh': alh, 'bcf': bcf,
+        }
+    
+    def calculate_time_series(self, positions, timestamps, offsets, window_seconds, min_points=5):
+        """
+        سلسلة زمنية للحركة بنوافذ متتالية مدة كل منها window_seconds
+
+        كل مسار يقسم إلى أجزاء حسب النافذة التي تقع فيها نقاطه، وتحسب VCL و VSL
+        وتصنيف WHO لكل جزء بتمريرة واحدة على كل النقاط (بدون إعادة التحليل لكل نافذة).
+        الخطوة بين نقطتين في نافذتين مختلفتين لا تحسب لأي منهما.
+
+        Args:
+            positions: مصفوفة (N, 2) بالبكسل لكل نقاط المسارات
+            timestamps: مصفوفة (N,) بالميلي ثانية
+            offsets: حدود المسارات (K + 1,)
+            window_seconds: مدة النافذة بالثواني
+            min_points: أقل عدد نقاط لجزء المسار داخل النافذة حتى يحتسب
+
+        Returns:
+            dict: مصفوفات لكل نافذة: start_s, tracks, vcl_mean, vsl_mean, progressive_percent
+        """
+        if not window_seconds > 0:
+            raise ValueError(f"مدة النافذة يجب أن تكون موجبة: {window_seconds}")
+
+        positions_um = self.to_microns(positions)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if len(timestamps) == 0:
+            return {name: np.zeros(0) for name in
+                    ('start_s', 'tracks', 'vcl_mean', 'vsl_mean', 'progressive_percent')}
+
+        track_of = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        window = ((timestamps - timestamps.min()) // (window_seconds * 1000.0)).astype(np.int64)
+        num_windows = int(window.max()) + 1
+
+        # أجزاء (مسار، نافذة): النقاط مرتبة مساراً بمسار وزمنياً داخل كل مسار فكل جزء متصل
+        part = track_of * num_windows + window
+        new_part = np.ones(len(part), dtype=bool)
+        new_part[1:] = part[1:] != part[:-1]
+        part_of = np.cumsum(new_part) - 1
+        first = np.flatnonzero(new_part)
+        last = np.append(first[1:], len(part)) - 1
+        num_parts = len(first)
+
+        # VCL و VSL لكل جزء
+        steps = np.diff(positions_um, axis=0)
+        step_lengths = np.hypot(steps[:, 0], steps[:, 1])
+        step_lengths[part_of[1:] != part_of[:-1]] = 0.0
+        path = np.bincount(part_of[1:], weights=step_lengths, minlength=num_parts)
+
+        span = timestamps[last] / 1000.0 - timestamps[first] / 1000.0
+        counted = (last - first + 1 >= min_points) & (span > 0)
+        safe_span = np.where(counted, span, 1.0)
+
+        straight = positions_um[last] - positions_um[first]
+        vcl = np.where(counted, path / safe_span, 0.0)
+        vsl = np.where(counted, np.hypot(straight[:, 0], straight[:, 1]) / safe_span, 0.0)
+        lin = np.where(vcl > 0, vsl / np.where(vcl > 0, vcl, 1.0) * 100, 0.0)
+        progressive = np.isin(self.who_grades(vsl, lin, vcl), ('A', 'B')) & counted
+
+        # تجميع الأجزاء المحتسبة لكل نافذة
+        part_window = window[first]
+        tracks = np.bincount(part_window, weights=counted, minlength=num_windows)
+        safe_tracks = np.maximum(tracks, 1)
+
+        return {
+            'start_s': np.arange(num_windows) * float(window_seconds),
+            'tracks': tracks.astype(np.int64),
+            'vcl_mean': np.bincount(part_window, weights=vcl, minlength=num_windows) / safe_tracks,
+            'vsl_mean': np.bincount(part_window, weights=vsl, minlength=num_windows) / safe_tracks,
+            'progressive_percent': np.bincount(part_window, weights=progressive,
+                                               minlength=num_windows) / safe_tracks * 100,
+        }
+
+    def batch_path_length(self, points, track_of, num_tracks):
+        """طول المسار لكل مسار من الخطوات بين النقاط المتتالية داخل نفس المسار"""
+        steps = np.diff(points, axis=0)
+        step_lengths = np.hypot(steps[:, 0], steps[:, 1])
+        step_lengths[track_of[1:] != track_of[:-1]] = 0.0
+        
+        return np.bincount(track_of[1:], weights=step_lengths, minlength=num_tracks)
+    
+    def batch_smooth_path(self, points, offsets, track_of):
+        """
+        moving average لكل المسارات بنفس نافذة smooth_path
+        
+        النافذة لا تتجاوز حدود المسار، والمسارات الأقصر من 3 نقاط لا تنعم.
+        """
+        lengths = np.diff(offsets)
+        half = np.where(lengths >= 3, np.minimum(lengths, self.smoothing_window) // 2, 0)[track_of]
+        
+        index = np.arange(len(points))
+        starts = np.maximum(index - half, offsets[:-1][track_of])
+        ends = np.minimum(index + half + 1, offsets[1:][track_of])
+        
+        # مجموع النافذة بإزاحة المصفوفة نفسها للأمام والخلف
+        total = points.copy()
+        for shift in range(1, self.smoothing_window // 2 + 1):
+            ahead = index[:-shift] + shift < ends[:-shift]
+            total[:-shift] += points[shift:] * ahead[:, None]
+            behind = index[shift:] - shift >= starts[shift:]
+            total[shift:] += points[:-shift] * behind[:, None]
+        
+        return total / (ends - starts)[:, None]
+    
+    def batch_line_distances(self, points, line_start, line_end):
+        """المسافة العمودية لكل نقطة عن خطها الخاص (line_start/line_end لكل صف)"""
+        x0, y0 = points[:, 0], points[:, 1]
+        x1, y1 = line_start[:, 0], line_start[:, 1]
+        x2, y2 = line_end[:, 0], line_end[:, 1]
+        
+        denominator = np.sqrt((y2-y1)**2 + (x2-x1)**2)
+        degenerate = denominator == 0
+        
+        numerator = np.abs((y2-y1)*x0 - (x2-x1)*y0 + x2*y1 - y2*x1)
+        return np.where(degenerate, np.hypot(x0 - x1, y0 - y1),
+                        numerator / np.where(degenerate, 1.0, denominator))
+    
+    def batch_peak_counts(self, values, offsets, track_of, min_height):
+        """
+        عدد القمم المحلية في كل مسار كما تحسبها scipy.signal.find_peaks
+        
+        القمة قيمة (أو هضبة من قيم متساوية) أعلى من جارتيها داخل نفس المسار،
+        والهضبة عند طرف المسار ليست قمة.
+        
+        Args:
+            values: القيم لكل النقاط (N,)
+            offsets: حدود المسارات (K + 1,)
+            track_of: رقم المسار لكل نقطة (N,)
+            min_height: أدنى ارتفاع للقمة لكل مسار (K,)
+            
+        Returns:
+            np.ndarray: عدد القمم لكل مسار (K,)
+        """
+        num_tracks = len(offsets) - 1
+        if len(values) == 0:
+            return np.zeros(num_tracks, dtype=np.int64)
+        
+        # ضغط كل هضبة إلى تسلسل واحد داخل مسارها
+        new_run = np.ones(len(values), dtype=bool)
+        new_run[1:] = (values[1:] != values[:-1]) | (track_of[1:] != track_of[:-1])
+        run_starts = np.flatnonzero(new_run)
+        run_values = values[run_starts]
+        run_track = track_of[run_starts]
+        
+        # قمة: تسلسل له سابق ولاحق في نفس المسار وكلاهما أقل منه
+        peak = np.zeros(len(run_starts), dtype=bool)
+        if len(run_starts) >= 3:
+            inner = slice(1, -1)
+            peak[inner] = ((run_track[:-2] == run_track[1:-1]) & (run_track[2:] == run_track[1:-1])
+                           & (run_values[:-2] < run_values[inner]) & (run_values[2:] < run_values[inner]))
+        
+        peak &= run_values >= min_height[run_track]
+        return np.bincount(run_track[peak], minlength=num_tracks)
+    
     def analyze_motility_pattern(self, positions, timestamps):
         """
         تحليل نمط الحركة بشكل شامل
         
         Args:
-            positions: list of (x, y) positions
+            positions: list of (x, y) positions أو مصفوفة (N, 2)
             timestamps: list of timestamps
             
         Returns:
@@ -264,7 +505,7 @@ class CASACalculator:
             'bcf': bcf,
             'pattern': pattern_type,
             'quality_score': quality_score,
-            'who_grade': self.get_who_grade(vsl, lin)
+            'who_grade': self.get_who_grade(vsl, lin, vcl)
         }
     
     def classify_movement_pattern(self, vcl, vsl, lin, str_val, alh):
@@ -274,16 +515,26 @@ class CASACalculator:
         Returns:
             str: نوع النمط
         """
-        if vcl < 5:
-            return 'immotile'
-        elif vsl >= 25 and lin >= 50:
-            return 'rapid_progressive'
-        elif vsl >= 5 and lin >= 25:
-            return 'slow_progressive'
-        elif vcl >= 5 and alh > 2:
-            return 'hyperactivated'
-        else:
-            return 'non_progressive'
+        return str(self.movement_patterns(vcl, vsl, lin, str_val, alh)[()])
+    
+    def movement_patterns(self, vcl, vsl, lin, str_val, alh):
+        """
+        تصنيف نمط الحركة لمصفوفات من المسارات (نفس قواعد classify_movement_pattern)
+        
+        Args:
+            alh: ALH حول خط البداية والنهاية، أو None إذا لم يتوفر (وضع online_metrics)
+                 فلا يصنف أي مسار hyperactivated
+        
+        Returns:
+            np.ndarray: نوع النمط لكل مسار
+        """
+        vcl, vsl, lin = (np.asarray(v, dtype=np.float64) for v in (vcl, vsl, lin))
+        hyperactivated = np.asarray(alh, dtype=np.float64) > 2 if alh is not None else False
+        
+        return np.select(
+            [vcl < 5, (vsl >= 25) & (lin >= 50), (vsl >= 5) & (lin >= 25), hyperactivated],
+            ['immotile', 'rapid_progressive', 'slow_progressive', 'hyperactivated'],
+            default='non_progressive')
     
     def calculate_movement_quality(self, vcl, vsl, lin, str_val):
         """
@@ -302,21 +553,36 @@ class CASACalculator:
         
         return min(total_score, 100)
     
-    def get_who_grade(self, vsl, lin):
+    def get_who_grade(self, vsl, lin, vcl=None):
         """
         تصنيف حسب معايير WHO
         
+        Args:
+            vsl, lin: السرعة المستقيمة والخطية
+            vcl: السرعة المنحنية (اختياري). عند تمريرها يصنف المسار غير متحرك
+                 إذا كانت أقل من 5 μm/s، وإلا فعند انعدام الإزاحة المستقيمة فقط
+        
         Returns:
             str: التصنيف (A, B, C, D)
         """
-        if vsl >= 25 and lin >= 50:
-            return 'A'  # Rapid progressive
-        elif vsl >= 5 and lin >= 25:
-            return 'B'  # Slow progressive
-        elif vsl > 0:
-            return 'C'  # Non-progressive
-        else:
-            return 'D'  # Immotile
+        return str(self.who_grades(vsl, lin, vcl)[()])
+    
+    def who_grades(self, vsl, lin, vcl=None):
+        """
+        تصنيف WHO لمصفوفات من المسارات (نفس قواعد get_who_grade)
+        
+        Returns:
+            np.ndarray: التصنيف (A, B, C, D) لكل مسار
+        """
+        vsl, lin = np.asarray(vsl, dtype=np.float64), np.asarray(lin, dtype=np.float64)
+        immotile = np.asarray(vcl, dtype=np.float64) < 5 if vcl is not None else vsl <= 0
+        
+        return np.select(
+            [immotile, (vsl >= 25) & (lin >= 50), (vsl >= 5) & (lin >= 25)],
+            ['D',      # Immotile
+             'A',      # Rapid progressive
+             'B'],     # Slow progressive
+            default='C')  # Non-progressive
 
 # مثال للاستخدام والاختبار
 if __name__ == "__main__":
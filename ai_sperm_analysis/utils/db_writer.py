@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Database Writer
+كاتب قاعدة بيانات واحد طويل العمر لكل ملف SQLite داخل العملية
+
+All writes to a database file go through one background thread that owns
+a long-lived connection (WAL journal, busy timeout, statement cache reused
+across results). The writer creates the tables it is given (schema) once,
+when it opens that connection. Write jobs are queued from any thread;
+submit_many() queues several jobs that are always committed together, and
+jobs waiting together are committed in one transaction, each inside its own SAVEPOINT
+so a failing job does not discard the others. When the database is locked
+by another process (e.g. the C# application) past the busy timeout, the
+whole batch is rolled back and retried with exponential backoff, and the
+final error is raised to the caller instead of being lost.
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# كاتب واحد لكل ملف قاعدة بيانات في العملية
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path, schema=None):
+    """الكاتب المشترك لملف قاعدة البيانات (ينشأ عند أول طلب بمخطط ذلك الطلب)"""
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = _writers[db_path] = DatabaseWriter(db_path, schema=schema)
+        return writer
+
+
+def close_all():
+    """إنهاء كل الكتّاب بعد كتابة ما في طوابيرهم (عند خروج العملية)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def forget_writers():
+    """عملية ناتجة عن fork لا ترث خيوط الكتابة، فتنشئ كتّابها من جديد"""
+    global _writers_lock
+    _writers.clear()
+    _writers_lock = threading.Lock()
+
+
+atexit.register(close_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=forget_writers)
+
+
+def is_busy_error(error):
+    """هل الخطأ بسبب قفل قاعدة البيانات من اتصال آخر"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class DatabaseWriter:
+    def __init__(self, db_path, schema=None, busy_timeout=5.0, max_retries=5, retry_delay=0.1,
+                 batch_limit=64):
+        """
+        تهيئة كاتب قاعدة البيانات وتشغيل خيط الكتابة
+
+        Args:
+            db_path: مسار ملف SQLite
+            schema: جمل CREATE ... IF NOT EXISTS تنفذ مرة واحدة عند فتح الاتصال (اختياري)
+            busy_timeout: مدة انتظار القفل بالثواني قبل اعتبار المحاولة فاشلة
+            max_retries: عدد إعادة محاولة الدفعة عند بقاء القفل
+            retry_delay: التأخير الأول بين المحاولات بالثواني (يتضاعف)
+            batch_limit: أقصى عدد مهام في معاملة واحدة
+        """
+        self.db_path = db_path
+        self.schema = schema
+        self.busy_timeout = busy_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.batch_limit = batch_limit
+
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='sqlite-writer', daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        """فتح الاتصال طويل العمر داخل خيط الكتابة"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+
+        if self.schema:
+            try:
+                conn.executescript(self.schema)
+            except Exception:
+                # يعاد فتح الاتصال وإنشاء الجداول مع الدفعة التالية
+                conn.close()
+                raise
+        return conn
+
+    def submit(self, job):
+        """
+        إضافة مهمة كتابة للطابور
+
+        Args:
+            job: دالة تستقبل cursor وتعيد قيمة (تنفذ داخل معاملة)
+
+        Returns:
+            Future: قيمة المهمة بعد تثبيت المعاملة، أو الخطأ
+        """
+        return self.submit_many([job])[0]
+
+    def submit_many(self, jobs):
+        """
+        إضافة عدة مهام للطابور دفعة واحدة فتكتب في نفس المعاملة
+
+        Returns:
+            list: Future لكل مهمة بنفس الترتيب
+        """
+        items = [(job, Future()) for job in jobs]
+        if items:
+            self.jobs.put(items)
+        return [future for _, future in items]
+
+    def close(self):
+        """إنهاء خيط الكتابة بعد كتابة ما في الطابور"""
+        if self.thread.is_alive():
+            self.jobs.put(None)
+            self.thread.join()
+
+    def run(self):
+        """حلقة خيط الكتابة: تجميع المهام المنتظرة وكتابتها في معاملة واحدة"""
+        conn = None
+        stopping = False
+
+        while not stopping:
+            # كل عنصر في الطابور قائمة مهام من submit_many (أو None للإنهاء)
+            items = [self.jobs.get()]
+            count = len(items[0] or ())
+            while count < self.batch_limit:
+                try:
+                    items.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+                count += len(items[-1] or ())
+
+            stopping = None in items
+            batch = [job for item in items if item is not None for job in item]
+            if not batch:
+                continue
+
+            try:
+                if conn is None:
+                    conn = self.connect()
+                self.run_batch(conn, batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+        if conn is not None:
+            conn.close()
+
+    def run_batch(self, conn, batch):
+        """
+        تنفيذ دفعة مهام في معاملة واحدة مع إعادة المحاولة عند قفل قاعدة البيانات
+
+        نتائج المهام لا تسلم إلا بعد نجاح COMMIT.
+        """
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            outcomes = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+                for job, _ in batch:
+                    cursor.execute("SAVEPOINT job")
+                    try:
+                        outcomes.append((True, job(cursor)))
+                        cursor.execute("RELEASE job")
+                    except Exception as e:
+                        if is_busy_error(e):
+                            raise
+                        cursor.execute("ROLLBACK TO job")
+                        cursor.execute("RELEASE job")
+                        outcomes.append((False, e))
+                conn.execute("COMMIT")
+                break
+
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if not is_busy_error(e) or attempt == self.max_retries:
+                    raise
+                print(f"⚠️ قاعدة البيانات مقفلة، إعادة المحاولة بعد {delay:.2f} ثانية")
+                time.sleep(delay)
+                delay *= 2
+
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
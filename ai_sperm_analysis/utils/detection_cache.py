@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Detection Cache
+حفظ كشوفات كل إطار لإعادة التتبع وحساب CASA بدون تشغيل النموذج
+
+The cache is a single .npz file with per-frame columns (frame index,
+timestamp, offset into the detection columns) and per-detection columns
+(boxes, confidences), plus a JSON metadata record. Its name is derived
+from a hash of the media file, of the model and of the detection settings
+(duration, keyframe interval, flow error, confidence/IoU thresholds), so a
+cache is reused only for the same video analyzed the same way. The
+settings are also stored in the metadata; mismatches() compares them with
+the settings of a new run.
+
+The cached detections are exactly what the tracker received in each
+frame. With keyframe_interval > 1 that includes the optical-flow boxes
+between keyframes; those frames are flagged in the per-frame `propagated`
+column and their boxes keep the confidence of the detection they were
+propagated from.
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+
+import numpy as np
+from utils.box_ops import DETECTION_DTYPE
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    بصمة SHA-256 لمحتوى ملف بقراءة متدفقة
+
+    Args:
+        path: مسار الملف
+        chunk_size: حجم كل قراءة بالبايت
+
+    Returns:
+        str: البصمة بالنظام الست عشري
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(model_path):
+    """
+    بصمة النموذج: محتوى الملف إن وجد، وإلا اسمه (مثل yolov8n.pt الافتراضي)
+    """
+    if model_path and os.path.exists(model_path):
+        return file_hash(model_path)
+    return hashlib.sha256(str(model_path).encode('utf-8')).hexdigest()
+
+
+def settings_hash(settings):
+    """بصمة إعدادات الكشف (JSON موحد الترتيب)"""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def cache_path(cache_dir, media_hash, model_hash, settings=None):
+    """
+    مسار ملف الكشوفات لفيديو ونموذج وإعدادات كشف محددة
+
+    Args:
+        settings: إعدادات الكشف المؤثرة في محتوى الملف (انظر SpermAnalyzer.detection_settings)
+    """
+    name = f"{media_hash[:16]}_{model_hash[:16]}"
+    if settings is not None:
+        name += f"_{settings_hash(settings)[:8]}"
+    return os.path.join(cache_dir, name + ".npz")
+
+
+class DetectionRecorder:
+    def __init__(self):
+        """تجميع كشوفات الإطارات أثناء التحليل"""
+        self.frames = []
+        self.timestamps = []
+        self.counts = []
+        self.propagated = []
+        self.detections = []
+
+    def add(self, frame_index, timestamp, dets, propagated=False):
+        """
+        تسجيل كشوفات إطار واحد
+
+        Args:
+            frame_index: رقم الإطار
+            timestamp: توقيت الإطار بالميلي ثانية
+            dets: مصفوفة كشوفات بصيغة DETECTION_DTYPE
+            propagated: صناديق منقولة بالتدفق البصري وليست من النموذج
+        """
+        self.frames.append(frame_index)
+        self.timestamps.append(timestamp)
+        self.counts.append(len(dets))
+        self.propagated.append(propagated)
+        self.detections.append(dets)
+
+    def save(self, path, metadata):
+        """
+        حفظ الكشوفات المجمعة كملف .npz عمودي مضغوط
+
+        Args:
+            path: مسار الملف
+            metadata: dict يحفظ كـ JSON مع الكشوفات (fps، بصمات الفيديو والنموذج، ...)
+        """
+        dets = (np.concatenate(self.detections) if self.detections
+                else np.zeros(0, dtype=DETECTION_DTYPE))
+        offsets = np.zeros(len(self.counts) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=offsets[1:])
+
+        metadata = dict(metadata, created=datetime.now().isoformat(), frames=len(self.frames),
+                        propagated_frames=int(sum(self.propagated)))
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez_compressed(
+            path,
+            frame_index=np.asarray(self.frames, dtype=np.int64),
+            timestamp=np.asarray(self.timestamps, dtype=np.float64),
+            offsets=offsets,
+            propagated=np.asarray(self.propagated, dtype=bool),
+            boxes=np.column_stack([dets['x1'], dets['y1'], dets['x2'], dets['y2']]).astype(np.float32),
+            conf=dets['conf'].astype(np.float32),
+            metadata=np.array(json.dumps(metadata, ensure_ascii=False)),
+        )
+
+
+class DetectionCache:
+    def __init__(self, path):
+        """
+        قراءة ملف كشوفات محفوظ
+
+        Args:
+            path: مسار ملف .npz من DetectionRecorder.save
+        """
+        with np.load(path, allow_pickle=False) as data:
+            self.frame_index = data['frame_index']
+            self.timestamp = data['timestamp']
+            self.offsets = data['offsets']
+            boxes = data['boxes'].reshape(-1, 4)
+            conf = data['conf']
+            self.metadata = json.loads(str(data['metadata']))
+            # ملفات أقدم بدون العمود: كل الإطارات من النموذج
+            self.propagated = (data['propagated'] if 'propagated' in data.files
+                               else np.zeros(len(self.frame_index), dtype=bool))
+
+        self.path = path
+        self.detections = np.zeros(len(conf), dtype=DETECTION_DTYPE)
+        for i, name in enumerate(('x1', 'y1', 'x2', 'y2')):
+            self.detections[name] = boxes[:, i]
+        self.detections['conf'] = conf
+
+    def __len__(self):
+        return len(self.frame_index)
+
+    @property
+    def settings(self):
+        """إعدادات الكشف المحفوظة (الملفات الأقدم تحفظ بعضها في أعلى البيانات الوصفية)"""
+        settings = self.metadata.get('detection_settings')
+        if settings is None:
+            settings = {name: self.metadata.get(name)
+                        for name in ('duration_seconds', 'keyframe_interval')}
+        return settings
+
+    def mismatches(self, settings):
+        """
+        مقارنة إعدادات الكشف المحفوظة بإعدادات تشغيل جديد
+
+        Args:
+            settings: dict الإعدادات المطلوبة، والقيم None لا تقارن
+
+        Returns:
+            list: (الاسم، القيمة المحفوظة، القيمة المطلوبة) لكل إعداد مختلف
+        """
+        cached = self.settings
+        return [(name, cached.get(name), value) for name, value in settings.items()
+                if value is not None and cached.get(name) != value]
+
+    def frames(self):
+        """
+        كشوفات الإطارات بالترتيب
+
+        Yields:
+            tuple: (رقم الإطار، التوقيت بالميلي ثانية، كشوفات DETECTION_DTYPE)
+        """
+        for i in range(len(self.frame_index)):
+            yield (int(self.frame_index[i]), float(self.timestamp[i]),
+                   self.detections[self.offsets[i]:self.offsets[i + 1]])
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Online CASA Accumulators
+حساب معايير CASA أثناء التتبع نقطة بنقطة بدون تخزين المسارات الكاملة
+
+Each live track keeps a constant-size state: running path length, start
+point, the last points of the VAP moving-average window and running
+deviation statistics about the average path. Every new point updates the
+state in O(1); a track that has not been seen for more than max_age frames
+is finalized into a result row and its state is freed, so memory follows
+the number of live tracks instead of the clip length.
+
+VCL, VSL and VAP match CASACalculator.calculate_batch exactly (same
+moving-average window, shrinking at the track ends). The batch ALH and BCF
+are measured about the start-end chord, which is not known until the track
+ends, so the online table reports the WHO definitions about the average
+path under their own columns instead (alh_avgpath / bcf_avgpath). They are
+not comparable with alh / bcf and are not used for movement patterns:
+- alh_avgpath: mean perpendicular distance of the head from the average path
+- bcf_avgpath: rate (Hz) at which the curvilinear path crosses the average path
+"""
+
+import copy
+import math
+from collections import deque
+
+import numpy as np
+
+# أعمدة صف النتائج لكل مسار منتهٍ
+KINEMATIC_COLUMNS = ('length', 'vcl', 'vsl', 'vap', 'lin', 'str', 'wob', 'alh_avgpath', 'bcf_avgpath')
+
+
+class TrackAccumulator:
+    """حالة مسار حي بحجم ثابت تحدث مع كل نقطة"""
+
+    __slots__ = ('count', 'first_t', 'last_t', 'last_frame', 'start', 'last', 'path',
+                 'window', 'recent', 'trail', 'smoothed', 'smooth_path', 'deviation_sum',
+                 'deviation_count', 'side', 'crossings')
+
+    def __init__(self, trail_length=10, smoothing_window=5):
+        self.count = 0
+        self.first_t = self.last_t = 0.0
+        self.last_frame = -1
+        self.start = self.last = None
+        self.path = 0.0
+
+        # نافذة المتوسط المتحرك لـ VAP (مثل CASACalculator.smooth_path، متمركزة فدائماً فردية)
+        self.window = smoothing_window // 2 * 2 + 1
+        self.recent = deque(maxlen=self.window)        # آخر النقاط بالميكرون
+        self.trail = deque(maxlen=trail_length)        # آخر النقاط بالبكسل للرسم
+
+        self.smoothed = None       # آخر نقطة في المسار المتوسط
+        self.smooth_path = 0.0     # طول المسار المتوسط حتى الآن
+        self.deviation_sum = 0.0
+        self.deviation_count = 0
+        self.side = 0              # جهة آخر نقطة من المسار المتوسط (+1 / -1)
+        self.crossings = 0
+
+    def add(self, frame_index, timestamp, x, y, pixel_point):
+        """
+        إضافة نقطة جديدة للمسار
+
+        Args:
+            frame_index: رقم الإطار
+            timestamp: التوقيت بالميلي ثانية
+            x, y: الموضع بالميكرون
+            pixel_point: الموضع بالبكسل (للرسم)
+        """
+        if self.count == 0:
+            self.first_t = timestamp
+            self.start = (x, y)
+        else:
+            self.path += math.hypot(x - self.last[0], y - self.last[1])
+
+        self.last = (x, y)
+        self.last_t = timestamp
+        self.last_frame = frame_index
+        self.count += 1
+        self.recent.append((x, y))
+        self.trail.append(pixel_point)
+
+        # المتوسط المتحرك لنقطة يكتمل بعد وصول نصف نافذة بعدها. قبل امتلاء النافذة
+        # قد تضيق بقصر المسار، فيؤجل حساب النقاط الأولى حتى يتضح طوله
+        recent, window, half = self.recent, self.window, self.window // 2
+        if self.count == window:
+            for j in range(half + 1):
+                self.emit(window_mean(recent, 0, j + half + 1), recent[j])
+        elif self.count > window:
+            self.emit(window_mean(recent, 0, window), recent[half])
+
+    def emit(self, smoothed, point):
+        """
+        إضافة نقطة للمسار المتوسط مع انحراف النقطة الأصلية المقابلة عنه
+
+        Args:
+            smoothed: نقطة المسار المتوسط
+            point: النقطة الأصلية في نفس الإطار
+        """
+        previous = self.smoothed
+        self.smoothed = smoothed
+        if previous is None:
+            return
+
+        dx, dy = smoothed[0] - previous[0], smoothed[1] - previous[1]
+        step = math.hypot(dx, dy)
+        self.smooth_path += step
+
+        # الانحراف العمودي عن اتجاه المسار المتوسط مع جهته
+        px, py = point[0] - smoothed[0], point[1] - smoothed[1]
+        if step > 0:
+            signed = (dx * py - dy * px) / step
+            self.deviation_sum += abs(signed)
+            side = 1 if signed > 0 else -1 if signed < 0 else 0
+            if side:
+                if self.side and side != self.side:
+                    self.crossings += 1
+                self.side = side
+        else:
+            self.deviation_sum += math.hypot(px, py)
+        self.deviation_count += 1
+
+    def finish(self):
+        """
+        إكمال المسار المتوسط حتى نهاية المسار وحساب المعايير
+
+        يعدل الحالة، فيستدعى مرة واحدة عند انتهاء المسار (أو على نسخة).
+
+        Returns:
+            tuple: القيم بترتيب KINEMATIC_COLUMNS
+        """
+        recent, window, count = self.recent, self.window, self.count
+        if count < window:
+            # مسار قصير بالكامل في النافذة: نفس تضييق smooth_path
+            half = min(window, count) // 2 if count >= 3 else 0
+            for j in range(count):
+                self.emit(window_mean(recent, max(j - half, 0), min(j + half + 1, count)), recent[j])
+        else:
+            # آخر نصف نافذة من النقاط بنافذة تضيق عند نهاية المسار
+            half = window // 2
+            for j in range(1, half + 1):
+                self.emit(window_mean(recent, j, window), recent[half + j])
+
+        total_time = self.last_t / 1000.0 - self.first_t / 1000.0
+        if count < 2 or total_time <= 0:
+            return (count,) + (0.0,) * (len(KINEMATIC_COLUMNS) - 1)
+
+        vcl = self.path / total_time
+        vsl = math.hypot(self.last[0] - self.start[0], self.last[1] - self.start[1]) / total_time
+        vap = self.smooth_path / total_time
+
+        lin = vsl / vcl * 100 if vcl > 0 else 0.0
+        str_val = vsl / vap * 100 if vap > 0 else 0.0
+        wob = vap / vcl * 100 if vcl > 0 else 0.0
+
+        alh = self.deviation_sum / self.deviation_count if count >= 3 and self.deviation_count else 0.0
+        bcf = self.crossings / total_time if count >= 10 else 0.0
+
+        return (count, vcl, vsl, vap, lin, str_val, wob, alh, bcf)
+
+    def snapshot(self):
+        """المعايير الحالية لمسار ما زال حياً بدون تعديل حالته"""
+        return copy.copy(self).finish()
+
+
+def window_mean(points, start, end):
+    """متوسط النقاط points[start:end] من deque أو قائمة"""
+    sx = sy = 0.0
+    for i in range(start, end):
+        sx += points[i][0]
+        sy += points[i][1]
+    count = end - start
+    return (sx / count, sy / count)
+
+
+class OnlineCASA:
+    def __init__(self, pixel_to_micron=0.5, max_age=30, trail_length=10, smoothing_window=5):
+        """
+        تهيئة مجمعات CASA المتزامنة مع التتبع
+
+        Args:
+            pixel_to_micron: نسبة تحويل البكسل إلى ميكرون
+            max_age: عدد الإطارات بدون ظهور قبل اعتبار المسار منتهياً
+                     (مثل max_age في المتتبع)
+            trail_length: عدد آخر النقاط المحفوظة لكل مسار حي للرسم
+            smoothing_window: نافذة المتوسط المتحرك لـ VAP (مثل CASACalculator)
+        """
+        self.pixel_to_micron = pixel_to_micron
+        self.max_age = max_age
+        self.trail_length = trail_length
+        self.smoothing_window = smoothing_window
+
+        self.active = {}                                       # track_id -> TrackAccumulator
+        self.finished_ids = []
+        self.finished_rows = []                                # صف لكل مسار منتهٍ
+        self.num_points = 0
+
+    def __len__(self):
+        return len(self.finished_ids) + len(self.active)
+
+    def update(self, frame_index, timestamp, track_ids, boxes):
+        """
+        إضافة نقاط كل المسارات في إطار واحد ثم إنهاء المسارات المنقطعة
+
+        Args:
+            frame_index: رقم الإطار
+            timestamp: توقيت الإطار بالميلي ثانية
+            track_ids: معرفات المسارات في الإطار
+            boxes: صناديقها بصيغة x1, y1, x2, y2
+        """
+        scale = self.pixel_to_micron
+        for track_id, box in zip(track_ids, boxes):
+            accumulator = self.active.get(track_id)
+            if accumulator is None:
+                accumulator = TrackAccumulator(self.trail_length, self.smoothing_window)
+                self.active[track_id] = accumulator
+
+            cx = (float(box[0]) + float(box[2])) / 2
+            cy = (float(box[1]) + float(box[3])) / 2
+            accumulator.add(frame_index, timestamp, cx * scale, cy * scale, (cx, cy))
+
+        self.num_points += len(track_ids)
+        self.expire(frame_index)
+
+    def expire(self, frame_index):
+        """إنهاء وتحرير المسارات التي لم تظهر منذ أكثر من max_age إطار"""
+        dead = [track_id for track_id, accumulator in self.active.items()
+                if frame_index - accumulator.last_frame > self.max_age]
+        for track_id in dead:
+            self.finalize(track_id)
+
+    def finalize(self, track_id):
+        """حساب صف النتائج لمسار منتهٍ وتحرير حالته"""
+        accumulator = self.active.pop(track_id)
+        self.finished_ids.append(track_id)
+        self.finished_rows.append(accumulator.finish())
+
+    def finalize_all(self):
+        """إنهاء كل المسارات الحية (نهاية الفيديو)"""
+        for track_id in list(self.active):
+            self.finalize(track_id)
+
+    def tail(self, track_id, count):
+        """
+        آخر نقاط مسار حي بالبكسل للرسم
+
+        Returns:
+            np.ndarray: مواضع (M, 2) من الأقدم للأحدث، M <= count
+        """
+        accumulator = self.active.get(track_id)
+        if accumulator is None:
+            return np.zeros((0, 2))
+        return np.array(list(accumulator.trail)[-count:], dtype=np.float64).reshape(-1, 2)
+
+    def table(self, include_active=False):
+        """
+        جدول المعايير لكل المسارات المنتهية
+
+        Args:
+            include_active: إضافة قيم مؤقتة للمسارات الحية (للعرض أثناء التسجيل)
+
+        Returns:
+            dict: track_id (قائمة) ومصفوفة لكل عمود في KINEMATIC_COLUMNS
+        """
+        track_ids = list(self.finished_ids)
+        rows = list(self.finished_rows)
+        if include_active:
+            for track_id, accumulator in self.active.items():
+                track_ids.append(track_id)
+                rows.append(accumulator.snapshot())
+
+        values = np.array(rows, dtype=np.float64).reshape(-1, len(KINEMATIC_COLUMNS))
+        table = {name: values[:, i] for i, name in enumerate(KINEMATIC_COLUMNS)}
+        table['length'] = table['length'].astype(np.int64)
+        table['track_id'] = track_ids
+        return table
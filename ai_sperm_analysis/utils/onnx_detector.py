@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - ONNX Runtime Detector
+كاشف الحيوانات المنوية عبر ONNX Runtime بدون PyTorch
+
+Runs the YOLOv8 model exported by train.py:export_model on the CPU.
+Letterbox preprocessing and NMS are done in NumPy; results expose the
+same boxes surface (xyxy, conf, cls, data) the analyzer reads from
+ultralytics results.
+
+Requirements:
+pip install onnxruntime opencv-python numpy
+"""
+
+import cv2
+import numpy as np
+from utils.box_ops import nms
+
+
+class OnnxBoxes:
+    """صناديق الكشف لإطار واحد بصيغة (N, 6): x1, y1, x2, y2, conf, cls"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self.data[:, 5]
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+
+class OnnxResults:
+    """نتائج الكشف لإطار واحد"""
+
+    def __init__(self, data, orig_shape):
+        self.boxes = OnnxBoxes(data)
+        self.orig_shape = orig_shape
+
+
+class OnnxDetector:
+    def __init__(self, model_path, conf_threshold=0.25, iou_threshold=0.7, max_det=300,
+                 num_threads=0):
+        """
+        تهيئة كاشف ONNX
+
+        Args:
+            model_path: مسار ملف النموذج .onnx
+            conf_threshold: الحد الأدنى لمعامل الثقة
+            iou_threshold: حد التداخل في NMS
+            max_det: الحد الأقصى للكشوفات في الإطار
+            num_threads: عدد خيوط المعالجة (0 = تلقائي)
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.model_path = model_path
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = model_input.shape
+
+        # أبعاد الإدخال من النموذج، أو 640 إذا كانت ديناميكية
+        self.input_h = shape[2] if isinstance(shape[2], int) else 640
+        self.input_w = shape[3] if isinstance(shape[3], int) else 640
+
+        # النموذج المصدّر بدون dynamic=True يقبل إطاراً واحداً فقط في كل تمريرة
+        self.max_batch = shape[0] if isinstance(shape[0], int) else None
+
+        # مخازن مسبقة التخصيص يعاد استخدامها بين الإطارات
+        self._canvas = np.full((self.input_h, self.input_w, 3), 114, dtype=np.uint8)
+        self._blob = np.zeros((0, 3, self.input_h, self.input_w), dtype=np.float32)
+
+    def __call__(self, source):
+        """
+        كشف الحيوانات المنوية في صورة أو قائمة صور
+
+        Args:
+            source: صورة BGR أو قائمة صور
+
+        Returns:
+            list: قائمة OnnxResults بنفس ترتيب الصور
+        """
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        step = self.max_batch or len(frames)
+
+        results = []
+        for start in range(0, len(frames), max(step, 1)):
+            results.extend(self._run_batch(frames[start:start + step]))
+
+        return results
+
+    def _run_batch(self, frames):
+        """تشغيل تمريرة واحدة على دفعة من الإطارات"""
+        blob, letterbox_params = self.preprocess(frames)
+        outputs = self.session.run(None, {self.input_name: blob})[0]
+
+        return [
+            OnnxResults(self._postprocess(outputs[i], letterbox_params[i], frame.shape), frame.shape)
+            for i, frame in enumerate(frames)
+        ]
+
+    def preprocess(self, frames):
+        """
+        تحضير دفعة إطارات كمدخل للنموذج في المخزن المسبق التخصيص
+
+        Args:
+            frames: قائمة صور BGR
+
+        Returns:
+            tuple: (blob (B, 3, H, W), قائمة معاملات letterbox لكل إطار)
+        """
+        batch = len(frames)
+        if self._blob.shape[0] < batch:
+            self._blob = np.zeros((batch, 3, self.input_h, self.input_w), dtype=np.float32)
+
+        blob = self._blob[:batch]
+        letterbox_params = [self._letterbox_into(frame, blob[i]) for i, frame in enumerate(frames)]
+
+        return blob, letterbox_params
+
+    def _letterbox_into(self, frame, out):
+        """
+        تغيير حجم الإطار مع الحفاظ على النسبة وكتابته في مخزن الإدخال
+
+        Returns:
+            tuple: (gain, pad_x, pad_y) لإعادة الصناديق للإحداثيات الأصلية
+        """
+        h, w = frame.shape[:2]
+        gain = min(self.input_h / h, self.input_w / w)
+        new_w, new_h = int(round(w * gain)), int(round(h * gain))
+        pad_x = (self.input_w - new_w) // 2
+        pad_y = (self.input_h - new_h) // 2
+
+        canvas = self._canvas
+        canvas.fill(114)
+        cv2.resize(frame, (new_w, new_h), dst=canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w],
+                   interpolation=cv2.INTER_LINEAR)
+
+        # BGR -> RGB و HWC -> CHW مع التطبيع إلى [0, 1]
+        np.multiply(canvas[:, :, ::-1].transpose(2, 0, 1), 1 / 255.0, out=out, casting='unsafe')
+
+        return gain, pad_x, pad_y
+
+    def _postprocess(self, prediction, letterbox_params, orig_shape):
+        """
+        فك ترميز مخرجات YOLOv8 (4 + nc, anchors) وتطبيق NMS
+
+        Returns:
+            np.ndarray: مصفوفة (N, 6) بالإحداثيات الأصلية
+        """
+        prediction = prediction.T  # (anchors, 4 + nc)
+        class_scores = prediction[:, 4:]
+        cls = class_scores.argmax(axis=1)
+        conf = class_scores[np.arange(len(cls)), cls]
+
+        mask = conf >= self.conf_threshold
+        if not mask.any():
+            return np.zeros((0, 6), dtype=np.float32)
+
+        xywh = prediction[mask, :4]
+        conf = conf[mask]
+        cls = cls[mask].astype(np.float32)
+
+        boxes = np.empty_like(xywh)
+        boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+        boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+        boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+        boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+
+        # NMS لكل فئة على حدة عبر إزاحة الصناديق حسب الفئة
+        offsets = cls[:, None] * max(self.input_w, self.input_h)
+        keep = nms(boxes + offsets, conf, self.iou_threshold, self.max_det)
+
+        # إزالة الحشو وإعادة التحجيم إلى أبعاد الصورة الأصلية
+        gain, pad_x, pad_y = letterbox_params
+        boxes = boxes[keep]
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_x) / gain
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_y) / gain
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, orig_shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, orig_shape[0])
+
+        return np.column_stack([boxes, conf[keep], cls[keep]]).astype(np.float32)
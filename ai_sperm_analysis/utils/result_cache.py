@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Analysis Result Cache
+ذاكرة نتائج التحليل حسب بصمة الملف والنموذج والإعدادات
+
+Results are stored as JSON in a local SQLite table keyed by
+SHA-256(media hash, model hash, canonical JSON of the analysis settings),
+so re-submitting the same file with the same model and settings returns
+the stored result without running the model. Entries older than max_age
+days are dropped, then the least recently used entries are evicted while
+the table exceeds max_entries or max_bytes.
+
+A hit whose output files (analyzed image/video, heatmap) no longer exist
+is treated as a miss and removed.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+
+# مفاتيح النتائج التي تشير إلى ملفات مخرجات يجب أن تبقى موجودة
+OUTPUT_PATH_KEYS = ('analyzed_image_path', 'heatmap_path', 'analyzed_video_path',
+                    'detection_cache_path')
+
+
+def json_default(value):
+    """تحويل قيم NumPy وغيرها إلى أنواع JSON"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+class ResultCache:
+    def __init__(self, db_path, max_entries=1000, max_bytes=256 * 1024 * 1024, max_age_days=30):
+        """
+        تهيئة ذاكرة النتائج
+
+        Args:
+            db_path: مسار ملف SQLite للذاكرة
+            max_entries: أقصى عدد نتائج محفوظة
+            max_bytes: أقصى حجم كلي لنصوص JSON المحفوظة بالبايت
+            max_age_days: عمر النتيجة بالأيام قبل حذفها
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_result_cache (
+                cache_key TEXT PRIMARY KEY,
+                media_hash TEXT NOT NULL,
+                model_hash TEXT NOT NULL,
+                settings_json TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hit_count INTEGER DEFAULT 0
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_result_cache_last_used
+            ON analysis_result_cache(last_used_at)
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(media_hash, model_hash, settings):
+        """
+        مفتاح النتيجة من بصمتي الملف والنموذج والإعدادات
+
+        Returns:
+            tuple: (المفتاح، نص JSON الموحد للإعدادات)
+        """
+        settings_json = json.dumps(settings, sort_keys=True, default=json_default)
+        digest = hashlib.sha256('\n'.join((media_hash, model_hash, settings_json)).encode('utf-8'))
+        return digest.hexdigest(), settings_json
+
+    def get(self, cache_key):
+        """
+        قراءة نتيجة محفوظة
+
+        Returns:
+            dict: النتيجة أو None إذا لم توجد أو انتهت صلاحيتها أو حُذفت ملفاتها
+        """
+        row = self.conn.execute(
+            "SELECT result_json, created_at FROM analysis_result_cache WHERE cache_key = ?",
+            (cache_key,)).fetchone()
+        if row is None:
+            return None
+
+        result = json.loads(row[0])
+        expired = time.time() - row[1] > self.max_age_days * 86400
+        missing = any(result.get(key) and not os.path.exists(result[key]) for key in OUTPUT_PATH_KEYS)
+        if expired or missing:
+            self.conn.execute("DELETE FROM analysis_result_cache WHERE cache_key = ?", (cache_key,))
+            self.conn.commit()
+            return None
+
+        self.conn.execute("""
+            UPDATE analysis_result_cache SET last_used_at = ?, hit_count = hit_count + 1
+            WHERE cache_key = ?
+        """, (time.time(), cache_key))
+        self.conn.commit()
+        return result
+
+    def put(self, cache_key, media_hash, model_hash, settings_json, result):
+        """حفظ نتيجة (أو استبدالها) ثم تطبيق حدود العمر والعدد والحجم"""
+        result_json = json.dumps(result, ensure_ascii=False, default=json_default)
+        now = time.time()
+
+        self.conn.execute("""
+            INSERT OR REPLACE INTO analysis_result_cache (
+                cache_key, media_hash, model_hash, settings_json, result_json,
+                size_bytes, created_at, last_used_at, hit_count
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+        """, (cache_key, media_hash, model_hash, settings_json, result_json,
+              len(result_json.encode('utf-8')), now, now))
+        self.evict(now)
+        self.conn.commit()
+
+    def evict(self, now=None):
+        """حذف النتائج القديمة ثم الأقل استخداماً حتى تعود الذاكرة ضمن الحدود"""
+        now = time.time() if now is None else now
+        self.conn.execute("DELETE FROM analysis_result_cache WHERE created_at < ?",
+                          (now - self.max_age_days * 86400,))
+
+        # ترتيب من الأحدث استخداماً مع المجموع التراكمي للحجم؛ ما بعد الحدود يحذف
+        rows = self.conn.execute("""
+            SELECT cache_key, size_bytes FROM analysis_result_cache ORDER BY last_used_at DESC
+        """).fetchall()
+
+        total = 0
+        evicted = []
+        for index, (cache_key, size) in enumerate(rows):
+            total += size
+            if index >= self.max_entries or total > self.max_bytes:
+                evicted.append((cache_key,))
+
+        if evicted:
+            self.conn.executemany("DELETE FROM analysis_result_cache WHERE cache_key = ?", evicted)
+
+    def close(self):
+        self.conn.close()
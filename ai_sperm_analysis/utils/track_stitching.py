@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Segment Track Stitching
+ربط مسارات الحيوانات المنوية عبر حدود مقاطع الفيديو المحللة بالتوازي
+
+Each segment is tracked independently and re-reads a short overlap window
+past its end. Tracks that end in a segment are linked to tracks that start
+in the next one when their positions and velocities agree (gating), then
+the overlap frames are assigned to exactly one side so no frame is counted
+twice.
+
+Segments are TrackStore objects whose frame column holds global frame
+indices.
+"""
+
+import numpy as np
+from utils.track_store import TrackStore, TrackView
+
+
+def track_velocity(track, from_end):
+    """
+    متوسط السرعة (بكسل/إطار) في طرف المسار
+
+    Args:
+        track: TrackView مرتب حسب الإطار
+        from_end: True لنهاية المسار، False لبدايته
+
+    Returns:
+        np.ndarray: متجه السرعة (2,)
+    """
+    window = track.select(slice(-5, None) if from_end else slice(0, 5))
+    if len(window) < 2:
+        return np.zeros(2)
+
+    frames = window.frame[-1] - window.frame[0]
+    if frames <= 0:
+        return np.zeros(2)
+
+    return np.array([window.x[-1] - window.x[0], window.y[-1] - window.y[0]]) / frames
+
+
+def stitch_cost(left, right, max_gap):
+    """
+    مسافة الموضع والسرعة بين مسار ينتهي ومسار يبدأ عند الحد
+
+    إذا تشارك المساران إطارات في نافذة التداخل تقارن المواضع مباشرة،
+    وإلا يُستقرأ موضع المسار الأول بسرعته حتى أول إطار في المسار الثاني.
+
+    Returns:
+        tuple: (فرق الموضع بالبكسل، فرق السرعة بالبكسل/إطار) أو None إذا تعذر الربط
+    """
+    left_velocity = track_velocity(left, from_end=True)
+    right_velocity = track_velocity(right, from_end=False)
+
+    common, left_idx, right_idx = np.intersect1d(left.frame, right.frame, return_indices=True)
+    if len(common):
+        distance = np.mean(np.hypot(left.x[left_idx] - right.x[right_idx],
+                                    left.y[left_idx] - right.y[right_idx]))
+    else:
+        gap = right.frame[0] - left.frame[-1]
+        if gap <= 0 or gap > max_gap:
+            return None
+        predicted = np.array([left.x[-1], left.y[-1]]) + left_velocity * gap
+        distance = np.hypot(*(predicted - [right.x[0], right.y[0]]))
+
+    return distance, np.hypot(*(left_velocity - right_velocity))
+
+
+def stitch_segment_tracks(segment_tracks, boundaries, overlap, max_distance=10.0,
+                          max_velocity_delta=5.0):
+    """
+    ربط مسارات المقاطع المتتالية في مجموعة مسارات واحدة
+
+    Args:
+        segment_tracks: قائمة TrackStore لكل مقطع بالترتيب الزمني
+        boundaries: أول إطار (عام) في كل مقطع بعد الأول
+        overlap: عدد إطارات التداخل التي يعيد كل مقطع قراءتها بعد نهايته
+        max_distance: أقصى فرق موضع بالبكسل لقبول الربط
+        max_velocity_delta: أقصى فرق سرعة بالبكسل/إطار لقبول الربط
+
+    Returns:
+        TrackStore: المسارات المربوطة بمعرفات جديدة متسلسلة
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    stitched = []   # TrackView لكل مسار نهائي
+    open_tracks = {}  # معرف المسار في المقطع السابق -> فهرس في stitched
+
+    for index, store in enumerate(segment_tracks):
+        tracks = dict(store.items())
+
+        if index == 0:
+            for tid, track in tracks.items():
+                open_tracks[tid] = len(stitched)
+                stitched.append(track)
+            continue
+
+        boundary = boundaries[index - 1]
+
+        # مرشحو الربط: مسارات حية قرب الحد من الجهتين
+        left_ids = [tid for tid, i in open_tracks.items()
+                    if stitched[i].frame[-1] >= boundary - overlap]
+        right_ids = [tid for tid, track in tracks.items()
+                     if track.frame[0] < boundary + overlap]
+
+        matches = {}
+        if left_ids and right_ids:
+            gated = max_distance + max_velocity_delta + 1.0
+            cost = np.full((len(left_ids), len(right_ids)), gated * 10)
+
+            for li, left_id in enumerate(left_ids):
+                for ri, right_id in enumerate(right_ids):
+                    result = stitch_cost(stitched[open_tracks[left_id]], tracks[right_id], overlap)
+                    if result is None:
+                        continue
+                    distance, velocity_delta = result
+                    if distance <= max_distance and velocity_delta <= max_velocity_delta:
+                        cost[li, ri] = distance + velocity_delta
+
+            rows, cols = linear_sum_assignment(cost)
+            for li, ri in zip(rows, cols):
+                if cost[li, ri] < gated * 10:
+                    matches[right_ids[ri]] = open_tracks[left_ids[li]]
+
+        # إطارات التداخل تتبع المقطع اللاحق، فتُقص من مسارات المقطع السابق
+        untrimmed = {i: stitched[i] for i in open_tracks.values()}
+        for i in open_tracks.values():
+            stitched[i] = stitched[i].select(stitched[i].frame < boundary)
+
+        new_open = {}
+        for tid, track in tracks.items():
+            if tid in matches:
+                # نقاط المقطع السابق تسد الفجوة حتى يتأكد المسار في المقطع اللاحق
+                i = matches[tid]
+                head = untrimmed[i].select(untrimmed[i].frame < track.frame[0])
+                stitched[i] = TrackView.concatenate([head, track])
+                new_open[tid] = i
+            else:
+                new_open[tid] = len(stitched)
+                stitched.append(track)
+
+        open_tracks = new_open
+
+    result = TrackStore(capacity=max(sum(len(track) for track in stitched), 1))
+    for track in stitched:
+        if len(track):
+            result.append_track(str(len(result) + 1), track)
+
+    return result
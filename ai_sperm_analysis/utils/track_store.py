@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Columnar Track Store
+مخزن نقاط المسارات بأعمدة NumPy بدلاً من قوائم القواميس
+
+Points are appended frame by frame into growable columns (frame, t, x, y,
+bbox) shared by all tracks; each point links to the previous point of its
+track so recent trails can be read while tracking. compact() reorders the
+columns track by track (stable, so each track stays in frame order) and
+builds per-track offsets; track(tid) then returns zero-copy views.
+"""
+
+import numpy as np
+
+
+class TrackView:
+    """نقاط مسار واحد كمصفوفات (عروض على مخزن المسارات عند الإمكان)"""
+
+    __slots__ = ('frame', 't', 'x', 'y', 'bbox')
+
+    def __init__(self, frame, t, x, y, bbox):
+        self.frame = frame
+        self.t = t
+        self.x = x
+        self.y = y
+        self.bbox = bbox
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def positions(self):
+        """مواضع المركز (N, 2)"""
+        return np.column_stack((self.x, self.y))
+
+    def select(self, index):
+        """جزء من المسار بقناع منطقي أو شريحة"""
+        return TrackView(self.frame[index], self.t[index], self.x[index], self.y[index],
+                         self.bbox[index])
+
+    @staticmethod
+    def concatenate(views):
+        """دمج عدة أجزاء مسار بالترتيب في مسار واحد"""
+        return TrackView(*(np.concatenate([getattr(v, name) for v in views])
+                           for name in TrackView.__slots__))
+
+
+class TrackStore:
+    def __init__(self, capacity=4096):
+        """
+        تهيئة مخزن المسارات
+
+        Args:
+            capacity: السعة الأولية بعدد النقاط (تتضاعف عند الامتلاء)
+        """
+        self._size = 0
+        self._frame = np.empty(capacity, dtype=np.int32)
+        self._t = np.empty(capacity, dtype=np.float64)
+        self._x = np.empty(capacity, dtype=np.float64)
+        self._y = np.empty(capacity, dtype=np.float64)
+        self._bbox = np.empty((capacity, 4), dtype=np.float32)
+        self._slot = np.empty(capacity, dtype=np.int32)   # رقم المسار لكل نقطة
+        self._prev = np.empty(capacity, dtype=np.int64)   # النقطة السابقة في نفس المسار (-1 للأولى)
+
+        self._slots = {}                               # track_id -> رقم المسار
+        self._ids = []                                 # رقم المسار -> track_id
+        self._last = np.empty(0, dtype=np.int64)       # آخر نقطة لكل مسار
+        self._offsets = None                           # حدود المسارات بعد compact()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, track_id):
+        return track_id in self._slots
+
+    @property
+    def num_points(self):
+        return self._size
+
+    def track_ids(self):
+        """معرفات المسارات بترتيب ظهورها"""
+        return list(self._ids)
+
+    def lengths(self):
+        """عدد نقاط كل مسار (بترتيب track_ids)"""
+        return np.bincount(self._slot[:self._size], minlength=len(self._ids))
+
+    def _reserve(self, count):
+        """توسيع الأعمدة بالمضاعفة إذا لم تكفِ السعة"""
+        needed = self._size + count
+        capacity = len(self._frame)
+        if needed <= capacity:
+            return
+
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+
+        for name in ('_frame', '_t', '_x', '_y', '_bbox', '_slot', '_prev'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _slots_for(self, track_ids):
+        """أرقام المسارات للمعرفات مع تسجيل المعرفات الجديدة"""
+        slots = np.empty(len(track_ids), dtype=np.int64)
+        for i, track_id in enumerate(track_ids):
+            slot = self._slots.get(track_id)
+            if slot is None:
+                slot = len(self._ids)
+                self._slots[track_id] = slot
+                self._ids.append(track_id)
+            slots[i] = slot
+
+        if len(self._last) < len(self._ids):
+            self._last = np.concatenate([self._last,
+                                         np.full(len(self._ids) - len(self._last), -1, dtype=np.int64)])
+        return slots
+
+    def append_frame(self, frame_index, timestamp, track_ids, boxes):
+        """
+        إضافة نقاط كل المسارات في إطار واحد
+
+        Args:
+            frame_index: رقم الإطار
+            timestamp: توقيت الإطار بالميلي ثانية
+            track_ids: معرفات المسارات في الإطار (بدون تكرار)
+            boxes: صناديقها (N, 4) بصيغة x1, y1, x2, y2
+        """
+        count = len(track_ids)
+        if count == 0:
+            return
+
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(count, 4)
+        slots = self._slots_for(track_ids)
+        self._reserve(count)
+
+        start, end = self._size, self._size + count
+        self._frame[start:end] = frame_index
+        self._t[start:end] = timestamp
+        self._x[start:end] = (boxes[:, 0] + boxes[:, 2]) / 2
+        self._y[start:end] = (boxes[:, 1] + boxes[:, 3]) / 2
+        self._bbox[start:end] = boxes
+        self._slot[start:end] = slots
+        self._prev[start:end] = self._last[slots]
+        self._last[slots] = np.arange(start, end)
+
+        self._size = end
+        self._offsets = None
+
+    def append_track(self, track_id, view):
+        """
+        إضافة مسار كامل دفعة واحدة (مثلاً بعد ربط مقاطع الفيديو)
+
+        Args:
+            track_id: معرف المسار (جديد في المخزن)
+            view: TrackView بنقاط المسار مرتبة حسب الإطار
+        """
+        count = len(view)
+        if count == 0:
+            return
+
+        slot = self._slots_for([track_id])[0]
+        self._reserve(count)
+
+        start, end = self._size, self._size + count
+        self._frame[start:end] = view.frame
+        self._t[start:end] = view.t
+        self._x[start:end] = view.x
+        self._y[start:end] = view.y
+        self._bbox[start:end] = view.bbox
+        self._slot[start:end] = slot
+        self._prev[start:end] = np.arange(start - 1, end - 1)
+        self._prev[start] = self._last[slot]
+        self._last[slot] = end - 1
+
+        self._size = end
+        self._offsets = None
+
+    def tail(self, track_id, count):
+        """
+        آخر نقاط مسار عبر سلسلة النقاط السابقة (بدون ترتيب المخزن)
+
+        Returns:
+            np.ndarray: مواضع (M, 2) من الأقدم للأحدث، M <= count
+        """
+        slot = self._slots.get(track_id)
+        if slot is None:
+            return np.zeros((0, 2))
+
+        indices = []
+        index = self._last[slot]
+        while index >= 0 and len(indices) < count:
+            indices.append(index)
+            index = self._prev[index]
+
+        indices.reverse()
+        return np.column_stack((self._x[indices], self._y[indices]))
+
+    def compact(self):
+        """
+        ترتيب الأعمدة مساراً بعد مسار وحساب حدود كل مسار
+
+        الترتيب مستقر فتبقى نقاط كل مسار بترتيب إضافتها. لا يعاد الترتيب
+        إذا لم تضف نقاط منذ آخر استدعاء.
+        """
+        if self._offsets is not None:
+            return
+
+        size = self._size
+        order = np.argsort(self._slot[:size], kind='stable')
+        for name in ('_frame', '_t', '_x', '_y', '_bbox', '_slot'):
+            column = getattr(self, name)
+            column[:size] = column[order]
+
+        counts = np.bincount(self._slot[:size], minlength=len(self._ids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        # بعد الترتيب كل نقطة تسبقها نقطة مسارها مباشرة
+        self._prev[:size] = np.arange(-1, size - 1)
+        self._prev[self._offsets[:-1][counts > 0]] = -1
+        self._last = self._offsets[1:] - 1
+        self._last[counts == 0] = -1
+
+    def track(self, track_id):
+        """
+        نقاط مسار واحد كعروض بدون نسخ على أعمدة المخزن
+
+        العروض صالحة حتى الإضافة التالية للمخزن.
+
+        Returns:
+            TrackView
+        """
+        self.compact()
+        slot = self._slots[track_id]
+        start, end = self._offsets[slot], self._offsets[slot + 1]
+        return TrackView(self._frame[start:end], self._t[start:end], self._x[start:end],
+                         self._y[start:end], self._bbox[start:end])
+
+    def columns(self):
+        """
+        كل النقاط مرتبة مساراً بعد مسار مع حدود المسارات (بدون نسخ)
+
+        Returns:
+            tuple: (t, positions (N, 2), offsets (K + 1,)) بترتيب track_ids
+        """
+        self.compact()
+        size = self._size
+        return self._t[:size], np.column_stack((self._x[:size], self._y[:size])), self._offsets
+
+    def items(self):
+        """أزواج (track_id, TrackView) لكل المسارات"""
+        self.compact()
+        return [(track_id, self.track(track_id)) for track_id in self._ids]
+
+    def __getstate__(self):
+        """حفظ الأجزاء المستخدمة فقط عند النقل بين العمليات"""
+        self.compact()
+        state = self.__dict__.copy()
+        for name in ('_frame', '_t', '_x', '_y', '_bbox', '_slot', '_prev'):
+            state[name] = state[name][:self._size].copy()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
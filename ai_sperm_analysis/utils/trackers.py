@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sky CASA - Tracker Backends
+أنظمة تتبع الحيوانات المنوية القابلة للتبديل
+
+All backends expose the DeepSort surface the analyzer uses:
+update_tracks(raw_detections, frame=None) with detections as
+([left, top, w, h], confidence, class), tracks with track_id,
+is_confirmed(), to_ltrb() and time_since_update, and delete_all_tracks().
+
+Backends:
+- deepsort:  DeepSort with its appearance (Re-ID) embedder
+- sort:      motion-only Kalman filter + single-stage Hungarian assignment
+- bytetrack: motion-only Kalman filter + two-stage ByteTrack assignment
+             (high-confidence detections first, then low-confidence ones)
+
+Sperm look alike, so appearance features add little; the motion-only
+backends skip the per-crop CNN entirely.
+"""
+
+import numpy as np
+from utils.box_ops import pairwise_iou
+
+TRACKERS = ('deepsort', 'sort', 'bytetrack')
+
+# أوزان ضوضاء مرشح كالمان نسبة إلى أبعاد الصندوق (كما في SORT/ByteTrack)
+STD_WEIGHT_POSITION = 1.0 / 20
+STD_WEIGHT_VELOCITY = 1.0 / 160
+
+# نموذج السرعة الثابتة: الحالة [cx, cy, w, h, vx, vy, vw, vh]
+MOTION_MATRIX = np.eye(8)
+MOTION_MATRIX[:4, 4:] = np.eye(4)
+
+# تكلفة الأزواج المرفوضة في مصفوفة الربط
+INFEASIBLE_COST = 1e5
+
+
+def create_tracker(name='deepsort', max_age=30, n_init=3, **kwargs):
+    """
+    إنشاء نظام تتبع بالاسم
+
+    Args:
+        name: 'deepsort' أو 'sort' أو 'bytetrack'
+        max_age: عدد الإطارات التي يبقى فيها المسار بدون كشف قبل حذفه
+        n_init: عدد الكشوفات المتتالية لتأكيد المسار
+        **kwargs: معاملات إضافية للمتتبع (عتبات الربط مثل iou_threshold لـ MotionTracker
+                  أو max_iou_distance / max_cosine_distance لـ DeepSort)
+
+    Returns:
+        كائن تتبع بواجهة update_tracks
+    """
+    if name == 'deepsort':
+        # استيراد مؤجل: DeepSort يحمل نموذج المظهر عند التهيئة
+        from deep_sort_realtime.deepsort_tracker import DeepSort
+        return DeepSort(max_age=max_age, n_init=n_init, **kwargs)
+
+    if name in ('sort', 'bytetrack'):
+        return MotionTracker(max_age=max_age, n_init=n_init, two_stage=(name == 'bytetrack'), **kwargs)
+
+    raise ValueError(f"نظام تتبع غير معروف: {name} (المتاح: {', '.join(TRACKERS)})")
+
+
+def ltwh_to_xywh(boxes):
+    """تحويل صناديق (N, 4) من left, top, w, h إلى مركز وأبعاد"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.column_stack([boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2,
+                            boxes[:, 2], boxes[:, 3]])
+
+
+def xywh_to_ltrb(boxes):
+    """تحويل صناديق (N, 4) من مركز وأبعاد إلى x1, y1, x2, y2"""
+    return np.column_stack([boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2,
+                            boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2])
+
+
+def kalman_initiate(measurements):
+    """
+    حالات كالمان الأولية لمجموعة قياسات
+
+    Args:
+        measurements: مصفوفة (N, 4) بصيغة cx, cy, w, h
+
+    Returns:
+        tuple: (mean (N, 8), covariance (N, 8, 8))
+    """
+    n = len(measurements)
+    mean = np.zeros((n, 8))
+    mean[:, :4] = measurements
+
+    w, h = measurements[:, 2], measurements[:, 3]
+    std = np.column_stack([
+        2 * STD_WEIGHT_POSITION * w, 2 * STD_WEIGHT_POSITION * h,
+        2 * STD_WEIGHT_POSITION * w, 2 * STD_WEIGHT_POSITION * h,
+        10 * STD_WEIGHT_VELOCITY * w, 10 * STD_WEIGHT_VELOCITY * h,
+        10 * STD_WEIGHT_VELOCITY * w, 10 * STD_WEIGHT_VELOCITY * h,
+    ])
+
+    covariance = np.zeros((n, 8, 8))
+    covariance[:, np.arange(8), np.arange(8)] = std ** 2
+    return mean, covariance
+
+
+def kalman_predict(mean, covariance):
+    """
+    خطوة التنبؤ لكل المسارات دفعة واحدة
+
+    Args:
+        mean: (N, 8)
+        covariance: (N, 8, 8)
+
+    Returns:
+        tuple: (mean, covariance) بعد التنبؤ
+    """
+    w, h = mean[:, 2], mean[:, 3]
+    std = np.column_stack([
+        STD_WEIGHT_POSITION * w, STD_WEIGHT_POSITION * h,
+        STD_WEIGHT_POSITION * w, STD_WEIGHT_POSITION * h,
+        STD_WEIGHT_VELOCITY * w, STD_WEIGHT_VELOCITY * h,
+        STD_WEIGHT_VELOCITY * w, STD_WEIGHT_VELOCITY * h,
+    ])
+
+    mean = mean @ MOTION_MATRIX.T
+    covariance = MOTION_MATRIX @ covariance @ MOTION_MATRIX.T
+    covariance[:, np.arange(8), np.arange(8)] += std ** 2
+    return mean, covariance
+
+
+def kalman_update(mean, covariance, measurements):
+    """
+    خطوة التصحيح لمجموعة مسارات مع قياساتها المطابقة
+
+    Args:
+        mean: (N, 8)
+        covariance: (N, 8, 8)
+        measurements: (N, 4) بصيغة cx, cy, w, h
+
+    Returns:
+        tuple: (mean, covariance) بعد التصحيح
+    """
+    w, h = mean[:, 2], mean[:, 3]
+    std = np.column_stack([STD_WEIGHT_POSITION * w, STD_WEIGHT_POSITION * h,
+                           STD_WEIGHT_POSITION * w, STD_WEIGHT_POSITION * h])
+
+    projected_mean = mean[:, :4]
+    projected_cov = covariance[:, :4, :4].copy()
+    projected_cov[:, np.arange(4), np.arange(4)] += std ** 2
+
+    # K = P H^T S^-1 (S متماثلة، فنحل S K^T = H P)
+    gain = np.linalg.solve(projected_cov, covariance[:, :4, :]).transpose(0, 2, 1)
+    innovation = measurements - projected_mean
+
+    mean = mean + np.einsum('nij,nj->ni', gain, innovation)
+    covariance = covariance - gain @ projected_cov @ gain.transpose(0, 2, 1)
+    return mean, covariance
+
+
+class MotionTrack:
+    """مسار واحد في نظام التتبع الحركي بواجهة مسارات DeepSort"""
+
+    TENTATIVE = 1
+    CONFIRMED = 2
+    DELETED = 3
+
+    def __init__(self, track_id, mean, covariance, confidence, det_class, n_init, max_age):
+        self.track_id = track_id
+        self.mean = mean
+        self.covariance = covariance
+        self.det_conf = confidence
+        self.det_class = det_class
+        self.hits = 1
+        self.age = 1
+        self.time_since_update = 0
+        self.state = MotionTrack.TENTATIVE
+        self._n_init = n_init
+        self._max_age = max_age
+
+    def is_tentative(self):
+        return self.state == MotionTrack.TENTATIVE
+
+    def is_confirmed(self):
+        return self.state == MotionTrack.CONFIRMED
+
+    def is_deleted(self):
+        return self.state == MotionTrack.DELETED
+
+    def to_ltrb(self):
+        """الصندوق الحالي من حالة كالمان بصيغة x1, y1, x2, y2"""
+        return xywh_to_ltrb(self.mean[None, :4])[0]
+
+    def to_ltwh(self):
+        """الصندوق الحالي بصيغة left, top, w, h"""
+        x1, y1, x2, y2 = self.to_ltrb()
+        return np.array([x1, y1, x2 - x1, y2 - y1])
+
+    def mark_hit(self, confidence):
+        """تسجيل كشف مطابق في الإطار الحالي"""
+        self.det_conf = confidence
+        self.hits += 1
+        self.time_since_update = 0
+        if self.is_tentative() and self.hits >= self._n_init:
+            self.state = MotionTrack.CONFIRMED
+
+    def mark_missed(self):
+        """تسجيل غياب الكشف في الإطار الحالي"""
+        self.det_conf = None
+        if self.is_tentative() or self.time_since_update > self._max_age:
+            self.state = MotionTrack.DELETED
+
+
+class MotionTracker:
+    def __init__(self, max_age=30, n_init=3, iou_threshold=0.3, high_threshold=0.5,
+                 centroid_gate=1.0, two_stage=True):
+        """
+        نظام تتبع حركي بدون نموذج مظهر (SORT / ByteTrack)
+
+        Args:
+            max_age: عدد الإطارات التي يبقى فيها المسار المؤكد بدون كشف
+            n_init: عدد الكشوفات لتأكيد المسار
+            iou_threshold: أدنى IoU لقبول الربط
+            high_threshold: حد الثقة الفاصل بين الكشوفات القوية والضعيفة (ByteTrack)
+            centroid_gate: أقصى مسافة بين المراكز كنسبة من قطر الصندوق المتنبأ به
+                           لربط صناديق صغيرة لا تتقاطع (0 = IoU فقط)
+            two_stage: ربط الكشوفات الضعيفة بالمسارات المتبقية في مرحلة ثانية
+        """
+        self.max_age = max_age
+        self.n_init = n_init
+        self.iou_threshold = iou_threshold
+        self.high_threshold = high_threshold
+        self.centroid_gate = centroid_gate
+        self.two_stage = two_stage
+
+        self.tracks = []
+        self._next_id = 1
+
+    def delete_all_tracks(self):
+        """حذف كل المسارات وإعادة ترقيم المعرفات"""
+        self.tracks = []
+        self._next_id = 1
+
+    def update_tracks(self, raw_detections, frame=None):
+        """
+        تحديث المسارات بكشوفات الإطار الحالي
+
+        Args:
+            raw_detections: قائمة ([left, top, w, h], confidence, class)
+            frame: غير مستخدم (للتوافق مع واجهة DeepSort)
+
+        Returns:
+            list: المسارات الحية بعد التحديث
+        """
+        if raw_detections:
+            measurements = ltwh_to_xywh([d[0] for d in raw_detections])
+            scores = np.array([d[1] for d in raw_detections], dtype=np.float64)
+        else:
+            measurements = np.zeros((0, 4))
+            scores = np.zeros(0)
+
+        self.predict()
+
+        track_indices = list(range(len(self.tracks)))
+        if self.two_stage:
+            high = np.flatnonzero(scores >= self.high_threshold)
+            low = np.flatnonzero(scores < self.high_threshold)
+        else:
+            high = np.arange(len(scores))
+            low = np.zeros(0, dtype=np.int64)
+
+        # المرحلة الأولى: كل المسارات مع الكشوفات القوية
+        matches, unmatched_tracks, unmatched_high = self.associate(
+            track_indices, high, measurements, use_centroid=True)
+
+        # المرحلة الثانية: المسارات المؤكدة المتبقية مع الكشوفات الضعيفة (IoU فقط)
+        remaining = [t for t in unmatched_tracks if self.tracks[t].is_confirmed()]
+        if len(low) and remaining:
+            low_matches, still_unmatched, _ = self.associate(
+                remaining, low, measurements, use_centroid=False)
+            matches.extend(low_matches)
+            unmatched_tracks = [t for t in unmatched_tracks if t not in remaining] + still_unmatched
+
+        if matches:
+            self.update_matched(matches, measurements, scores)
+
+        for t in unmatched_tracks:
+            self.tracks[t].mark_missed()
+
+        # مسارات جديدة من الكشوفات القوية غير المطابقة فقط
+        for d in unmatched_high:
+            self.initiate_track(measurements[d], scores[d], raw_detections[d][2])
+
+        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+        return self.tracks
+
+    def predict(self):
+        """تنبؤ كالمان لكل المسارات دفعة واحدة"""
+        if not self.tracks:
+            return
+
+        mean, covariance = kalman_predict(np.stack([t.mean for t in self.tracks]),
+                                          np.stack([t.covariance for t in self.tracks]))
+        for i, track in enumerate(self.tracks):
+            track.mean = mean[i]
+            track.covariance = covariance[i]
+            track.age += 1
+            track.time_since_update += 1
+
+    def update_matched(self, matches, measurements, scores):
+        """تصحيح كالمان لكل المسارات المطابقة دفعة واحدة"""
+        track_idx = [t for t, _ in matches]
+        det_idx = [d for _, d in matches]
+
+        mean, covariance = kalman_update(np.stack([self.tracks[t].mean for t in track_idx]),
+                                         np.stack([self.tracks[t].covariance for t in track_idx]),
+                                         measurements[det_idx])
+        for i, (t, d) in enumerate(matches):
+            track = self.tracks[t]
+            track.mean = mean[i]
+            track.covariance = covariance[i]
+            track.mark_hit(float(scores[d]))
+
+    def initiate_track(self, measurement, confidence, det_class):
+        """إنشاء مسار مبدئي جديد من كشف غير مطابق"""
+        mean, covariance = kalman_initiate(measurement[None, :])
+        self.tracks.append(MotionTrack(str(self._next_id), mean[0], covariance[0], float(confidence),
+                                       det_class, self.n_init, self.max_age))
+        self._next_id += 1
+
+    def association_cost(self, track_indices, det_indices, measurements, use_centroid):
+        """
+        مصفوفة تكلفة الربط بين المسارات والكشوفات
+
+        التكلفة 1 - IoU للأزواج المتقاطعة، والأزواج غير المتقاطعة القريبة
+        (مسافة المراكز ضمن centroid_gate من قطر الصندوق) تكلفتها بين 1 و 2
+        فتُفضّل المطابقة بالتقاطع دائماً.
+
+        Returns:
+            np.ndarray: مصفوفة (T, D)، والأزواج المرفوضة بقيمة INFEASIBLE_COST
+        """
+        predicted = np.stack([self.tracks[t].mean[:4] for t in track_indices])
+        detected = measurements[det_indices]
+        iou = pairwise_iou(xywh_to_ltrb(predicted), xywh_to_ltrb(detected))
+        cost = np.where(iou >= self.iou_threshold, 1.0 - iou, INFEASIBLE_COST)
+
+        if use_centroid and self.centroid_gate > 0:
+            distance = np.hypot(predicted[:, None, 0] - detected[None, :, 0],
+                                predicted[:, None, 1] - detected[None, :, 1])
+            gate = self.centroid_gate * np.hypot(predicted[:, 2], predicted[:, 3])[:, None]
+            near = (cost >= INFEASIBLE_COST) & (distance <= gate)
+            cost = np.where(near, 1.0 + distance / np.maximum(gate, 1e-9), cost)
+
+        return cost
+
+    def associate(self, track_indices, det_indices, measurements, use_centroid):
+        """
+        ربط المسارات بالكشوفات بالخوارزمية الهنغارية
+
+        Returns:
+            tuple: (قائمة (track, detection)، مسارات غير مطابقة، كشوفات غير مطابقة)
+        """
+        det_indices = list(det_indices)
+        if not track_indices or not det_indices:
+            return [], list(track_indices), det_indices
+
+        from scipy.optimize import linear_sum_assignment
+
+        cost = self.association_cost(track_indices, det_indices, measurements, use_centroid)
+        rows, cols = linear_sum_assignment(cost)
+
+        matches = []
+        matched_tracks, matched_dets = set(), set()
+        for r, c in zip(rows, cols):
+            if cost[r, c] < INFEASIBLE_COST:
+                matches.append((track_indices[r], det_indices[c]))
+                matched_tracks.add(r)
+                matched_dets.add(c)
+
+        unmatched_tracks = [t for i, t in enumerate(track_indices) if i not in matched_tracks]
+        unmatched_dets = [d for i, d in enumerate(det_indices) if i not in matched_dets]
+        return matches, unmatched_tracks, unmatched_dets
@@ -130,6 +130,55 @@ BEGIN
     UPDATE semen_analysis SET modified_date = CURRENT_TIMESTAMP WHERE test_result_id = NEW.test_result_id;
 END;
 
+-- السلسلة الزمنية للحركة لكل نافذة زمنية من تحليل الفيديو (--time-window)
+CREATE TABLE IF NOT EXISTS motility_time_series (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_result_id INTEGER NOT NULL,
+    window_start_seconds REAL NOT NULL,  -- بداية النافذة من أول إطار
+    window_seconds REAL NOT NULL,        -- مدة النافذة
+    tracks_count INTEGER,                -- عدد المسارات المحتسبة في النافذة
+    vcl_mean_um_s REAL,
+    vsl_mean_um_s REAL,
+    progressive_percent REAL,
+    FOREIGN KEY (test_result_id) REFERENCES semen_analysis(test_result_id)
+);
+
+-- معايير CASA لكل مسار حيوان منوي في تحليل الفيديو
+CREATE TABLE IF NOT EXISTS sperm_track_kinematics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_result_id INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    points_count INTEGER,                -- عدد نقاط المسار
+    vcl_um_s REAL,
+    vsl_um_s REAL,
+    vap_um_s REAL,
+    lin_percent REAL,
+    str_percent REAL,
+    wob_percent REAL,
+    alh_um REAL,                         -- حول خط البداية والنهاية (NULL في وضع --online-metrics)
+    bcf_hz REAL,
+    alh_avgpath_um REAL,                 -- حول المسار المتوسط (وضع --online-metrics فقط)
+    bcf_avgpath_hz REAL,
+    movement_pattern TEXT,               -- rapid_progressive / slow_progressive / hyperactivated / ...
+    who_grade TEXT,                      -- A / B / C / D
+    FOREIGN KEY (test_result_id) REFERENCES semen_analysis(test_result_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_track_kinematics_result ON sperm_track_kinematics(test_result_id, track_id);
+
+-- نقاط المسارات المختصرة (نقطة من كل N، --trajectory-stride)
+CREATE TABLE IF NOT EXISTS sperm_track_points (
+    test_result_id INTEGER NOT NULL,
+    track_id INTEGER NOT NULL,
+    frame_index INTEGER NOT NULL,
+    timestamp_ms REAL,
+    x_px REAL,                           -- مركز الصندوق بالبكسل
+    y_px REAL,
+    FOREIGN KEY (test_result_id) REFERENCES semen_analysis(test_result_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_track_points_result ON sperm_track_points(test_result_id, track_id);
+
 -- إضافة بيانات تجريبية واقعية
 INSERT INTO semen_analysis (
     patient_id, test_date, abstinence_days, volume_ml, ph, concentration_million_ml, 